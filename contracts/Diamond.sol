@@ -6,7 +6,7 @@ pragma solidity 0.8.15;
 * EIP-2535 Diamond Standard: https://eips.ethereum.org/EIPS/eip-2535
 /******************************************************************************/
 
-import {LibDiamond} from "./libraries/LibDiamond.sol";
+import {LibDiamond, FunctionNotFound} from "./libraries/LibDiamond.sol";
 import {IDiamondCut} from "./interfaces/IDiamondCut.sol";
 
 contract Diamond {
@@ -38,7 +38,9 @@ contract Diamond {
         }
         // get facet from function selector
         address facet = address(bytes20(ds.facets[msg.sig]));
-        require(facet != address(0), "Diamond: Function does not exist");
+        if (facet == address(0)) {
+            revert FunctionNotFound(msg.sig);
+        }
         // Execute external function from facet using delegatecall and return any value.
         assembly {
             // copy function selector and any arguments
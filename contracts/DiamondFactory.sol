@@ -0,0 +1,153 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+import {Diamond} from "./Diamond.sol";
+import {TokenFacet} from "./facets/TokenFacet.sol";
+import {IDiamondCut} from "./interfaces/IDiamondCut.sol";
+import {IERC173} from "./interfaces/IERC173.sol";
+
+// Deploys a token diamond in a single transaction: the diamond is created
+// with the factory as its owner, the facets are added with the init call,
+// the token is set up and the ownership is transferred to the owner.
+// The cut must add OwnershipFacet and TokenFacet.
+// deployDiamondWithSalt creates the diamond with CREATE2 so its address can be
+// mined for leading zero bytes, see scripts/create2.py.
+
+error InvalidSalt(bytes32 salt);
+
+contract DiamondFactory {
+    struct TokenSetup {
+        string name;
+        string version;
+        string symbol;
+        uint8 decimals;
+    }
+
+    event DiamondDeployed(address indexed diamond, address indexed owner);
+
+    /**
+     * @notice Deploy and set up a token diamond
+     * @param _contractOwner     Owner of the new diamond
+     * @param _diamondCutFacet   DiamondCutFacet address
+     * @param _diamondCut        Facets to add to the diamond
+     * @param _init              Address of the contract to delegatecall
+     * _calldata to, or the zero address
+     * @param _calldata          Init function call
+     * @param _tokenSetup        Arguments of TokenFacet.setup
+     * @return diamond_ Address of the new diamond
+     */
+
+    function deployDiamond(
+        address _contractOwner,
+        address _diamondCutFacet,
+        IDiamondCut.FacetCut[] calldata _diamondCut,
+        address _init,
+        bytes calldata _calldata,
+        TokenSetup calldata _tokenSetup
+    ) external returns (address diamond_) {
+        diamond_ = address(new Diamond(address(this), _diamondCutFacet));
+        _setup(
+            diamond_,
+            _contractOwner,
+            _diamondCut,
+            _init,
+            _calldata,
+            _tokenSetup
+        );
+    }
+
+    /**
+     * @notice Deploy and set up a token diamond at a CREATE2 address
+     * @dev The first 20 bytes of the salt are the sender or zero, so the
+     * address mined by the sender can't be taken by another deployment.
+     * @param _contractOwner     Owner of the new diamond
+     * @param _diamondCutFacet   DiamondCutFacet address
+     * @param _diamondCut        Facets to add to the diamond
+     * @param _init              Address of the contract to delegatecall
+     * _calldata to, or the zero address
+     * @param _calldata          Init function call
+     * @param _tokenSetup        Arguments of TokenFacet.setup
+     * @param _salt              CREATE2 salt
+     * @return diamond_ Address of the new diamond
+     */
+
+    function deployDiamondWithSalt(
+        address _contractOwner,
+        address _diamondCutFacet,
+        IDiamondCut.FacetCut[] calldata _diamondCut,
+        address _init,
+        bytes calldata _calldata,
+        TokenSetup calldata _tokenSetup,
+        bytes32 _salt
+    ) external returns (address diamond_) {
+        address saltSender = address(bytes20(_salt));
+        if (saltSender != msg.sender && saltSender != address(0)) {
+            revert InvalidSalt(_salt);
+        }
+        diamond_ = address(
+            new Diamond{salt: _salt}(address(this), _diamondCutFacet)
+        );
+        _setup(
+            diamond_,
+            _contractOwner,
+            _diamondCut,
+            _init,
+            _calldata,
+            _tokenSetup
+        );
+    }
+
+    /**
+     * @notice Address of the diamond deployDiamondWithSalt deploys
+     * @param _diamondCutFacet DiamondCutFacet address
+     * @param _salt            CREATE2 salt
+     * @return diamond_ Address of the diamond
+     */
+
+    function computeDiamondAddress(address _diamondCutFacet, bytes32 _salt)
+        external
+        view
+        returns (address diamond_)
+    {
+        bytes32 initCodeHash = keccak256(
+            abi.encodePacked(
+                type(Diamond).creationCode,
+                abi.encode(address(this), _diamondCutFacet)
+            )
+        );
+        diamond_ = address(
+            uint160(
+                uint256(
+                    keccak256(
+                        abi.encodePacked(
+                            bytes1(0xff),
+                            address(this),
+                            _salt,
+                            initCodeHash
+                        )
+                    )
+                )
+            )
+        );
+    }
+
+    function _setup(
+        address _diamond,
+        address _contractOwner,
+        IDiamondCut.FacetCut[] calldata _diamondCut,
+        address _init,
+        bytes calldata _calldata,
+        TokenSetup calldata _tokenSetup
+    ) internal {
+        IDiamondCut(_diamond).diamondCut(_diamondCut, _init, _calldata);
+        TokenFacet(_diamond).setup(
+            _tokenSetup.name,
+            _tokenSetup.version,
+            _tokenSetup.symbol,
+            _tokenSetup.decimals
+        );
+        IERC173(_diamond).transferOwnership(_contractOwner);
+
+        emit DiamondDeployed(_diamond, _contractOwner);
+    }
+}
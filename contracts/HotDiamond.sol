@@ -0,0 +1,138 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+/******************************************************************************\
+* Based on implementation of a diamond by Nick Mudge (https://twitter.com/mudgen)
+* EIP-2535 Diamond Standard: https://eips.ethereum.org/EIPS/eip-2535
+/******************************************************************************/
+
+import {LibDiamond, FunctionNotFound} from "./libraries/LibDiamond.sol";
+import {LibAppStorage} from "./libraries/LibAppStorage.sol";
+import {IDiamondCut} from "./interfaces/IDiamondCut.sol";
+
+error InvalidHotSelectorCount(uint256 _count);
+
+// A diamond that dispatches a small set of hot function selectors
+// (e.g. transfer, transferFrom, approve) to a facet address kept in its
+// bytecode, so those calls skip the storage lookup of the facet.
+// All other selectors are dispatched through diamond storage like Diamond.
+//
+// The hot selectors are also added to diamond storage, so the loupe functions
+// report them. The bytecode dispatch can't follow a diamondCut, so the hot
+// selectors can only be replaced or removed after HotDispatchInit.disable
+// turned it off. The fallback then looks them up in diamond storage like any
+// other selector, and HotDispatchInit.enable turns it on again once every
+// hot selector is served by the hot facet again.
+
+contract HotDiamond {
+    // facet that executes the hot selectors
+    address internal immutable hotFacet;
+    // hot selectors packed the same way as a LibDiamond selector slot
+    bytes32 internal immutable hotSelectors;
+    // the number of hot selectors in hotSelectors
+    uint256 internal immutable hotSelectorCount;
+
+    constructor(
+        address _contractOwner,
+        address _diamondCutFacet,
+        address _hotFacet,
+        bytes4[] memory _hotSelectors
+    ) payable {
+        if (_hotSelectors.length == 0 || _hotSelectors.length > 8) {
+            revert InvalidHotSelectorCount(_hotSelectors.length);
+        }
+        LibDiamond.setContractOwner(_contractOwner);
+
+        // Add the diamondCut external function from the diamondCutFacet
+        // and the hot functions from the hotFacet
+        IDiamondCut.FacetCut[] memory cut = new IDiamondCut.FacetCut[](2);
+        bytes4[] memory functionSelectors = new bytes4[](1);
+        functionSelectors[0] = IDiamondCut.diamondCut.selector;
+        cut[0] = IDiamondCut.FacetCut({
+            facetAddress: _diamondCutFacet,
+            action: IDiamondCut.FacetCutAction.Add,
+            functionSelectors: functionSelectors
+        });
+        cut[1] = IDiamondCut.FacetCut({
+            facetAddress: _hotFacet,
+            action: IDiamondCut.FacetCutAction.Add,
+            functionSelectors: _hotSelectors
+        });
+        LibDiamond.diamondCut(cut, address(0), "");
+
+        LibDiamond.DiamondStorage storage ds = LibDiamond.diamondStorage();
+        bytes32 selectorSlot;
+        for (
+            uint256 selectorIndex;
+            selectorIndex < _hotSelectors.length;
+            selectorIndex++
+        ) {
+            bytes4 selector = _hotSelectors[selectorIndex];
+            ds.hotSelectors[selector] = true;
+            // "selectorIndex << 5" is a gas efficient multiplication by 32
+            selectorSlot |= bytes32(selector) >> (selectorIndex << 5);
+        }
+
+        ds.hotFacet = _hotFacet;
+        ds.hotSelectorCount = uint8(_hotSelectors.length);
+
+        hotFacet = _hotFacet;
+        hotSelectors = selectorSlot;
+        hotSelectorCount = _hotSelectors.length;
+    }
+
+    // Find facet for function that is called and execute the
+    // function if a facet is found and return any value.
+
+    fallback() external payable {
+        address facet;
+        // check the hot selectors first, they are read from the bytecode
+        bytes32 selectorSlot = hotSelectors;
+        uint256 selectorCount = hotSelectorCount;
+        for (uint256 selectorIndex; selectorIndex < selectorCount; ) {
+            if (bytes4(selectorSlot << (selectorIndex << 5)) == msg.sig) {
+                // unless HotDispatchInit turned the bytecode dispatch off
+                if (!LibAppStorage.diamondStorage().hotDispatchDisabled) {
+                    facet = hotFacet;
+                }
+                break;
+            }
+            unchecked {
+                selectorIndex++;
+            }
+        }
+        if (facet == address(0)) {
+            LibDiamond.DiamondStorage storage ds;
+            bytes32 position = LibDiamond.DIAMOND_STORAGE_POSITION;
+
+            // get diamond storage
+            assembly {
+                ds.slot := position
+            }
+            // get facet from function selector
+            facet = address(bytes20(ds.facets[msg.sig]));
+            if (facet == address(0)) {
+                revert FunctionNotFound(msg.sig);
+            }
+        }
+        // Execute external function from facet using delegatecall and return any value.
+        assembly {
+            // copy function selector and any arguments
+            calldatacopy(0, 0, calldatasize())
+            // execute function call using the facet
+            let result := delegatecall(gas(), facet, 0, calldatasize(), 0, 0)
+            // get any return value
+            returndatacopy(0, 0, returndatasize())
+            // return any return value or error back to the caller
+            switch result
+            case 0 {
+                revert(0, returndatasize())
+            }
+            default {
+                return(0, returndatasize())
+            }
+        }
+    }
+
+    receive() external payable {}
+}
@@ -0,0 +1,93 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+import {AppStorage} from "../libraries/LibAppStorage.sol";
+import "../libraries/TokenErrors.sol";
+
+/**
+ * @title BatchViewFacet
+ * @notice Token state of many accounts in one call
+ */
+
+contract BatchViewFacet {
+    AppStorage internal s;
+
+    struct AccountState {
+        uint256 balance;
+        bool blacklisted;
+        bool minter;
+        uint256 minterAllowance;
+        uint256 nonce;
+    }
+
+    /**
+     * @notice Token balances of accounts
+     * @param _accounts  The accounts
+     * @return amounts_ Balance of each account
+     */
+
+    function balancesOf(address[] calldata _accounts)
+        external
+        view
+        returns (uint256[] memory amounts_)
+    {
+        amounts_ = new uint256[](_accounts.length);
+        for (uint256 i; i < _accounts.length; ) {
+            amounts_[i] = s.balances[_accounts[i]];
+            unchecked {
+                i++;
+            }
+        }
+    }
+
+    /**
+     * @notice Balance, blacklist and minter state and permit nonce of accounts
+     * @param _accounts  The accounts
+     * @return states_ State of each account
+     */
+
+    function accountStates(address[] calldata _accounts)
+        external
+        view
+        returns (AccountState[] memory states_)
+    {
+        states_ = new AccountState[](_accounts.length);
+        for (uint256 i; i < _accounts.length; ) {
+            address account = _accounts[i];
+            states_[i] = AccountState({
+                balance: s.balances[account],
+                blacklisted: s.blacklisted[account],
+                minter: s.minters[account],
+                minterAllowance: s.minterAllowed[account],
+                nonce: s.permitNonces[account]
+            });
+            unchecked {
+                i++;
+            }
+        }
+    }
+
+    /**
+     * @notice Allowances of pairs of token owners and spenders
+     * @param _owners    Token owners' addresses
+     * @param _spenders  Spenders' addresses, one for each owner
+     * @return amounts_ Allowance of each pair
+     */
+
+    function allowances(address[] calldata _owners, address[] calldata _spenders)
+        external
+        view
+        returns (uint256[] memory amounts_)
+    {
+        if (_owners.length != _spenders.length) {
+            revert ArrayLengthMismatch(_owners.length, _spenders.length);
+        }
+        amounts_ = new uint256[](_owners.length);
+        for (uint256 i; i < _owners.length; ) {
+            amounts_[i] = s.allowed[_owners[i]][_spenders[i]];
+            unchecked {
+                i++;
+            }
+        }
+    }
+}
@@ -11,236 +11,161 @@ import {IDiamondLoupe} from "../interfaces/IDiamondLoupe.sol";
 import {IERC165} from "../interfaces/IERC165.sol";
 
 contract DiamondLoupeFacet is IDiamondLoupe, IERC165 {
-    function facets() external view override returns (Facet[] memory facets_) {
-        facets_ = _facets(0, 0);
-    }
-
-    function facets(uint256 _slotIndex, uint256 _selectorCount)
-        external
-        view
-        returns (Facet[] memory facets_)
-    {
-        facets_ = _facets(_slotIndex, _selectorCount);
-    }
-
     /**
      * @dev These functions are expected to be called frequently by tools.
+     * They read the facet index maintained by LibDiamond, so their cost is
+     * linear in the size of the returned data.
      *
      * struct Facet {
      *     address facetAddress;
      *     bytes4[] functionSelectors;
      * }
      * @notice Gets all facets and their selectors.
-     * @param _slotIndex The slot index.
-     * @param _selectorCount Selectors count.
      * @return facets_ Facet
      */
 
-    function _facets(uint256 _slotIndex, uint256 _selectorCount)
+    function facets() external view override returns (Facet[] memory facets_) {
+        facets_ = _facets(0, type(uint256).max);
+    }
+
+    /**
+     * @notice Gets a page of facets and their selectors.
+     * @param _offset Position of the first facet to return.
+     * @param _limit Maximum number of facets to return.
+     * @return facets_ Facet
+     */
+
+    function facetsPaginated(uint256 _offset, uint256 _limit)
+        external
+        view
+        returns (Facet[] memory facets_)
+    {
+        facets_ = _facets(_offset, _limit);
+    }
+
+    function _facets(uint256 _offset, uint256 _limit)
         internal
         view
         returns (Facet[] memory facets_)
     {
         LibDiamond.DiamondStorage storage ds = LibDiamond.diamondStorage();
-
-        if (_selectorCount == 0) {
-            _selectorCount = ds.selectorCount;
-        }
-
-        facets_ = new Facet[](_selectorCount);
-        // Prevent adding more Facetselectors than uint16:MAX
-        uint16[] memory numFacetSelectors = new uint16[](_selectorCount);
-        uint256 numFacets;
-        uint256 selectorIndex;
-        // loop through function selectors
-        for (_slotIndex; selectorIndex < _selectorCount; _slotIndex++) {
-            bytes32 slot = ds.selectorSlots[_slotIndex];
-            for (
-                uint256 selectorSlotIndex;
-                selectorSlotIndex < 8;
-                selectorSlotIndex++
-            ) {
-                selectorIndex++;
-                if (selectorIndex > _selectorCount) {
-                    break;
-                }
-                bytes4 selector = bytes4(slot << (selectorSlotIndex << 5));
-                address facetAddress_ = address(bytes20(ds.facets[selector]));
-                bool continueLoop = false;
-                for (uint256 facetIndex; facetIndex < numFacets; facetIndex++) {
-                    if (facets_[facetIndex].facetAddress == facetAddress_) {
-                        facets_[facetIndex].functionSelectors[
-                            numFacetSelectors[facetIndex]
-                        ] = selector;
-                        require(numFacetSelectors[facetIndex] < 0xffff);
-                        numFacetSelectors[facetIndex]++;
-                        continueLoop = true;
-                        break;
-                    }
-                }
-                if (continueLoop) {
-                    continueLoop = false;
-                    continue;
-                }
-                facets_[numFacets].facetAddress = facetAddress_;
-                facets_[numFacets].functionSelectors = new bytes4[](
-                    _selectorCount
-                );
-                facets_[numFacets].functionSelectors[0] = selector;
-                numFacetSelectors[numFacets] = 1;
-                numFacets++;
-            }
-        }
+        uint256 numFacets = _pageLength(
+            ds.facetAddresses.length,
+            _offset,
+            _limit
+        );
+        facets_ = new Facet[](numFacets);
         for (uint256 facetIndex; facetIndex < numFacets; facetIndex++) {
-            uint256 numSelectors = numFacetSelectors[facetIndex];
-            bytes4[] memory selectors = facets_[facetIndex].functionSelectors;
-            // setting the number of selectors
-            assembly {
-                mstore(selectors, numSelectors)
-            }
-        }
-        // setting the number of facets
-        assembly {
-            mstore(facets_, numFacets)
+            address facetAddress_ = ds.facetAddresses[_offset + facetIndex];
+            facets_[facetIndex].facetAddress = facetAddress_;
+            facets_[facetIndex].functionSelectors = ds.facetSelectors[
+                facetAddress_
+            ];
         }
     }
 
+    /**
+     * @notice Gets all the function selectors supported by a specific facet.
+     * @param _facet The facet address.
+     * @return facetFunctionSelectors_ The selectors associated with a facet address.
+     */
+
     function facetFunctionSelectors(address _facet)
         external
         view
         override
         returns (bytes4[] memory facetFunctionSelectors_)
     {
-        facetFunctionSelectors_ = _facetFunctionSelectors(_facet, 0, 0);
-    }
-
-    function facetFunctionSelectors(
-        address _facet,
-        uint256 _slotIndex,
-        uint256 _selectorCount
-    ) external view returns (bytes4[] memory facetFunctionSelectors_) {
-        facetFunctionSelectors_ = _facetFunctionSelectors(
-            _facet,
-            _slotIndex,
-            _selectorCount
-        );
+        LibDiamond.DiamondStorage storage ds = LibDiamond.diamondStorage();
+        facetFunctionSelectors_ = ds.facetSelectors[_facet];
     }
 
     /**
-     * @notice Gets all the function selectors supported by a specific facet.
+     * @notice Gets a page of the function selectors supported by a specific facet.
      * @param _facet The facet address.
+     * @param _offset Position of the first selector to return.
+     * @param _limit Maximum number of selectors to return.
      * @return facetFunctionSelectors_ The selectors associated with a facet address.
      */
 
-    function _facetFunctionSelectors(
+    function facetFunctionSelectorsPaginated(
         address _facet,
-        uint256 _slotIndex,
-        uint256 _selectorCount
-    ) internal view returns (bytes4[] memory facetFunctionSelectors_) {
+        uint256 _offset,
+        uint256 _limit
+    ) external view returns (bytes4[] memory facetFunctionSelectors_) {
         LibDiamond.DiamondStorage storage ds = LibDiamond.diamondStorage();
-
-        if (_selectorCount == 0) {
-            _selectorCount = ds.selectorCount;
-        }
-
-        uint256 numSelectors;
-        facetFunctionSelectors_ = new bytes4[](_selectorCount);
-        uint256 selectorIndex;
-        // loop through function selectors
-        for (_slotIndex; selectorIndex < _selectorCount; _slotIndex++) {
-            bytes32 slot = ds.selectorSlots[_slotIndex];
-            for (
-                uint256 selectorSlotIndex;
-                selectorSlotIndex < 8;
-                selectorSlotIndex++
-            ) {
-                selectorIndex++;
-                if (selectorIndex > _selectorCount) {
-                    break;
-                }
-                bytes4 selector = bytes4(slot << (selectorSlotIndex << 5));
-                address facet = address(bytes20(ds.facets[selector]));
-                if (_facet == facet) {
-                    facetFunctionSelectors_[numSelectors] = selector;
-                    numSelectors++;
-                }
-            }
-        }
-        // Set the number of selectors in the array
-        assembly {
-            mstore(facetFunctionSelectors_, numSelectors)
+        bytes4[] storage selectors = ds.facetSelectors[_facet];
+        uint256 numSelectors = _pageLength(selectors.length, _offset, _limit);
+        facetFunctionSelectors_ = new bytes4[](numSelectors);
+        for (
+            uint256 selectorIndex;
+            selectorIndex < numSelectors;
+            selectorIndex++
+        ) {
+            facetFunctionSelectors_[selectorIndex] = selectors[
+                _offset + selectorIndex
+            ];
         }
     }
 
+    /**
+     * @notice Get all the facet addresses used by a diamond.
+     * @return facetAddresses_
+     */
+
     function facetAddresses()
         external
         view
         override
         returns (address[] memory facetAddresses_)
     {
-        facetAddresses_ = _facetAddresses(0, 0);
-    }
-
-    function facetAddresses(uint256 _slotIndex, uint256 _selectorCount)
-        external
-        view
-        returns (address[] memory facetAddresses_)
-    {
-        facetAddresses_ = _facetAddresses(_slotIndex, _selectorCount);
+        LibDiamond.DiamondStorage storage ds = LibDiamond.diamondStorage();
+        facetAddresses_ = ds.facetAddresses;
     }
 
     /**
-     * @notice Get all the facet addresses used by a diamond.
+     * @notice Get a page of the facet addresses used by a diamond.
+     * @param _offset Position of the first facet address to return.
+     * @param _limit Maximum number of facet addresses to return.
      * @return facetAddresses_
      */
 
-    function _facetAddresses(uint256 _slotIndex, uint256 _selectorCount)
-        internal
+    function facetAddressesPaginated(uint256 _offset, uint256 _limit)
+        external
         view
         returns (address[] memory facetAddresses_)
     {
         LibDiamond.DiamondStorage storage ds = LibDiamond.diamondStorage();
-
-        if (_selectorCount == 0) {
-            _selectorCount = ds.selectorCount;
+        uint256 numFacets = _pageLength(
+            ds.facetAddresses.length,
+            _offset,
+            _limit
+        );
+        facetAddresses_ = new address[](numFacets);
+        for (uint256 facetIndex; facetIndex < numFacets; facetIndex++) {
+            facetAddresses_[facetIndex] = ds.facetAddresses[
+                _offset + facetIndex
+            ];
         }
+    }
 
-        facetAddresses_ = new address[](_selectorCount);
-        uint256 numFacets;
-        uint256 selectorIndex;
-        // loop through function selectors
-        for (_slotIndex; selectorIndex < _selectorCount; _slotIndex++) {
-            bytes32 slot = ds.selectorSlots[_slotIndex];
-            for (
-                uint256 selectorSlotIndex;
-                selectorSlotIndex < 8;
-                selectorSlotIndex++
-            ) {
-                selectorIndex++;
-                if (selectorIndex > _selectorCount) {
-                    break;
-                }
-                bytes4 selector = bytes4(slot << (selectorSlotIndex << 5));
-                address facetAddress_ = address(bytes20(ds.facets[selector]));
-                bool continueLoop = false;
-                for (uint256 facetIndex; facetIndex < numFacets; facetIndex++) {
-                    if (facetAddress_ == facetAddresses_[facetIndex]) {
-                        continueLoop = true;
-                        break;
-                    }
-                }
-                if (continueLoop) {
-                    continueLoop = false;
-                    continue;
-                }
-                facetAddresses_[numFacets] = facetAddress_;
-                numFacets++;
-            }
-        }
-        // Set the number of facet addresses in the array
-        assembly {
-            mstore(facetAddresses_, numFacets)
+    /**
+     * @notice Number of items of a page that starts at `_offset`.
+     * @param _length Number of items available.
+     * @param _offset Position of the first item of the page.
+     * @param _limit Maximum number of items of the page.
+     */
+
+    function _pageLength(
+        uint256 _length,
+        uint256 _offset,
+        uint256 _limit
+    ) internal pure returns (uint256) {
+        if (_offset >= _length) {
+            return 0;
         }
+        uint256 remaining = _length - _offset;
+        return remaining < _limit ? remaining : _limit;
     }
 
     /**
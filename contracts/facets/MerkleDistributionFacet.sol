@@ -0,0 +1,218 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+import {LibDiamond} from "../libraries/LibDiamond.sol";
+import {LibMerkleDistribution} from "../libraries/LibMerkleDistribution.sol";
+import {LibToken} from "../libraries/LibToken.sol";
+import {AppStorage} from "../libraries/LibAppStorage.sol";
+import "../libraries/TokenErrors.sol";
+
+/**
+ * @title MerkleDistributionFacet
+ * @notice Mass issuance through Merkle roots. The owner commits the root of
+ * a list of (index, account, amount) leaves and reserves the total from the
+ * allowance of a minter, each account then claims its own tokens. The
+ * tokens are minted by the minter at claim time.
+ */
+
+contract MerkleDistributionFacet {
+    AppStorage internal s;
+
+    event DistributionCreated(
+        uint256 indexed distributionId,
+        bytes32 merkleRoot,
+        address indexed minter,
+        uint256 amount
+    );
+    event DistributionClosed(uint256 indexed distributionId, uint256 remaining);
+    event Claimed(
+        uint256 indexed distributionId,
+        uint256 index,
+        address indexed account,
+        uint256 amount
+    );
+    event Mint(address indexed minter, address indexed to, uint256 amount);
+    event Transfer(address indexed from, address indexed to, uint256 value);
+
+    /**
+     * @notice Commit a Merkle root of claimable amounts
+     * @param _merkleRoot    Root of the tree of claims
+     * @param _minter        Minter the claimed tokens are minted by
+     * @param _amount        Sum of the claimable amounts, taken from the
+     * minter allowance
+     * @return distributionId_ Id of the new distribution
+     */
+
+    function createDistribution(
+        bytes32 _merkleRoot,
+        address _minter,
+        uint256 _amount
+    ) external returns (uint256 distributionId_) {
+        LibDiamond.enforceIsContractOwner();
+        LibToken.enforceNotPaused();
+
+        if (!s.minters[_minter]) {
+            revert NotMinter(_minter);
+        }
+        uint256 mintingAllowedAmount = s.minterAllowed[_minter];
+        if (_amount > mintingAllowedAmount) {
+            revert MintAmountExceedsMinterAllowance(
+                _minter,
+                _amount,
+                mintingAllowedAmount
+            );
+        }
+        s.minterAllowed[_minter] = mintingAllowedAmount - _amount;
+
+        LibMerkleDistribution.MerkleDistributionStorage
+            storage mds = LibMerkleDistribution.merkleDistributionStorage();
+        distributionId_ = ++mds.distributionCount;
+        LibMerkleDistribution.Distribution storage distribution = mds
+            .distributions[distributionId_];
+        distribution.merkleRoot = _merkleRoot;
+        distribution.minter = _minter;
+        distribution.remaining = _amount;
+        emit DistributionCreated(
+            distributionId_,
+            _merkleRoot,
+            _minter,
+            _amount
+        );
+    }
+
+    /**
+     * @notice Close a distribution and return its unclaimed tokens to the
+     * allowance of its minter
+     * @param _distributionId    The distribution id
+     */
+
+    function closeDistribution(uint256 _distributionId) external {
+        LibDiamond.enforceIsContractOwner();
+
+        LibMerkleDistribution.Distribution
+            storage distribution = _distribution(_distributionId);
+        uint256 remaining = distribution.remaining;
+        distribution.merkleRoot = bytes32(0);
+        distribution.remaining = 0;
+        if (s.minters[distribution.minter]) {
+            s.minterAllowed[distribution.minter] += remaining;
+        }
+        emit DistributionClosed(_distributionId, remaining);
+    }
+
+    /**
+     * @notice Mint the tokens of a leaf to its account
+     * @dev Anyone can submit the claim, the tokens always go to the account
+     * of the leaf.
+     * @param _distributionId    The distribution id
+     * @param _index             Index of the leaf
+     * @param _account           Account of the leaf
+     * @param _amount            Amount of the leaf
+     * @param _merkleProof       Proof of the leaf
+     */
+
+    function claim(
+        uint256 _distributionId,
+        uint256 _index,
+        address _account,
+        uint256 _amount,
+        bytes32[] calldata _merkleProof
+    ) external {
+        LibToken.enforceNotPaused();
+        LibToken.enforceNotBlacklisted(msg.sender);
+        LibToken.enforceNotBlacklisted(_account);
+
+        LibMerkleDistribution.Distribution
+            storage distribution = _distribution(_distributionId);
+        address minter = distribution.minter;
+        LibToken.enforceNotBlacklisted(minter);
+        if (LibMerkleDistribution.isClaimed(distribution, _index)) {
+            revert AlreadyClaimed(_distributionId, _index);
+        }
+        if (
+            !LibMerkleDistribution.verify(
+                _merkleProof,
+                distribution.merkleRoot,
+                LibMerkleDistribution.leaf(_index, _account, _amount)
+            )
+        ) {
+            revert InvalidMerkleProof(_distributionId, _index);
+        }
+        uint256 remaining = distribution.remaining;
+        if (_amount > remaining) {
+            revert DistributionAmountExceedsRemaining(
+                _distributionId,
+                _amount,
+                remaining
+            );
+        }
+
+        LibToken.enforceMintable(_account, _amount);
+
+        LibMerkleDistribution.setClaimed(distribution, _index);
+        distribution.remaining = remaining - _amount;
+        LibToken.mint(minter, _account, _amount);
+        emit Claimed(_distributionId, _index, _account, _amount);
+    }
+
+    /**
+     * @notice Check if a leaf of a distribution is claimed
+     * @param _distributionId    The distribution id
+     * @param _index             Index of the leaf
+     */
+
+    function isClaimed(uint256 _distributionId, uint256 _index)
+        external
+        view
+        returns (bool claimed_)
+    {
+        claimed_ = LibMerkleDistribution.isClaimed(
+            _distribution(_distributionId),
+            _index
+        );
+    }
+
+    /**
+     * @notice Root, minter and unclaimed amount of a distribution
+     * @param _distributionId    The distribution id
+     */
+
+    function distributions(uint256 _distributionId)
+        external
+        view
+        returns (
+            bytes32 merkleRoot_,
+            address minter_,
+            uint256 remaining_
+        )
+    {
+        LibMerkleDistribution.Distribution
+            storage distribution_ = _distribution(_distributionId);
+        merkleRoot_ = distribution_.merkleRoot;
+        minter_ = distribution_.minter;
+        remaining_ = distribution_.remaining;
+    }
+
+    /**
+     * @notice Number of distributions created, the last distribution id
+     */
+
+    function distributionCount() external view returns (uint256 count_) {
+        count_ = LibMerkleDistribution
+            .merkleDistributionStorage()
+            .distributionCount;
+    }
+
+    function _distribution(uint256 _distributionId)
+        internal
+        view
+        returns (LibMerkleDistribution.Distribution storage distribution_)
+    {
+        LibMerkleDistribution.MerkleDistributionStorage
+            storage mds = LibMerkleDistribution.merkleDistributionStorage();
+        if (_distributionId == 0 || _distributionId > mds.distributionCount) {
+            revert DistributionNotFound(_distributionId);
+        }
+        distribution_ = mds.distributions[_distributionId];
+    }
+}
@@ -0,0 +1,190 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+import {LibSnapshot} from "../libraries/LibSnapshot.sol";
+import {LibToken} from "../libraries/LibToken.sol";
+import {TokenFacetBase} from "./TokenFacetBase.sol";
+import "../libraries/TokenErrors.sol";
+
+/**
+ * @title NettingSettlementFacet
+ * @notice Settlement of a batch of signed transfers by their net balance
+ * changes. Every intent is an EIP-3009 TransferWithAuthorization signed by
+ * its payer and is checked like transferWithAuthorization, then the balance
+ * of every account of the batch is written once, so the cost grows with the
+ * number of accounts instead of the number of transfers.
+ * @dev Only the net change of an account must be covered by its balance, a
+ * payment can be funded by a payment the account receives later in the
+ * batch. The balance changes are kept in memory arrays searched linearly,
+ * batches are meant for a small set of accounts.
+ */
+
+contract NettingSettlementFacet is TokenFacetBase {
+    struct Intent {
+        address from;
+        address to;
+        uint256 value;
+        uint256 validAfter;
+        uint256 validBefore;
+        bytes32 nonce;
+        uint8 v;
+        bytes32 r;
+        bytes32 s;
+    }
+
+    struct Deltas {
+        address[] accounts;
+        uint256[] credits;
+        uint256[] debits;
+        uint256 count;
+    }
+
+    event Transfer(address indexed from, address indexed to, uint256 value);
+    event Settlement(
+        address indexed submitter,
+        uint256 intents,
+        address[] accounts,
+        uint256[] credits,
+        uint256[] debits
+    );
+
+    /**
+     * @notice Settle signed transfers by their net balance changes
+     * @param _intents   The transfers, signed as TransferWithAuthorization
+     * @param _compact   Emit one Settlement event instead of a Transfer event
+     * per intent
+     */
+
+    function settle(Intent[] calldata _intents, bool _compact)
+        external
+        whenNotPaused
+    {
+        uint256 maxAccounts = _intents.length * 2;
+        Deltas memory deltas = Deltas({
+            accounts: new address[](maxAccounts),
+            credits: new uint256[](maxAccounts),
+            debits: new uint256[](maxAccounts),
+            count: 0
+        });
+
+        for (uint256 i; i < _intents.length; ) {
+            Intent calldata intent = _intents[i];
+            _useIntent(intent);
+            deltas.debits[_indexOf(deltas, intent.from)] += intent.value;
+            deltas.credits[_indexOf(deltas, intent.to)] += intent.value;
+            if (!_compact) {
+                emit Transfer(intent.from, intent.to, intent.value);
+            }
+            unchecked {
+                i++;
+            }
+        }
+
+        _applyDeltas(deltas);
+
+        if (_compact) {
+            address[] memory accounts = deltas.accounts;
+            uint256[] memory credits = deltas.credits;
+            uint256[] memory debits = deltas.debits;
+            uint256 count = deltas.count;
+            assembly {
+                mstore(accounts, count)
+                mstore(credits, count)
+                mstore(debits, count)
+            }
+            emit Settlement(
+                msg.sender,
+                _intents.length,
+                accounts,
+                credits,
+                debits
+            );
+        }
+    }
+
+    /**
+     * @notice Check the signature and the validity of an intent and mark
+     * its nonce as used
+     * @param _intent    The intent
+     */
+
+    function _useIntent(Intent calldata _intent) internal {
+        if (_intent.to == address(0)) {
+            revert TransferToZeroAddress();
+        }
+        _requireValidAuthorization(
+            _intent.from,
+            _intent.nonce,
+            _intent.validAfter,
+            _intent.validBefore
+        );
+        bytes memory data = abi.encode(
+            _TRANSFER_WITH_AUTHORIZATION_TYPEHASH,
+            _intent.from,
+            _intent.to,
+            _intent.value,
+            _intent.validAfter,
+            _intent.validBefore,
+            _intent.nonce
+        );
+        _requireSigner(_intent.from, _intent.v, _intent.r, _intent.s, data);
+        _markAuthorizationAsUsed(_intent.from, _intent.nonce);
+    }
+
+    /**
+     * @notice Index of an account in the deltas, an account is added and
+     * checked against the blacklist the first time it is seen
+     * @param _deltas    The balance changes of the batch
+     * @param _account   The account
+     * @return index_ Index of the account
+     */
+
+    function _indexOf(Deltas memory _deltas, address _account)
+        internal
+        view
+        returns (uint256 index_)
+    {
+        for (; index_ < _deltas.count; ) {
+            if (_deltas.accounts[index_] == _account) {
+                return index_;
+            }
+            unchecked {
+                index_++;
+            }
+        }
+        LibToken.enforceNotBlacklisted(_account);
+        _deltas.accounts[index_] = _account;
+        _deltas.count = index_ + 1;
+    }
+
+    /**
+     * @notice Write the balance of every account with a net change once
+     * @param _deltas    The balance changes of the batch
+     */
+
+    function _applyDeltas(Deltas memory _deltas) internal {
+        uint64 snapshotId = s.currentSnapshotId;
+        for (uint256 i; i < _deltas.count; ) {
+            address account = _deltas.accounts[i];
+            uint256 credit = _deltas.credits[i];
+            uint256 debit = _deltas.debits[i];
+            if (credit != debit) {
+                uint256 balance = s.balances[account];
+                if (debit > balance + credit) {
+                    revert TransferAmountExceedsBalance(
+                        account,
+                        debit - credit,
+                        balance
+                    );
+                }
+                if (snapshotId > 0) {
+                    LibSnapshot.updateBalance(snapshotId, account, balance);
+                }
+                s.balances[account] = balance + credit - debit;
+            }
+            unchecked {
+                i++;
+            }
+        }
+    }
+}
@@ -0,0 +1,164 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+import {TokenFacetBase} from "./TokenFacetBase.sol";
+import "../libraries/TokenErrors.sol";
+
+/**
+ * @title PackedCalldataFacet
+ * @notice TokenFacet transfers with tightly packed arguments, for rollups
+ * where the fee is dominated by calldata. The functions have no ABI
+ * parameters, the arguments follow the 4 byte selector without padding,
+ * at these calldata offsets (size in bytes):
+ *
+ * transferPacked(), 36 bytes:
+ *     to @4 (20), value @24 (12)
+ * transferFromPacked(), 56 bytes:
+ *     from @4 (20), to @24 (20), value @44 (12)
+ * transferWithAuthorizationPacked() and receiveWithAuthorizationPacked(),
+ * 163 bytes:
+ *     from @4 (20), to @24 (20), value @44 (12), validAfter @56 (5),
+ *     validBefore @61 (5), nonce @66 (32), v @98 (1), r @99 (32),
+ *     s @131 (32)
+ *
+ * Values are uint96 and the authorization times uint40. The functions make
+ * the same checks and emit the same events as their TokenFacet versions.
+ */
+
+contract PackedCalldataFacet is TokenFacetBase {
+    uint256 internal constant _TRANSFER_LENGTH = 36;
+    uint256 internal constant _TRANSFER_FROM_LENGTH = 56;
+    uint256 internal constant _AUTHORIZATION_LENGTH = 163;
+
+    event Transfer(address indexed from, address indexed to, uint256 value);
+
+    /**
+     * @dev Throws if the calldata isn't of the length of the packed arguments
+     */
+
+    modifier packedLength(uint256 _expectedLength) {
+        if (msg.data.length != _expectedLength) {
+            revert InvalidPackedCalldataLength(
+                msg.data.length,
+                _expectedLength
+            );
+        }
+        _;
+    }
+
+    /**
+     * @notice Transfer tokens from the caller
+     */
+
+    function transferPacked()
+        external
+        packedLength(_TRANSFER_LENGTH)
+        whenNotPaused
+        notBlacklisted(msg.sender)
+        notBlacklisted(_packedAddress(4))
+        returns (bool)
+    {
+        _transfer(msg.sender, _packedAddress(4), _packedUint(24, 96));
+        return true;
+    }
+
+    /**
+     * @notice Transfer tokens by spending allowance
+     */
+
+    function transferFromPacked()
+        external
+        packedLength(_TRANSFER_FROM_LENGTH)
+        whenNotPaused
+        notBlacklisted(msg.sender)
+        notBlacklisted(_packedAddress(4))
+        notBlacklisted(_packedAddress(24))
+        returns (bool)
+    {
+        _transferFrom(
+            msg.sender,
+            _packedAddress(4),
+            _packedAddress(24),
+            _packedUint(44, 96)
+        );
+        return true;
+    }
+
+    /**
+     * @notice Execute a transfer with a signed authorization
+     */
+
+    function transferWithAuthorizationPacked()
+        external
+        packedLength(_AUTHORIZATION_LENGTH)
+        whenNotPaused
+        notBlacklisted(_packedAddress(4))
+        notBlacklisted(_packedAddress(24))
+    {
+        _transferWithAuthorization(
+            _packedAddress(4),
+            _packedAddress(24),
+            _packedUint(44, 96),
+            _packedUint(56, 40),
+            _packedUint(61, 40),
+            _packedBytes32(66),
+            uint8(_packedUint(98, 8)),
+            _packedBytes32(99),
+            _packedBytes32(131)
+        );
+    }
+
+    /**
+     * @notice Receive a transfer with a signed authorization from the payer
+     */
+
+    function receiveWithAuthorizationPacked()
+        external
+        packedLength(_AUTHORIZATION_LENGTH)
+        whenNotPaused
+        notBlacklisted(_packedAddress(4))
+        notBlacklisted(_packedAddress(24))
+    {
+        _receiveWithAuthorization(
+            _packedAddress(4),
+            _packedAddress(24),
+            _packedUint(44, 96),
+            _packedUint(56, 40),
+            _packedUint(61, 40),
+            _packedBytes32(66),
+            uint8(_packedUint(98, 8)),
+            _packedBytes32(99),
+            _packedBytes32(131)
+        );
+    }
+
+    function _packedAddress(uint256 _offset)
+        internal
+        pure
+        returns (address address_)
+    {
+        assembly {
+            address_ := shr(96, calldataload(_offset))
+        }
+    }
+
+    function _packedUint(uint256 _offset, uint256 _bits)
+        internal
+        pure
+        returns (uint256 value_)
+    {
+        assembly {
+            value_ := shr(sub(256, _bits), calldataload(_offset))
+        }
+    }
+
+    function _packedBytes32(uint256 _offset)
+        internal
+        pure
+        returns (bytes32 value_)
+    {
+        assembly {
+            value_ := calldataload(_offset)
+        }
+    }
+}
@@ -0,0 +1,87 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+import {LibDiamond} from "../libraries/LibDiamond.sol";
+import {LibSnapshot} from "../libraries/LibSnapshot.sol";
+import {AppStorage} from "../libraries/LibAppStorage.sol";
+import "../libraries/TokenErrors.sol";
+
+/**
+ * @title SnapshotFacet
+ * @notice Balances and total supply at past snapshots. TokenFacet writes the
+ * checkpoints when balances change after a snapshot is taken.
+ */
+
+contract SnapshotFacet {
+    AppStorage internal s;
+
+    event Snapshot(uint256 id);
+
+    /**
+     * @notice Take a snapshot of all balances and the total supply
+     * @return snapshotId_ Id of the new snapshot
+     */
+
+    function snapshot() external returns (uint256 snapshotId_) {
+        LibDiamond.enforceIsContractOwner();
+
+        snapshotId_ = ++s.currentSnapshotId;
+        emit Snapshot(snapshotId_);
+    }
+
+    /**
+     * @notice Id of the last snapshot, 0 if no snapshot was taken
+     */
+
+    function currentSnapshotId() external view returns (uint256 snapshotId_) {
+        snapshotId_ = s.currentSnapshotId;
+    }
+
+    /**
+     * @notice Token balance of an account at a snapshot
+     * @param _account       The account
+     * @param _snapshotId    The snapshot id
+     * @return amount_ Balance at the snapshot
+     */
+
+    function balanceOfAt(address _account, uint256 _snapshotId)
+        external
+        view
+        returns (uint256 amount_)
+    {
+        _requireSnapshot(_snapshotId);
+        (bool found, uint256 value) = LibSnapshot.valueAt(
+            LibSnapshot.snapshotStorage().balances[_account],
+            _snapshotId
+        );
+        amount_ = found ? value : s.balances[_account];
+    }
+
+    /**
+     * @notice Total supply at a snapshot
+     * @param _snapshotId    The snapshot id
+     * @return amount_ Total supply at the snapshot
+     */
+
+    function totalSupplyAt(uint256 _snapshotId)
+        external
+        view
+        returns (uint256 amount_)
+    {
+        _requireSnapshot(_snapshotId);
+        (bool found, uint256 value) = LibSnapshot.valueAt(
+            LibSnapshot.snapshotStorage().totalSupply,
+            _snapshotId
+        );
+        amount_ = found ? value : s.totalSupply;
+    }
+
+    function _requireSnapshot(uint256 _snapshotId) internal view {
+        if (_snapshotId == 0) {
+            revert SnapshotIdZero();
+        }
+        if (_snapshotId > s.currentSnapshotId) {
+            revert NonexistentSnapshot(_snapshotId, s.currentSnapshotId);
+        }
+    }
+}
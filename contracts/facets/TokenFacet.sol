@@ -4,16 +4,19 @@ pragma solidity 0.8.15;
 import {IERC20} from "../interfaces/IERC20.sol";
 import {IEIP3009} from "../interfaces/IEIP3009.sol";
 import {IEIP2612} from "../interfaces/IEIP2612.sol";
+import {IERC1363Receiver} from "../interfaces/IERC1363Receiver.sol";
+import {IERC1363Spender} from "../interfaces/IERC1363Spender.sol";
 import {SafeERC20} from "../libraries/SafeERC20.sol";
 import {EIP712} from "../libraries/EIP712.sol";
 import {LibDiamond} from "../libraries/LibDiamond.sol";
-import {AppStorage} from "../libraries/LibAppStorage.sol";
-
-contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
-    AppStorage internal s;
+import {LibSnapshot} from "../libraries/LibSnapshot.sol";
+import {LibPermitNonces} from "../libraries/LibPermitNonces.sol";
+import {LibToken} from "../libraries/LibToken.sol";
+import {TokenFacetBase} from "./TokenFacetBase.sol";
+import "../libraries/TokenErrors.sol";
 
+contract TokenFacet is TokenFacetBase, IERC20, IEIP3009, IEIP2612 {
     using SafeERC20 for IERC20;
-    bool internal _initialized;
 
     event TokenSetup(
         address indexed initiator,
@@ -27,20 +30,10 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
     event MinterConfigured(address indexed minter, uint256 minterAllowedAmount);
     event MinterRemoved(address indexed oldMinter);
 
-    bytes32 internal _DOMAIN_SEPARATOR;
-
     /* keccak256("Permit(address _owner,address _spender,uint256 _value,uint256 _nonce,uint256 _deadline)") */
     bytes32 internal constant _PERMIT_TYPEHASH =
         0x283ef5f1323e8965c0333bc5843eb0b8d7ffe23b9c2eab15c3e3ffcc75ae8134;
 
-    /* keccak256("TransferWithAuthorization(address _from,address _to,uint256 _value,uint256 _validAfter,uint256 _validBefore,bytes32 _nonce)")*/
-    bytes32 internal constant _TRANSFER_WITH_AUTHORIZATION_TYPEHASH =
-        0x310777934f929c98189a844bb5f21f2844db2a576625365b824861540a319f79;
-
-    /* keccak256("ReceiveWithAuthorization(address _from,address _to,uint256 _value,uint256 _validAfter,uint256 _validBefore,bytes32 _nonce)")*/
-    bytes32 internal constant _RECEIVE_WITH_AUTHORIZATION_TYPEHASH =
-        0x58ac3df019d91fe0955489460a6a1c370bec91d993d7efbc0925fe3d403653eb;
-
     /* keccak256("CancelAuthorization(address _authorizer,bytes32 _nonce)")*/
     bytes32 internal constant _CANCEL_AUTHORIZATION_TYPEHASH =
         0xf523c75f846f1f78c4e7be3cf73d7e9c0b2a8d15cd65153faae8afa14f91c341;
@@ -106,7 +99,9 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
         string memory _symbol,
         uint8 _decimals
     ) external {
-        require(!_initialized);
+        if (_initialized) {
+            revert AlreadyInitialized();
+        }
         LibDiamond.enforceIsContractOwner();
 
         s.name = _name;
@@ -134,7 +129,9 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
      */
 
     modifier onlyMinters() {
-        require(s.minters[msg.sender], "Caller is not a minter");
+        if (!s.minters[msg.sender]) {
+            revert CallerNotMinter(msg.sender);
+        }
         _;
     }
 
@@ -154,20 +151,18 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
         notBlacklisted(_to)
         returns (bool)
     {
-        require(_to != address(0), "Mint to the zero address");
-        require(_amount > 0, "Mint amount not greater than 0");
-
+        LibToken.enforceMintable(_to, _amount);
         uint256 mintingAllowedAmount = s.minterAllowed[msg.sender];
-        require(
-            _amount <= mintingAllowedAmount,
-            "Mint amount exceeds minterAllowance"
-        );
+        if (_amount > mintingAllowedAmount) {
+            revert MintAmountExceedsMinterAllowance(
+                msg.sender,
+                _amount,
+                mintingAllowedAmount
+            );
+        }
 
-        s.totalSupply = s.totalSupply + _amount;
-        s.balances[_to] = s.balances[_to] + _amount;
         s.minterAllowed[msg.sender] = mintingAllowedAmount - _amount;
-        emit Mint(msg.sender, _to, _amount);
-        emit Transfer(address(0), _to, _amount);
+        LibToken.mint(msg.sender, _to, _amount);
         return true;
     }
 
@@ -261,14 +256,19 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
         address _spender,
         uint256 _value
     ) internal {
-        require(_owner != address(0), "Approve from the zero address");
-        require(_spender != address(0), "Approve to the zero address");
+        if (_owner == address(0)) {
+            revert ApproveFromZeroAddress();
+        }
+        if (_spender == address(0)) {
+            revert ApproveToZeroAddress();
+        }
         s.allowed[_owner][_spender] = _value;
         emit Approval(_owner, _spender, _value);
     }
 
     /**
      * @notice Transfer tokens by spending allowance
+     * @dev An allowance of type(uint256).max isn't decreased
      * @param _from  Payer's address
      * @param _to    Payee's address
      * @param _value Transfer amount
@@ -287,12 +287,7 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
         notBlacklisted(_to)
         returns (bool)
     {
-        require(
-            _value <= s.allowed[_from][msg.sender],
-            "Transfer amount exceeds allowance"
-        );
-        _transfer(_from, _to, _value);
-        s.allowed[_from][msg.sender] = s.allowed[_from][msg.sender] - _value;
+        _transferFrom(msg.sender, _from, _to, _value);
         return true;
     }
 
@@ -314,23 +309,123 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
     }
 
     /**
-     * @notice Internal function to process transfers
+     * @notice Transfer tokens from the caller and call onTransferReceived
+     * on the payee, which must accept them
+     * @param _to    Payee's address, a IERC1363Receiver contract
+     * @param _value Transfer amount
+     * @param _data  Data passed to the payee
+     * @return True if successful
+     */
+
+    function transferAndCall(
+        address _to,
+        uint256 _value,
+        bytes calldata _data
+    )
+        external
+        whenNotPaused
+        notBlacklisted(msg.sender)
+        notBlacklisted(_to)
+        returns (bool)
+    {
+        _transfer(msg.sender, _to, _value);
+        _callOnTransferReceived(msg.sender, _to, _value, _data);
+        return true;
+    }
+
+    /**
+     * @notice Transfer tokens by spending allowance and call
+     * onTransferReceived on the payee, which must accept them
      * @param _from  Payer's address
-     * @param _to    Payee's address
+     * @param _to    Payee's address, a IERC1363Receiver contract
      * @param _value Transfer amount
+     * @param _data  Data passed to the payee
+     * @return True if successful
      */
-    function _transfer(
+
+    function transferFromAndCall(
         address _from,
         address _to,
-        uint256 _value
-    ) internal {
-        require(_from != address(0), "Transfer from the zero address");
-        require(_to != address(0), "Transfer to the zero address");
-        require(_value <= s.balances[_from], "Transfer amount exceeds balance");
+        uint256 _value,
+        bytes calldata _data
+    )
+        external
+        whenNotPaused
+        notBlacklisted(msg.sender)
+        notBlacklisted(_from)
+        notBlacklisted(_to)
+        returns (bool)
+    {
+        _transferFrom(msg.sender, _from, _to, _value);
+        _callOnTransferReceived(_from, _to, _value, _data);
+        return true;
+    }
+
+    /**
+     * @notice Set spender's allowance over the caller's tokens and call
+     * onApprovalReceived on the spender, which must accept it
+     * @param _spender   Spender's address, a IERC1363Spender contract
+     * @param _value     Allowance amount
+     * @param _data      Data passed to the spender
+     * @return True if successful
+     */
+
+    function approveAndCall(
+        address _spender,
+        uint256 _value,
+        bytes calldata _data
+    )
+        external
+        whenNotPaused
+        notBlacklisted(msg.sender)
+        notBlacklisted(_spender)
+        returns (bool)
+    {
+        _approve(msg.sender, _spender, _value);
+        if (_spender.code.length == 0) {
+            revert ReceiverNotContract(_spender);
+        }
+        if (
+            IERC1363Spender(_spender).onApprovalReceived(
+                msg.sender,
+                _value,
+                _data
+            ) != IERC1363Spender.onApprovalReceived.selector
+        ) {
+            revert ApprovalRejected(_spender);
+        }
+        return true;
+    }
+
+    /**
+     * @notice Call onTransferReceived on the payee of a transfer. The
+     * transfer is made before the call so a reentering payee sees the
+     * balances after it.
+     * @param _from  Payer's address
+     * @param _to    Payee's address
+     * @param _value Transfer amount
+     * @param _data  Data passed to the payee
+     */
 
-        s.balances[_from] = s.balances[_from] - _value;
-        s.balances[_to] = s.balances[_to] + _value;
-        emit Transfer(_from, _to, _value);
+    function _callOnTransferReceived(
+        address _from,
+        address _to,
+        uint256 _value,
+        bytes calldata _data
+    ) private {
+        if (_to.code.length == 0) {
+            revert ReceiverNotContract(_to);
+        }
+        if (
+            IERC1363Receiver(_to).onTransferReceived(
+                msg.sender,
+                _from,
+                _value,
+                _data
+            ) != IERC1363Receiver.onTransferReceived.selector
+        ) {
+            revert TransferRejected(_to);
+        }
     }
 
     /**
@@ -381,8 +476,18 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
         notBlacklisted(msg.sender)
     {
         uint256 balance = s.balances[msg.sender];
-        require(_amount > 0, "Burn amount not greater than 0");
-        require(balance >= _amount, "Burn amount exceeds balance");
+        if (_amount == 0) {
+            revert BurnAmountZero();
+        }
+        if (_amount > balance) {
+            revert BurnAmountExceedsBalance(msg.sender, _amount, balance);
+        }
+
+        uint64 snapshotId = s.currentSnapshotId;
+        if (snapshotId > 0) {
+            LibSnapshot.updateTotalSupply(snapshotId, s.totalSupply);
+            LibSnapshot.updateBalance(snapshotId, msg.sender, balance);
+        }
 
         s.totalSupply = s.totalSupply - _amount;
         s.balances[msg.sender] = balance - _amount;
@@ -542,7 +647,53 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
         bytes32 _r,
         bytes32 _s
     ) external whenNotPaused notBlacklisted(_owner) notBlacklisted(_spender) {
-        _permit(_owner, _spender, _value, _deadline, _v, _r, _s);
+        _permit(
+            _owner,
+            _spender,
+            _value,
+            s.permitNonces[_owner]++,
+            _deadline,
+            _v,
+            _r,
+            _s
+        );
+    }
+
+    /**
+     * @notice Update allowance with a signed permit using a nonce of a lane
+     * @dev Permits of different lanes can be signed and submitted in any
+     * order. The signed nonce is nonces(_owner, _key), lane 0 is the lane of
+     * permit.
+     * @param _owner       Token owner's address (Authorizer)
+     * @param _spender     Spender's address
+     * @param _value       Amount of allowance
+     * @param _key         Key of the nonce lane
+     * @param _deadline    Expiration time, seconds since the epoch
+     * @param _v           v of the signature
+     * @param _r           r of the signature
+     * @param _s           s of the signature
+     */
+
+    function permitWithKey(
+        address _owner,
+        address _spender,
+        uint256 _value,
+        uint192 _key,
+        uint256 _deadline,
+        uint8 _v,
+        bytes32 _r,
+        bytes32 _s
+    ) external whenNotPaused notBlacklisted(_owner) notBlacklisted(_spender) {
+        _permit(
+            _owner,
+            _spender,
+            _value,
+            _useKeyedNonce(_owner, _key),
+            _deadline,
+            _v,
+            _r,
+            _s
+        );
     }
 
     /**
@@ -585,11 +736,51 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
         nonce_ = s.permitNonces[_owner];
     }
 
+    /**
+     * @notice Nonces of a lane for permitWithKey
+     * @param _owner Token owner's address (Authorizer)
+     * @param _key   Key of the nonce lane
+     * @return nonce_ Next nonce, the key followed by the sequence number
+     */
+
+    function nonces(address _owner, uint192 _key)
+        external
+        view
+        returns (uint256 nonce_)
+    {
+        uint256 sequence = _key == 0
+            ? s.permitNonces[_owner]
+            : LibPermitNonces.permitNoncesStorage().sequences[_owner][_key];
+        nonce_ = LibPermitNonces.nonce(_key, sequence);
+    }
+
+    /**
+     * @notice Use the next nonce of a lane
+     * @param _owner Token owner's address (Authorizer)
+     * @param _key   Key of the nonce lane
+     * @return nonce_ The nonce used
+     */
+
+    function _useKeyedNonce(address _owner, uint192 _key)
+        internal
+        returns (uint256 nonce_)
+    {
+        if (_key == 0) {
+            nonce_ = s.permitNonces[_owner]++;
+        } else {
+            nonce_ = LibPermitNonces.nonce(
+                _key,
+                LibPermitNonces.permitNoncesStorage().sequences[_owner][_key]++
+            );
+        }
+    }
+
     /**
      * @notice EIP-2612 Verify a signed approval permit and execute if valid
      * @param _owner     Token owner's address (Authorizer)
      * @param _spender   Spender's address
      * @param _value     Amount of allowance
+     * @param _nonce     Nonce of the permit
      * b@param _deadline  The time at which this expires (unix time)
      * @param _v         v of the signature
      * @param _r         r of the signature
@@ -600,31 +791,29 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
         address _owner,
         address _spender,
         uint256 _value,
+        uint256 _nonce,
         uint256 _deadline,
         uint8 _v,
         bytes32 _r,
         bytes32 _s
     ) internal {
-        require(_deadline >= block.timestamp, "Permit is expired");
+        if (_deadline < block.timestamp) {
+            revert PermitExpired(_deadline);
+        }
 
         bytes memory data = abi.encode(
             _PERMIT_TYPEHASH,
             _owner,
             _spender,
             _value,
-            s.permitNonces[_owner]++,
+            _nonce,
             _deadline
         );
-        require(
-            EIP712.recover(_DOMAIN_SEPARATOR, _v, _r, _s, data) == _owner,
-            "Invalid signature"
-        );
+        _requireSigner(_owner, _v, _r, _s, data);
 
         _approve(_owner, _spender, _value);
     }
 
-    event AuthorizationUsed(address indexed authorizer, bytes32 indexed nonce);
-
     /**
      * @notice Returns the state of an authorization
      * @dev Nonces are randomly generated 32-byte data unique to the
@@ -642,97 +831,6 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
         state_ = s._authorizationStates[_authorizer][_nonce];
     }
 
-    /**
-     * @notice Execute a transfer with a signed authorization
-     * @param _from          Payer's address (Authorizer)
-     * @param _to            Payee's address
-     * @param _value         Amount to be transferred
-     * @param _validAfter    The time after which this is valid (unix time)
-     * @param _validBefore   The time before which this is valid (unix time)
-     * @param _nonce         Unique nonce
-     * @param _v             v of the signature
-     * @param _r             r of the signature
-     * @param _s             s of the signature
-     */
-
-    function _transferWithAuthorization(
-        address _from,
-        address _to,
-        uint256 _value,
-        uint256 _validAfter,
-        uint256 _validBefore,
-        bytes32 _nonce,
-        uint8 _v,
-        bytes32 _r,
-        bytes32 _s
-    ) internal {
-        _requireValidAuthorization(_from, _nonce, _validAfter, _validBefore);
-
-        bytes memory data = abi.encode(
-            _TRANSFER_WITH_AUTHORIZATION_TYPEHASH,
-            _from,
-            _to,
-            _value,
-            _validAfter,
-            _validBefore,
-            _nonce
-        );
-        require(
-            EIP712.recover(_DOMAIN_SEPARATOR, _v, _r, _s, data) == _from,
-            "Invalid signature"
-        );
-
-        _markAuthorizationAsUsed(_from, _nonce);
-        _transfer(_from, _to, _value);
-    }
-
-    /**
-     * @notice Receive a transfer with a signed authorization from the payer
-     * @dev This has an additional check to ensure that the payee's address
-     * matches the caller of this function to prevent front-running attacks.
-     * @param _from          Payer's address (Authorizer)
-     * @param _to            Payee's address
-     * @param _value         Amount to be transferred
-     * @param _validAfter    The time after which this is valid (unix time)
-     * @param _validBefore   The time before which this is valid (unix time)
-     * @param _nonce         Unique nonce
-     * @param _v             v of the signature
-     * @param _r             r of the signature
-     * @param _s             s of the signature
-     */
-
-    function _receiveWithAuthorization(
-        address _from,
-        address _to,
-        uint256 _value,
-        uint256 _validAfter,
-        uint256 _validBefore,
-        bytes32 _nonce,
-        uint8 _v,
-        bytes32 _r,
-        bytes32 _s
-    ) internal {
-        require(_to == msg.sender, "Caller must be the payee");
-        _requireValidAuthorization(_from, _nonce, _validAfter, _validBefore);
-
-        bytes memory data = abi.encode(
-            _RECEIVE_WITH_AUTHORIZATION_TYPEHASH,
-            _from,
-            _to,
-            _value,
-            _validAfter,
-            _validBefore,
-            _nonce
-        );
-        require(
-            EIP712.recover(_DOMAIN_SEPARATOR, _v, _r, _s, data) == _from,
-            "Invalid signature"
-        );
-
-        _markAuthorizationAsUsed(_from, _nonce);
-        _transfer(_from, _to, _value);
-    }
-
     /**
      * @notice Attempt to cancel an authorization
      * @param _authorizer    Authorizer's address
@@ -756,66 +854,12 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
             _authorizer,
             _nonce
         );
-        require(
-            EIP712.recover(_DOMAIN_SEPARATOR, _v, _r, _s, data) == _authorizer,
-            "Invalid signature"
-        );
+        _requireSigner(_authorizer, _v, _r, _s, data);
 
         s._authorizationStates[_authorizer][_nonce] = true;
         emit AuthorizationCanceled(_authorizer, _nonce);
     }
 
-    /**
-     * @notice Check that an authorization is unused
-     * @param _authorizer    Authorizer's address
-     * @param _nonce         Nonce of the authorization
-     */
-
-    function _requireUnusedAuthorization(address _authorizer, bytes32 _nonce)
-        private
-        view
-    {
-        require(
-            !s._authorizationStates[_authorizer][_nonce],
-            "Authorization is used or canceled"
-        );
-    }
-
-    /**
-     * @notice Check that authorization is valid
-     * @param _authorizer    Authorizer's address
-     * @param _nonce         Nonce of the authorization
-     * @param _validAfter    The time after which this is valid (unix time)
-     * @param _validBefore   The time before which this is valid (unix time)
-     */
-
-    function _requireValidAuthorization(
-        address _authorizer,
-        bytes32 _nonce,
-        uint256 _validAfter,
-        uint256 _validBefore
-    ) private view {
-        require(
-            block.timestamp > _validAfter,
-            "Authorization is not yet valid"
-        );
-        require(block.timestamp < _validBefore, "Authorization is expired");
-        _requireUnusedAuthorization(_authorizer, _nonce);
-    }
-
-    /**
-     * @notice Mark an authorization as used
-     * @param _authorizer    Authorizer's address
-     * @param _nonce         Nonce of the authorization
-     */
-
-    function _markAuthorizationAsUsed(address _authorizer, bytes32 _nonce)
-        private
-    {
-        s._authorizationStates[_authorizer][_nonce] = true;
-        emit AuthorizationUsed(_authorizer, _nonce);
-    }
-
     event RescuerChanged(address indexed _newRescuer);
 
     /**
@@ -823,7 +867,9 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
      */
 
     modifier onlyRescuer() {
-        require(msg.sender == s.rescuer, "Caller is not the rescuer");
+        if (msg.sender != s.rescuer) {
+            revert CallerNotRescuer(msg.sender);
+        }
         _;
     }
 
@@ -848,7 +894,9 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
      */
 
     function updateRescuer(address _newRescuer) external {
-        require(_newRescuer != address(0), "New rescuer is the zero address");
+        if (_newRescuer == address(0)) {
+            revert NewRescuerZeroAddress();
+        }
 
         LibDiamond.enforceIsContractOwner();
 
@@ -861,12 +909,11 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
     event PauserChanged(address indexed newAddress);
 
     /**
-     * @dev Modifier to make a function callable only when the contract is not paused.
+     * @notice Checks if the token is paused
      */
 
-    modifier whenNotPaused() {
-        require(!s.paused, "Paused");
-        _;
+    function paused() external view returns (bool paused_) {
+        paused_ = s.paused;
     }
 
     /**
@@ -874,7 +921,9 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
      */
 
     modifier onlyPauser() {
-        require(msg.sender == s.pauser, "Caller is not the pauser");
+        if (msg.sender != s.pauser) {
+            revert CallerNotPauser(msg.sender);
+        }
         _;
     }
 
@@ -902,7 +951,9 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
      */
 
     function updatePauser(address _newPauser) external {
-        require(_newPauser != address(0), "New pauser is the zero address");
+        if (_newPauser == address(0)) {
+            revert NewPauserZeroAddress();
+        }
 
         LibDiamond.enforceIsContractOwner();
 
@@ -919,17 +970,9 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
      */
 
     modifier onlyBlacklister() {
-        require(msg.sender == s.blacklister, "Caller is not the blacklister");
-        _;
-    }
-
-    /**
-     * @dev Throws if argument account is blacklisted
-     * @param _account The address _to check
-     */
-
-    modifier notBlacklisted(address _account) {
-        require(!s.blacklisted[_account], "Account is blacklisted");
+        if (msg.sender != s.blacklister) {
+            revert CallerNotBlacklister(msg.sender);
+        }
         _;
     }
 
@@ -968,10 +1011,9 @@ contract TokenFacet is IERC20, IEIP3009, IEIP2612 {
      */
 
     function updateBlacklister(address _newBlacklister) external {
-        require(
-            _newBlacklister != address(0),
-            "New blacklister is the zero address"
-        );
+        if (_newBlacklister == address(0)) {
+            revert NewBlacklisterZeroAddress();
+        }
 
         LibDiamond.enforceIsContractOwner();
 
@@ -0,0 +1,257 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+import {EIP712} from "../libraries/EIP712.sol";
+import {LibToken} from "../libraries/LibToken.sol";
+import {AppStorage} from "../libraries/LibAppStorage.sol";
+import "../libraries/TokenErrors.sol";
+
+/**
+ * @title TokenFacetBase
+ * @notice Storage layout, modifiers and internal transfer logic shared by
+ * TokenFacet and the facets that transfer tokens with the same checks.
+ * @dev The state variables must stay in this order, they are the storage
+ * layout of every facet that inherits them.
+ */
+
+abstract contract TokenFacetBase {
+    AppStorage internal s;
+
+    bool internal _initialized;
+    bytes32 internal _DOMAIN_SEPARATOR;
+
+    /* keccak256("TransferWithAuthorization(address _from,address _to,uint256 _value,uint256 _validAfter,uint256 _validBefore,bytes32 _nonce)")*/
+    bytes32 internal constant _TRANSFER_WITH_AUTHORIZATION_TYPEHASH =
+        0x310777934f929c98189a844bb5f21f2844db2a576625365b824861540a319f79;
+
+    /* keccak256("ReceiveWithAuthorization(address _from,address _to,uint256 _value,uint256 _validAfter,uint256 _validBefore,bytes32 _nonce)")*/
+    bytes32 internal constant _RECEIVE_WITH_AUTHORIZATION_TYPEHASH =
+        0x58ac3df019d91fe0955489460a6a1c370bec91d993d7efbc0925fe3d403653eb;
+
+    event AuthorizationUsed(address indexed authorizer, bytes32 indexed nonce);
+
+    /**
+     * @dev Modifier to make a function callable only when the contract is not paused.
+     */
+
+    modifier whenNotPaused() {
+        LibToken.enforceNotPaused();
+        _;
+    }
+
+    /**
+     * @dev Throws if argument account is blacklisted
+     * @param _account The address _to check
+     */
+
+    modifier notBlacklisted(address _account) {
+        LibToken.enforceNotBlacklisted(_account);
+        _;
+    }
+
+    /**
+     * @notice Internal function to process transfers
+     * @param _from  Payer's address
+     * @param _to    Payee's address
+     * @param _value Transfer amount
+     */
+    function _transfer(
+        address _from,
+        address _to,
+        uint256 _value
+    ) internal {
+        LibToken.transfer(_from, _to, _value);
+    }
+
+    /**
+     * @notice Internal function to transfer tokens by spending allowance
+     * @dev An allowance of type(uint256).max is infinite, it isn't decreased
+     * @param _spender   Spender's address
+     * @param _from      Payer's address
+     * @param _to        Payee's address
+     * @param _value     Transfer amount
+     */
+
+    function _transferFrom(
+        address _spender,
+        address _from,
+        address _to,
+        uint256 _value
+    ) internal {
+        uint256 allowed = s.allowed[_from][_spender];
+        if (_value > allowed) {
+            revert TransferAmountExceedsAllowance(
+                _from,
+                _spender,
+                _value,
+                allowed
+            );
+        }
+        _transfer(_from, _to, _value);
+        if (allowed != type(uint256).max) {
+            unchecked {
+                s.allowed[_from][_spender] = allowed - _value;
+            }
+        }
+    }
+
+    /**
+     * @notice Execute a transfer with a signed authorization
+     * @param _from          Payer's address (Authorizer)
+     * @param _to            Payee's address
+     * @param _value         Amount to be transferred
+     * @param _validAfter    The time after which this is valid (unix time)
+     * @param _validBefore   The time before which this is valid (unix time)
+     * @param _nonce         Unique nonce
+     * @param _v             v of the signature
+     * @param _r             r of the signature
+     * @param _s             s of the signature
+     */
+
+    function _transferWithAuthorization(
+        address _from,
+        address _to,
+        uint256 _value,
+        uint256 _validAfter,
+        uint256 _validBefore,
+        bytes32 _nonce,
+        uint8 _v,
+        bytes32 _r,
+        bytes32 _s
+    ) internal {
+        _requireValidAuthorization(_from, _nonce, _validAfter, _validBefore);
+
+        bytes memory data = abi.encode(
+            _TRANSFER_WITH_AUTHORIZATION_TYPEHASH,
+            _from,
+            _to,
+            _value,
+            _validAfter,
+            _validBefore,
+            _nonce
+        );
+        _requireSigner(_from, _v, _r, _s, data);
+
+        _markAuthorizationAsUsed(_from, _nonce);
+        _transfer(_from, _to, _value);
+    }
+
+    /**
+     * @notice Receive a transfer with a signed authorization from the payer
+     * @dev This has an additional check to ensure that the payee's address
+     * matches the caller of this function to prevent front-running attacks.
+     * @param _from          Payer's address (Authorizer)
+     * @param _to            Payee's address
+     * @param _value         Amount to be transferred
+     * @param _validAfter    The time after which this is valid (unix time)
+     * @param _validBefore   The time before which this is valid (unix time)
+     * @param _nonce         Unique nonce
+     * @param _v             v of the signature
+     * @param _r             r of the signature
+     * @param _s             s of the signature
+     */
+
+    function _receiveWithAuthorization(
+        address _from,
+        address _to,
+        uint256 _value,
+        uint256 _validAfter,
+        uint256 _validBefore,
+        bytes32 _nonce,
+        uint8 _v,
+        bytes32 _r,
+        bytes32 _s
+    ) internal {
+        if (_to != msg.sender) {
+            revert CallerNotPayee(msg.sender, _to);
+        }
+        _requireValidAuthorization(_from, _nonce, _validAfter, _validBefore);
+
+        bytes memory data = abi.encode(
+            _RECEIVE_WITH_AUTHORIZATION_TYPEHASH,
+            _from,
+            _to,
+            _value,
+            _validAfter,
+            _validBefore,
+            _nonce
+        );
+        _requireSigner(_from, _v, _r, _s, data);
+
+        _markAuthorizationAsUsed(_from, _nonce);
+        _transfer(_from, _to, _value);
+    }
+
+    /**
+     * @notice Check that an authorization is unused
+     * @param _authorizer    Authorizer's address
+     * @param _nonce         Nonce of the authorization
+     */
+
+    function _requireUnusedAuthorization(address _authorizer, bytes32 _nonce)
+        internal
+        view
+    {
+        if (s._authorizationStates[_authorizer][_nonce]) {
+            revert AuthorizationUsedOrCanceled(_authorizer, _nonce);
+        }
+    }
+
+    /**
+     * @notice Check that authorization is valid
+     * @param _authorizer    Authorizer's address
+     * @param _nonce         Nonce of the authorization
+     * @param _validAfter    The time after which this is valid (unix time)
+     * @param _validBefore   The time before which this is valid (unix time)
+     */
+
+    function _requireValidAuthorization(
+        address _authorizer,
+        bytes32 _nonce,
+        uint256 _validAfter,
+        uint256 _validBefore
+    ) internal view {
+        if (block.timestamp <= _validAfter) {
+            revert AuthorizationNotYetValid(_validAfter);
+        }
+        if (block.timestamp >= _validBefore) {
+            revert AuthorizationExpired(_validBefore);
+        }
+        _requireUnusedAuthorization(_authorizer, _nonce);
+    }
+
+    /**
+     * @notice Check that the EIP712 signature of data was made by the signer
+     * @param _signer        Expected signer's address
+     * @param _v             v of the signature
+     * @param _r             r of the signature
+     * @param _s             s of the signature
+     * @param _data          Type hash concatenated with data
+     */
+
+    function _requireSigner(
+        address _signer,
+        uint8 _v,
+        bytes32 _r,
+        bytes32 _s,
+        bytes memory _data
+    ) internal view {
+        address signer = EIP712.recover(_DOMAIN_SEPARATOR, _v, _r, _s, _data);
+        if (signer != _signer) {
+            revert InvalidSigner(signer, _signer);
+        }
+    }
+
+    /**
+     * @notice Mark an authorization as used
+     * @param _authorizer    Authorizer's address
+     * @param _nonce         Nonce of the authorization
+     */
+
+    function _markAuthorizationAsUsed(address _authorizer, bytes32 _nonce)
+        internal
+    {
+        s._authorizationStates[_authorizer][_nonce] = true;
+        emit AuthorizationUsed(_authorizer, _nonce);
+    }
+}
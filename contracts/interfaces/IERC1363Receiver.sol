@@ -0,0 +1,21 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+/// @title ERC-1363 Payable Token receiver
+
+interface IERC1363Receiver {
+    /// @notice Handle the receipt of tokens by transferAndCall or
+    ///  transferFromAndCall
+    /// @param operator The address which called the token
+    /// @param from The address which the tokens were transferred from
+    /// @param value The amount of tokens transferred
+    /// @param data Additional data with no specified format
+    /// @return `bytes4(keccak256("onTransferReceived(address,address,uint256,bytes)"))`
+    ///  to accept the transfer
+    function onTransferReceived(
+        address operator,
+        address from,
+        uint256 value,
+        bytes calldata data
+    ) external returns (bytes4);
+}
@@ -0,0 +1,18 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+/// @title ERC-1363 Payable Token spender
+
+interface IERC1363Spender {
+    /// @notice Handle the approval of tokens by approveAndCall
+    /// @param owner The address which approved the tokens
+    /// @param value The amount of tokens approved
+    /// @param data Additional data with no specified format
+    /// @return `bytes4(keccak256("onApprovalReceived(address,uint256,bytes)"))`
+    ///  to accept the approval
+    function onApprovalReceived(
+        address owner,
+        uint256 value,
+        bytes calldata data
+    ) external returns (bytes4);
+}
@@ -1,6 +1,10 @@
 // SPDX-License-Identifier: MIT
 pragma solidity 0.8.15;
 
+error InvalidSignatureSValue(bytes32 _s);
+error InvalidSignatureVValue(uint8 _v);
+error InvalidSignature();
+
 /**
  * @title ECRecover
  * @notice A library that provides a safe ECDSA recovery function
@@ -22,16 +26,18 @@ library ECRecover {
             uint256(s) >
             0x7FFFFFFFFFFFFFFFFFFFFFFFFFFFFFFF5D576E7357A4501DDFE92F46681B20A0
         ) {
-            revert("Invalid signature 's' value");
+            revert InvalidSignatureSValue(s);
         }
 
         if (v != 27 && v != 28) {
-            revert("Invalid signature 'v' value");
+            revert InvalidSignatureVValue(v);
         }
 
         // If the signature is valid (and not malleable), return the signer address
         address signer = ecrecover(digest, v, r, s);
-        require(signer != address(0), "Invalid signature");
+        if (signer == address(0)) {
+            revert InvalidSignature();
+        }
 
         return signer;
     }
@@ -14,6 +14,14 @@ struct AppStorage {
     uint256 totalSupply;
     bool paused;
     address blacklister;
+    // id of the current balance snapshot, 0 if no snapshot was taken.
+    // It shares the storage slot of paused, which every transfer reads.
+    uint64 currentSnapshotId;
+    // copy of LibDiamond's hotDispatchDisabled of a HotDiamond, written with
+    // it by HotDispatchInit. It shares the storage slot of paused too, which
+    // the hot TokenFacet calls read anyway, so the fallback of a HotDiamond
+    // reads it instead of the flag in diamond storage.
+    bool hotDispatchDisabled;
     address pauser;
     address rescuer;
     mapping(address => uint256) balances;
@@ -24,3 +32,12 @@ struct AppStorage {
     mapping(address => uint256) permitNonces;
     mapping(address => mapping(bytes32 => bool)) _authorizationStates;
 }
+
+library LibAppStorage {
+    // AppStorage is the first state variable of the facets that use it
+    function diamondStorage() internal pure returns (AppStorage storage ds) {
+        assembly {
+            ds.slot := 0
+        }
+    }
+}
@@ -9,6 +9,27 @@ pragma solidity 0.8.15;
 import {IDiamondCut} from "../interfaces/IDiamondCut.sol";
 import {EIP712} from "./EIP712.sol";
 
+error FunctionNotFound(bytes4 _functionSelector);
+error NotContractOwner(address _user, address _contractOwner);
+error NoSelectorsProvidedForFacetForCut(address _facetAddress);
+error NoBytecodeAtAddress(address _contractAddress);
+error CannotAddFunctionToDiamondThatAlreadyExists(bytes4 _selector);
+error CannotReplaceImmutableFunction(bytes4 _selector);
+error CannotReplaceFunctionWithTheSameFunctionFromTheSameFacet(
+    bytes4 _selector
+);
+error CannotReplaceFunctionThatDoesNotExists(bytes4 _selector);
+error RemoveFacetAddressMustBeZeroAddress(address _facetAddress);
+error CannotRemoveFunctionThatDoesNotExist(bytes4 _selector);
+error CannotRemoveImmutableFunction(bytes4 _selector);
+error IncorrectFacetCutAction(uint8 _action);
+error InitAddressZeroButCalldataNotEmpty(bytes _calldata);
+error InitCalldataEmptyButAddressNotZero(address _init);
+error InitializationFunctionReverted(address _init, bytes _calldata);
+error FacetIndexNotInitialized();
+error CannotReplaceHotFunction(bytes4 _selector);
+error CannotRemoveHotFunction(bytes4 _selector);
+
 library LibDiamond {
     bytes32 constant DIAMOND_STORAGE_POSITION =
         keccak256("diamond.standard.diamond.storage");
@@ -29,6 +50,26 @@ library LibDiamond {
         mapping(bytes4 => bool) supportedInterfaces;
         // owner of the contract
         address contractOwner;
+        // function selectors that a HotDiamond dispatches from its bytecode.
+        // They can only be replaced or removed while hotDispatchDisabled.
+        mapping(bytes4 => bool) hotSelectors;
+        // index of the selectors of each facet, used by the loupe functions.
+        // facet address => function selectors of the facet
+        mapping(address => bytes4[]) facetSelectors;
+        // func selector => position in facetSelectors of its facet
+        mapping(bytes4 => uint256) facetSelectorPositions;
+        // addresses of the facets that have at least one selector
+        address[] facetAddresses;
+        // facet address => position in facetAddresses
+        mapping(address => uint256) facetAddressPositions;
+        // facet that a HotDiamond dispatches the hot selectors to
+        address hotFacet;
+        // set while the bytecode dispatch of a HotDiamond is turned off and
+        // the fallback looks up the hot selectors in diamond storage,
+        // see HotDispatchInit
+        bool hotDispatchDisabled;
+        // the number of hot selectors of a HotDiamond
+        uint8 hotSelectorCount;
     }
 
     function diamondStorage()
@@ -59,10 +100,10 @@ library LibDiamond {
     }
 
     function enforceIsContractOwner() internal view {
-        require(
-            msg.sender == diamondStorage().contractOwner,
-            "Must be contract owner"
-        );
+        address contractOwner_ = diamondStorage().contractOwner;
+        if (msg.sender != contractOwner_) {
+            revert NotContractOwner(msg.sender, contractOwner_);
+        }
     }
 
     event DiamondCut(
@@ -132,9 +173,17 @@ library LibDiamond {
         bytes4[] memory _selectors
     ) internal returns (uint256, bytes32) {
         DiamondStorage storage ds = diamondStorage();
-        require(_selectors.length > 0, "No selectors in facet to cut");
+        if (_selectors.length == 0) {
+            revert NoSelectorsProvidedForFacetForCut(_newFacetAddress);
+        }
+        // every selector is in the facet index, a diamond with selectors and
+        // no indexed facet was deployed before the index and must build it
+        // with FacetIndexInit first
+        if (_selectorCount > 0 && ds.facetAddresses.length == 0) {
+            revert FacetIndexNotInitialized();
+        }
         if (_action == IDiamondCut.FacetCutAction.Add) {
-            enforceHasContractCode(_newFacetAddress, "Add facet has no code");
+            enforceHasContractCode(_newFacetAddress);
             for (
                 uint256 selectorIndex;
                 selectorIndex < _selectors.length;
@@ -142,14 +191,16 @@ library LibDiamond {
             ) {
                 bytes4 selector = _selectors[selectorIndex];
                 bytes32 oldFacet = ds.facets[selector];
-                require(
-                    address(bytes20(oldFacet)) == address(0),
-                    "Can't add function that already exists"
-                );
+                if (address(bytes20(oldFacet)) != address(0)) {
+                    revert CannotAddFunctionToDiamondThatAlreadyExists(
+                        selector
+                    );
+                }
                 // add facet for selector
                 ds.facets[selector] =
                     bytes20(_newFacetAddress) |
                     bytes32(_selectorCount);
+                addFacetSelector(_newFacetAddress, selector);
                 // "_selectorCount & 7" is a gas efficient modulo by eight "_selectorCount % 8"
                 uint256 selectorInSlotPosition = (_selectorCount & 7) << 5;
                 // clear selector position in slot and add selector
@@ -166,10 +217,7 @@ library LibDiamond {
                 _selectorCount++;
             }
         } else if (_action == IDiamondCut.FacetCutAction.Replace) {
-            enforceHasContractCode(
-                _newFacetAddress,
-                "Replace facet has no code"
-            );
+            enforceHasContractCode(_newFacetAddress);
             for (
                 uint256 selectorIndex;
                 selectorIndex < _selectors.length;
@@ -179,28 +227,31 @@ library LibDiamond {
                 bytes32 oldFacet = ds.facets[selector];
                 address oldFacetAddress = address(bytes20(oldFacet));
                 // only useful if immutable functions exist
-                require(
-                    oldFacetAddress != address(this),
-                    "Can't replace immutable function"
-                );
-                require(
-                    oldFacetAddress != _newFacetAddress,
-                    "Can't replace function with same function"
-                );
-                require(
-                    oldFacetAddress != address(0),
-                    "Can't replace function that doesn't exist"
-                );
+                if (oldFacetAddress == address(this)) {
+                    revert CannotReplaceImmutableFunction(selector);
+                }
+                if (oldFacetAddress == _newFacetAddress) {
+                    revert CannotReplaceFunctionWithTheSameFunctionFromTheSameFacet(
+                        selector
+                    );
+                }
+                if (oldFacetAddress == address(0)) {
+                    revert CannotReplaceFunctionThatDoesNotExists(selector);
+                }
+                if (ds.hotSelectors[selector] && !ds.hotDispatchDisabled) {
+                    revert CannotReplaceHotFunction(selector);
+                }
                 // replace old facet address
                 ds.facets[selector] =
                     (oldFacet & CLEAR_ADDRESS_MASK) |
                     bytes20(_newFacetAddress);
+                removeFacetSelector(oldFacetAddress, selector);
+                addFacetSelector(_newFacetAddress, selector);
             }
         } else if (_action == IDiamondCut.FacetCutAction.Remove) {
-            require(
-                _newFacetAddress == address(0),
-                "Remove facet address must be address(0)"
-            );
+            if (_newFacetAddress != address(0)) {
+                revert RemoveFacetAddressMustBeZeroAddress(_newFacetAddress);
+            }
             // "_selectorCount >> 3" is a gas efficient division by 8 "_selectorCount / 8"
             uint256 selectorSlotCount = _selectorCount >> 3;
             // "_selectorCount & 7" is a gas efficient modulo by eight "_selectorCount % 8"
@@ -225,15 +276,18 @@ library LibDiamond {
                 {
                     bytes4 selector = _selectors[selectorIndex];
                     bytes32 oldFacet = ds.facets[selector];
-                    require(
-                        address(bytes20(oldFacet)) != address(0),
-                        "Can't remove function that doesn't exist"
-                    );
+                    if (address(bytes20(oldFacet)) == address(0)) {
+                        revert CannotRemoveFunctionThatDoesNotExist(selector);
+                    }
                     // only useful if immutable functions exist
-                    require(
-                        address(bytes20(oldFacet)) != address(this),
-                        "Can't remove immutable function"
-                    );
+                    if (address(bytes20(oldFacet)) == address(this)) {
+                        revert CannotRemoveImmutableFunction(selector);
+                    }
+                    if (
+                        ds.hotSelectors[selector] && !ds.hotDispatchDisabled
+                    ) {
+                        revert CannotRemoveHotFunction(selector);
+                    }
                     // replace selector with last selector in ds.facets
                     // gets the last selector
                     lastSelector = bytes4(
@@ -246,6 +300,7 @@ library LibDiamond {
                             bytes20(ds.facets[lastSelector]);
                     }
                     delete ds.facets[selector];
+                    removeFacetSelector(address(bytes20(oldFacet)), selector);
                     uint256 oldSelectorCount = uint16(uint256(oldFacet));
                     // "oldSelectorCount >> 3" is a gas efficient division by 8 "oldSelectorCount / 8"
                     oldSelectorsSlotCount = oldSelectorCount >> 3;
@@ -279,47 +334,96 @@ library LibDiamond {
             }
             _selectorCount = selectorSlotCount * 8 + selectorInSlotIndex;
         } else {
-            revert("Incorrect FacetCutAction");
+            revert IncorrectFacetCutAction(uint8(_action));
         }
         return (_selectorCount, _selectorSlot);
     }
 
+    // Adds a selector to the facet index used by the loupe functions
+    function addFacetSelector(address _facetAddress, bytes4 _selector)
+        internal
+    {
+        DiamondStorage storage ds = diamondStorage();
+        bytes4[] storage selectors = ds.facetSelectors[_facetAddress];
+        if (selectors.length == 0) {
+            ds.facetAddressPositions[_facetAddress] = ds.facetAddresses.length;
+            ds.facetAddresses.push(_facetAddress);
+        }
+        ds.facetSelectorPositions[_selector] = selectors.length;
+        selectors.push(_selector);
+    }
+
+    // Removes a selector from the facet index used by the loupe functions.
+    // The last selector of the facet takes the place of the removed one.
+    function removeFacetSelector(address _facetAddress, bytes4 _selector)
+        internal
+    {
+        DiamondStorage storage ds = diamondStorage();
+        bytes4[] storage selectors = ds.facetSelectors[_facetAddress];
+        uint256 selectorPosition = ds.facetSelectorPositions[_selector];
+        uint256 lastSelectorPosition = selectors.length - 1;
+        if (selectorPosition != lastSelectorPosition) {
+            bytes4 lastSelector = selectors[lastSelectorPosition];
+            selectors[selectorPosition] = lastSelector;
+            ds.facetSelectorPositions[lastSelector] = selectorPosition;
+        }
+        selectors.pop();
+        delete ds.facetSelectorPositions[_selector];
+        // remove the facet address if the facet has no selectors left
+        if (lastSelectorPosition == 0) {
+            uint256 lastFacetAddressPosition = ds.facetAddresses.length - 1;
+            uint256 facetAddressPosition = ds.facetAddressPositions[
+                _facetAddress
+            ];
+            if (facetAddressPosition != lastFacetAddressPosition) {
+                address lastFacetAddress = ds.facetAddresses[
+                    lastFacetAddressPosition
+                ];
+                ds.facetAddresses[facetAddressPosition] = lastFacetAddress;
+                ds.facetAddressPositions[
+                    lastFacetAddress
+                ] = facetAddressPosition;
+            }
+            ds.facetAddresses.pop();
+            delete ds.facetAddressPositions[_facetAddress];
+        }
+    }
+
     function initializeDiamondCut(address _init, bytes memory _calldata)
         internal
     {
         if (_init == address(0)) {
-            require(
-                _calldata.length == 0,
-                "_init is address(0) but_calldata is not empty"
-            );
+            if (_calldata.length > 0) {
+                revert InitAddressZeroButCalldataNotEmpty(_calldata);
+            }
         } else {
-            require(
-                _calldata.length > 0,
-                "_calldata is empty but _init is not address(0)"
-            );
+            if (_calldata.length == 0) {
+                revert InitCalldataEmptyButAddressNotZero(_init);
+            }
             if (_init != address(this)) {
-                enforceHasContractCode(_init, "_init address has no code");
+                enforceHasContractCode(_init);
             }
             (bool success, bytes memory error) = _init.delegatecall(_calldata);
             if (!success) {
                 if (error.length > 0) {
                     // bubble up the error
-                    revert(string(error));
+                    assembly {
+                        revert(add(32, error), mload(error))
+                    }
                 } else {
-                    revert("_init function reverted");
+                    revert InitializationFunctionReverted(_init, _calldata);
                 }
             }
         }
     }
 
-    function enforceHasContractCode(
-        address _contract,
-        string memory _errorMessage
-    ) internal view {
+    function enforceHasContractCode(address _contract) internal view {
         uint256 contractSize;
         assembly {
             contractSize := extcodesize(_contract)
         }
-        require(contractSize > 0, _errorMessage);
+        if (contractSize == 0) {
+            revert NoBytecodeAtAddress(_contract);
+        }
     }
 }
@@ -0,0 +1,100 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+/**
+ * @title LibMerkleDistribution
+ * @notice Merkle distributions of newly minted tokens.
+ * @dev A leaf is keccak256(abi.encodePacked(uint256 index, address account,
+ * uint256 amount)) and a node is the keccak256 of its two children sorted
+ * in ascending order. A node without a sibling is moved up to the next
+ * level unchanged, its proofs have no element for that level.
+ */
+
+library LibMerkleDistribution {
+    bytes32 constant MERKLE_DISTRIBUTION_STORAGE_POSITION =
+        keccak256("diamond.token.merkle.distribution.storage");
+
+    struct Distribution {
+        bytes32 merkleRoot;
+        // minter the claimed tokens are minted by
+        address minter;
+        // tokens reserved from the minter allowance that were not claimed
+        uint256 remaining;
+        // one bit per leaf index, set when the leaf is claimed
+        mapping(uint256 => uint256) claimedBitMap;
+    }
+
+    struct MerkleDistributionStorage {
+        uint256 distributionCount;
+        mapping(uint256 => Distribution) distributions;
+    }
+
+    function merkleDistributionStorage()
+        internal
+        pure
+        returns (MerkleDistributionStorage storage mds)
+    {
+        bytes32 position = MERKLE_DISTRIBUTION_STORAGE_POSITION;
+        assembly {
+            mds.slot := position
+        }
+    }
+
+    function isClaimed(Distribution storage _distribution, uint256 _index)
+        internal
+        view
+        returns (bool)
+    {
+        uint256 word = _distribution.claimedBitMap[_index >> 8];
+        return word & (1 << (_index & 0xff)) != 0;
+    }
+
+    function setClaimed(Distribution storage _distribution, uint256 _index)
+        internal
+    {
+        _distribution.claimedBitMap[_index >> 8] |= 1 << (_index & 0xff);
+    }
+
+    function leaf(
+        uint256 _index,
+        address _account,
+        uint256 _amount
+    ) internal pure returns (bytes32) {
+        return keccak256(abi.encodePacked(_index, _account, _amount));
+    }
+
+    /**
+     * @notice Check that a leaf is part of the tree of a Merkle root
+     * @param _proof         Siblings of the nodes on the path to the root
+     * @param _root          The Merkle root
+     * @param _leaf          The leaf
+     */
+
+    function verify(
+        bytes32[] calldata _proof,
+        bytes32 _root,
+        bytes32 _leaf
+    ) internal pure returns (bool) {
+        bytes32 node = _leaf;
+        for (uint256 i; i < _proof.length; ) {
+            bytes32 sibling = _proof[i];
+            assembly {
+                // hash the sorted pair in scratch space
+                switch lt(node, sibling)
+                case 1 {
+                    mstore(0x00, node)
+                    mstore(0x20, sibling)
+                }
+                default {
+                    mstore(0x00, sibling)
+                    mstore(0x20, node)
+                }
+                node := keccak256(0x00, 0x40)
+            }
+            unchecked {
+                i++;
+            }
+        }
+        return node == _root;
+    }
+}
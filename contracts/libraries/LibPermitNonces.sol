@@ -0,0 +1,38 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+/**
+ * @title LibPermitNonces
+ * @notice Keyed lanes of permit nonces. The nonce of a permit is the key of
+ * its lane in the high 192 bits and the sequence number in the lane in the
+ * low 64 bits, so permits of different lanes don't wait for each other.
+ * @dev Lane 0 is AppStorage.permitNonces, this storage holds the other lanes.
+ */
+
+library LibPermitNonces {
+    bytes32 constant PERMIT_NONCES_STORAGE_POSITION =
+        keccak256("diamond.token.permit.nonces.storage");
+
+    struct PermitNoncesStorage {
+        mapping(address => mapping(uint192 => uint256)) sequences;
+    }
+
+    function permitNoncesStorage()
+        internal
+        pure
+        returns (PermitNoncesStorage storage pns)
+    {
+        bytes32 position = PERMIT_NONCES_STORAGE_POSITION;
+        assembly {
+            pns.slot := position
+        }
+    }
+
+    function nonce(uint192 _key, uint256 _sequence)
+        internal
+        pure
+        returns (uint256)
+    {
+        return (uint256(_key) << 64) | _sequence;
+    }
+}
@@ -0,0 +1,124 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+import "./TokenErrors.sol";
+
+/**
+ * @title LibSnapshot
+ * @notice Checkpoints of balances and total supply at balance snapshots.
+ * @dev A checkpoint is written before the first change of a value after a
+ * snapshot was taken and holds the value at that snapshot. Later changes
+ * during the same snapshot write nothing.
+ */
+
+library LibSnapshot {
+    bytes32 constant SNAPSHOT_STORAGE_POSITION =
+        keccak256("diamond.token.snapshot.storage");
+
+    struct Checkpoint {
+        uint64 snapshotId;
+        uint192 value;
+    }
+
+    struct Checkpoints {
+        // snapshot id of the last checkpoint, packed with the number of
+        // checkpoints so a change that writes nothing costs one storage read
+        uint64 lastSnapshotId;
+        uint192 count;
+        mapping(uint256 => Checkpoint) checkpoints;
+    }
+
+    struct SnapshotStorage {
+        mapping(address => Checkpoints) balances;
+        Checkpoints totalSupply;
+    }
+
+    function snapshotStorage()
+        internal
+        pure
+        returns (SnapshotStorage storage ss)
+    {
+        bytes32 position = SNAPSHOT_STORAGE_POSITION;
+        assembly {
+            ss.slot := position
+        }
+    }
+
+    /**
+     * @notice Checkpoint the balance of an account before it changes
+     * @param _snapshotId    Current snapshot id
+     * @param _account       The account
+     * @param _balance       Balance of the account before the change
+     */
+
+    function updateBalance(
+        uint64 _snapshotId,
+        address _account,
+        uint256 _balance
+    ) internal {
+        update(snapshotStorage().balances[_account], _snapshotId, _balance);
+    }
+
+    /**
+     * @notice Checkpoint the total supply before it changes
+     * @param _snapshotId    Current snapshot id
+     * @param _totalSupply   Total supply before the change
+     */
+
+    function updateTotalSupply(uint64 _snapshotId, uint256 _totalSupply)
+        internal
+    {
+        update(snapshotStorage().totalSupply, _snapshotId, _totalSupply);
+    }
+
+    function update(
+        Checkpoints storage _checkpoints,
+        uint64 _snapshotId,
+        uint256 _value
+    ) internal {
+        if (_checkpoints.lastSnapshotId >= _snapshotId) {
+            return;
+        }
+        if (_value > type(uint192).max) {
+            revert CheckpointValueOverflow(_value);
+        }
+        uint192 count = _checkpoints.count;
+        _checkpoints.checkpoints[count] = Checkpoint({
+            snapshotId: _snapshotId,
+            value: uint192(_value)
+        });
+        _checkpoints.lastSnapshotId = _snapshotId;
+        _checkpoints.count = count + 1;
+    }
+
+    /**
+     * @notice Value at a snapshot, found by binary search of the checkpoints
+     * @param _checkpoints   Checkpoints of the value
+     * @param _snapshotId    The snapshot id
+     * @return found_ False if the value has not changed since the snapshot
+     * @return value_ The value at the snapshot
+     */
+
+    function valueAt(Checkpoints storage _checkpoints, uint256 _snapshotId)
+        internal
+        view
+        returns (bool found_, uint256 value_)
+    {
+        uint256 count = _checkpoints.count;
+        uint256 low;
+        uint256 high = count;
+        // find the first checkpoint taken at or after the snapshot
+        while (low < high) {
+            uint256 mid = (low + high) >> 1;
+            if (_checkpoints.checkpoints[mid].snapshotId < _snapshotId) {
+                low = mid + 1;
+            } else {
+                high = mid;
+            }
+        }
+        if (low < count) {
+            found_ = true;
+            value_ = _checkpoints.checkpoints[low].value;
+        }
+    }
+}
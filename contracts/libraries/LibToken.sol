@@ -0,0 +1,116 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+import {LibSnapshot} from "./LibSnapshot.sol";
+import {AppStorage, LibAppStorage} from "./LibAppStorage.sol";
+import "./TokenErrors.sol";
+
+/**
+ * @title LibToken
+ * @notice Token logic shared by the facets that move or mint tokens
+ */
+
+library LibToken {
+    event Transfer(address indexed from, address indexed to, uint256 value);
+    event Mint(address indexed minter, address indexed to, uint256 amount);
+
+    /**
+     * @dev Throws if the token is paused
+     */
+
+    function enforceNotPaused() internal view {
+        if (LibAppStorage.diamondStorage().paused) {
+            revert TokenPaused();
+        }
+    }
+
+    /**
+     * @dev Throws if argument account is blacklisted
+     * @param _account The address to check
+     */
+
+    function enforceNotBlacklisted(address _account) internal view {
+        if (LibAppStorage.diamondStorage().blacklisted[_account]) {
+            revert AccountBlacklisted(_account);
+        }
+    }
+
+    /**
+     * @notice Move tokens between accounts
+     * @param _from  Payer's address
+     * @param _to    Payee's address
+     * @param _value Transfer amount
+     */
+
+    function transfer(
+        address _from,
+        address _to,
+        uint256 _value
+    ) internal {
+        AppStorage storage s = LibAppStorage.diamondStorage();
+        if (_from == address(0)) {
+            revert TransferFromZeroAddress();
+        }
+        if (_to == address(0)) {
+            revert TransferToZeroAddress();
+        }
+        if (_value > s.balances[_from]) {
+            revert TransferAmountExceedsBalance(
+                _from,
+                _value,
+                s.balances[_from]
+            );
+        }
+
+        uint64 snapshotId = s.currentSnapshotId;
+        if (snapshotId > 0) {
+            LibSnapshot.updateBalance(snapshotId, _from, s.balances[_from]);
+            LibSnapshot.updateBalance(snapshotId, _to, s.balances[_to]);
+        }
+
+        s.balances[_from] = s.balances[_from] - _value;
+        s.balances[_to] = s.balances[_to] + _value;
+        emit Transfer(_from, _to, _value);
+    }
+
+    /**
+     * @dev Throws if the tokens can't be minted to the recipient
+     * @param _to     The address that will receive the minted tokens
+     * @param _amount The amount of tokens to mint
+     */
+
+    function enforceMintable(address _to, uint256 _amount) internal pure {
+        if (_to == address(0)) {
+            revert MintToZeroAddress();
+        }
+        if (_amount == 0) {
+            revert MintAmountZero();
+        }
+    }
+
+    /**
+     * @notice Create tokens, the recipient and the amount must be checked with
+     * enforceMintable and the minter allowance by the caller
+     * @param _minter The minter the tokens are minted by
+     * @param _to     The address that will receive the minted tokens
+     * @param _amount The amount of tokens to mint
+     */
+
+    function mint(
+        address _minter,
+        address _to,
+        uint256 _amount
+    ) internal {
+        AppStorage storage s = LibAppStorage.diamondStorage();
+        uint64 snapshotId = s.currentSnapshotId;
+        if (snapshotId > 0) {
+            LibSnapshot.updateTotalSupply(snapshotId, s.totalSupply);
+            LibSnapshot.updateBalance(snapshotId, _to, s.balances[_to]);
+        }
+
+        s.totalSupply = s.totalSupply + _amount;
+        s.balances[_to] = s.balances[_to] + _amount;
+        emit Mint(_minter, _to, _amount);
+        emit Transfer(address(0), _to, _amount);
+    }
+}
@@ -0,0 +1,82 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+/**
+ * @dev Errors of the token facets. Amounts are reported as the amount that
+ * was required followed by the amount that was available.
+ */
+
+error AlreadyInitialized();
+error TokenPaused();
+error AccountBlacklisted(address _account);
+
+error CallerNotMinter(address _caller);
+error CallerNotPauser(address _caller);
+error CallerNotBlacklister(address _caller);
+error CallerNotRescuer(address _caller);
+
+error NewPauserZeroAddress();
+error NewBlacklisterZeroAddress();
+error NewRescuerZeroAddress();
+
+error MintToZeroAddress();
+error MintAmountZero();
+error MintAmountExceedsMinterAllowance(
+    address _minter,
+    uint256 _amount,
+    uint256 _minterAllowance
+);
+
+error BurnAmountZero();
+error BurnAmountExceedsBalance(
+    address _account,
+    uint256 _amount,
+    uint256 _balance
+);
+
+error ApproveFromZeroAddress();
+error ApproveToZeroAddress();
+
+error TransferFromZeroAddress();
+error TransferToZeroAddress();
+error TransferAmountExceedsBalance(
+    address _account,
+    uint256 _value,
+    uint256 _balance
+);
+error TransferAmountExceedsAllowance(
+    address _owner,
+    address _spender,
+    uint256 _value,
+    uint256 _allowance
+);
+
+error PermitExpired(uint256 _deadline);
+error InvalidSigner(address _signer, address _expectedSigner);
+
+error CallerNotPayee(address _caller, address _payee);
+error AuthorizationNotYetValid(uint256 _validAfter);
+error AuthorizationExpired(uint256 _validBefore);
+error AuthorizationUsedOrCanceled(address _authorizer, bytes32 _nonce);
+
+error SnapshotIdZero();
+error NonexistentSnapshot(uint256 _snapshotId, uint256 _currentSnapshotId);
+error CheckpointValueOverflow(uint256 _value);
+
+error NotMinter(address _account);
+error DistributionNotFound(uint256 _distributionId);
+error DistributionAmountExceedsRemaining(
+    uint256 _distributionId,
+    uint256 _amount,
+    uint256 _remaining
+);
+error AlreadyClaimed(uint256 _distributionId, uint256 _index);
+error InvalidMerkleProof(uint256 _distributionId, uint256 _index);
+
+error ArrayLengthMismatch(uint256 _length, uint256 _otherLength);
+
+error InvalidPackedCalldataLength(uint256 _length, uint256 _expectedLength);
+
+error ReceiverNotContract(address _receiver);
+error TransferRejected(address _receiver);
+error ApprovalRejected(address _spender);
@@ -0,0 +1,52 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+import {IERC20} from "../interfaces/IERC20.sol";
+import {IERC1363Receiver} from "../interfaces/IERC1363Receiver.sol";
+import {IERC1363Spender} from "../interfaces/IERC1363Spender.sol";
+
+// Receiver and spender of transferAndCall and approveAndCall for the tests.
+// It records the calls, and with `accept` false returns a wrong value.
+
+contract ERC1363ReceiverMock is IERC1363Receiver, IERC1363Spender {
+    bool public accept = true;
+
+    event Received(
+        address operator,
+        address from,
+        uint256 value,
+        bytes data,
+        uint256 balance
+    );
+    event Approved(address owner, uint256 value, bytes data);
+
+    function setAccept(bool _accept) external {
+        accept = _accept;
+    }
+
+    function onTransferReceived(
+        address _operator,
+        address _from,
+        uint256 _value,
+        bytes calldata _data
+    ) external returns (bytes4) {
+        // the balance is already updated when the hook is called
+        emit Received(
+            _operator,
+            _from,
+            _value,
+            _data,
+            IERC20(msg.sender).balanceOf(address(this))
+        );
+        return accept ? this.onTransferReceived.selector : bytes4(0);
+    }
+
+    function onApprovalReceived(
+        address _owner,
+        uint256 _value,
+        bytes calldata _data
+    ) external returns (bytes4) {
+        emit Approved(_owner, _value, _data);
+        return accept ? this.onApprovalReceived.selector : bytes4(0);
+    }
+}
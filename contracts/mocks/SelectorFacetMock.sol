@@ -0,0 +1,9 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+// Facet of the synthetic selectors of the diamond scaling benchmark. Any
+// selector added with it as the facet succeeds and returns nothing.
+
+contract SelectorFacetMock {
+    fallback() external payable {}
+}
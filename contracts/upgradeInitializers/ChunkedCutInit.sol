@@ -0,0 +1,36 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+import {LibDiamond} from "../libraries/LibDiamond.sol";
+import {AppStorage, LibAppStorage} from "../libraries/LibAppStorage.sol";
+import "../libraries/TokenErrors.sol";
+
+// Pauses the token around a diamond cut split in chunks, see
+// scripts/chunked_cut.py. The first chunk is executed with pause() and the
+// last one with unpause(), which then calls the initialization function of
+// the cut, so the paused token functions can't run while the diamond has
+// only part of the cut:
+// diamondCut(firstChunk, chunkedCutInit, abi.encodeCall(ChunkedCutInit.pause, ()))
+// diamondCut(lastChunk, chunkedCutInit, abi.encodeCall(ChunkedCutInit.unpause, (init, calldata)))
+
+contract ChunkedCutInit {
+    event Pause();
+    event Unpause();
+
+    function pause() external {
+        AppStorage storage s = LibAppStorage.diamondStorage();
+        // a token paused by its pauser must stay paused after the cut, so it
+        // is cut without pause() and unpause()
+        if (s.paused) {
+            revert TokenPaused();
+        }
+        s.paused = true;
+        emit Pause();
+    }
+
+    function unpause(address _init, bytes calldata _calldata) external {
+        LibAppStorage.diamondStorage().paused = false;
+        emit Unpause();
+        LibDiamond.initializeDiamondCut(_init, _calldata);
+    }
+}
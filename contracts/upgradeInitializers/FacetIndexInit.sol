@@ -0,0 +1,41 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+import {LibDiamond} from "../libraries/LibDiamond.sol";
+
+error FacetIndexAlreadyExists();
+
+// Builds the facet index used by the loupe functions for diamonds that were
+// deployed before LibDiamond maintained it. Until it is executed, once, with
+// an empty cut, every other diamondCut reverts with FacetIndexNotInitialized:
+// diamondCut([], facetIndexInit, abi.encodeCall(FacetIndexInit.init, ()))
+
+contract FacetIndexInit {
+    function init() external {
+        LibDiamond.DiamondStorage storage ds = LibDiamond.diamondStorage();
+        if (ds.facetAddresses.length > 0) {
+            revert FacetIndexAlreadyExists();
+        }
+
+        uint256 selectorCount = ds.selectorCount;
+        bytes32 slot;
+        // loop through function selectors
+        for (
+            uint256 selectorIndex;
+            selectorIndex < selectorCount;
+            selectorIndex++
+        ) {
+            // "selectorIndex & 7" is a gas efficient modulo by eight "selectorIndex % 8"
+            uint256 selectorSlotIndex = selectorIndex & 7;
+            if (selectorSlotIndex == 0) {
+                // "selectorIndex >> 3" is a gas efficient division by 8 "selectorIndex / 8"
+                slot = ds.selectorSlots[selectorIndex >> 3];
+            }
+            bytes4 selector = bytes4(slot << (selectorSlotIndex << 5));
+            LibDiamond.addFacetSelector(
+                address(bytes20(ds.facets[selector])),
+                selector
+            );
+        }
+    }
+}
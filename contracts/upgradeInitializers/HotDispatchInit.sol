@@ -0,0 +1,67 @@
+// SPDX-License-Identifier: MIT
+pragma solidity 0.8.15;
+
+import {LibDiamond} from "../libraries/LibDiamond.sol";
+import {LibAppStorage} from "../libraries/LibAppStorage.sol";
+
+error NotHotDiamond();
+error InvalidHotSelectors();
+error HotSelectorNotOnHotFacet(bytes4 _selector);
+
+// Turns the bytecode dispatch of a HotDiamond off and on again. It is
+// executed with an empty cut:
+// diamondCut([], hotDispatchInit, abi.encodeCall(HotDispatchInit.disable, ()))
+// While it is off the hot selectors can be replaced or removed like any other
+// selector and the fallback looks them up in diamond storage. It can be
+// turned on again once every hot selector is served by the hot facet again.
+//
+// The flag is kept in diamond storage, where LibDiamond checks it, and copied
+// to the token storage slot of paused, where the fallback checks it.
+
+contract HotDispatchInit {
+    event HotDispatchDisabled();
+    event HotDispatchEnabled();
+
+    function disable() external {
+        LibDiamond.DiamondStorage storage ds = LibDiamond.diamondStorage();
+        if (ds.hotFacet == address(0)) {
+            revert NotHotDiamond();
+        }
+        ds.hotDispatchDisabled = true;
+        LibAppStorage.diamondStorage().hotDispatchDisabled = true;
+        emit HotDispatchDisabled();
+    }
+
+    // `_hotSelectors` are all the hot selectors of the HotDiamond
+    function enable(bytes4[] calldata _hotSelectors) external {
+        LibDiamond.DiamondStorage storage ds = LibDiamond.diamondStorage();
+        address hotFacet = ds.hotFacet;
+        if (hotFacet == address(0)) {
+            revert NotHotDiamond();
+        }
+        if (_hotSelectors.length != ds.hotSelectorCount) {
+            revert InvalidHotSelectors();
+        }
+        for (
+            uint256 selectorIndex;
+            selectorIndex < _hotSelectors.length;
+            selectorIndex++
+        ) {
+            bytes4 selector = _hotSelectors[selectorIndex];
+            if (!ds.hotSelectors[selector]) {
+                revert InvalidHotSelectors();
+            }
+            for (uint256 index; index < selectorIndex; index++) {
+                if (_hotSelectors[index] == selector) {
+                    revert InvalidHotSelectors();
+                }
+            }
+            if (address(bytes20(ds.facets[selector])) != hotFacet) {
+                revert HotSelectorNotOnHotFacet(selector);
+            }
+        }
+        ds.hotDispatchDisabled = false;
+        LibAppStorage.diamondStorage().hotDispatchDisabled = false;
+        emit HotDispatchEnabled();
+    }
+}
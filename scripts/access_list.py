@@ -0,0 +1,238 @@
+"""
+EIP-2930 access lists of TokenFacet transactions.
+
+The storage slots a call reads are computed from the call itself: the
+`ds.facets[msg.sig]` slot the diamond dispatches with, and the AppStorage
+slots of the paused flag, the balances, allowances, blacklist, nonces and
+authorization states of the accounts of the call. The facet address is read
+from the facets slot once per selector.
+
+An access list entry costs 2400 gas per address and 1900 per storage key,
+and saves 100 gas on every listed key and on every listed address that isn't
+warm already. The diamond is the `to` of the transaction, so its entry pays
+for itself from 24 keys on. The facet, called with DELEGATECALL, always
+saves 100. `AccessListBuilder.build` keeps the entries that lower the cost.
+"""
+
+from eth_utils import to_checksum_address
+
+from scripts.storage_layout import (
+    ALLOWED_SLOT,
+    AUTHORIZATION_STATES_SLOT,
+    BALANCES_SLOT,
+    BLACKLISTED_SLOT,
+    CURRENT_SNAPSHOT_ID_OFFSET,
+    DOMAIN_SEPARATOR_SLOT,
+    MINTER_ALLOWED_SLOT,
+    MINTERS_SLOT,
+    PAUSED_SLOT,
+    PERMIT_NONCES_SLOT,
+    PERMIT_NONCES_STORAGE_POSITION,
+    SNAPSHOT_STORAGE_POSITION,
+    TOTAL_SUPPLY_SLOT,
+    hex_slot,
+    mapping_slot,
+    selector_slot,
+    word,
+)
+
+ADDRESS_COST = 2400
+STORAGE_KEY_COST = 1900
+# cold minus warm access cost of an account or a storage slot, less the warm
+# access still paid by a listed one
+COLD_ACCESS_SAVING = 2600 - 100
+COLD_SLOAD_SAVING = 2100 - 100
+# precompiles, ecrecover is called by the signature checks
+PRECOMPILES = {to_checksum_address(f"0x{i:040x}") for i in range(1, 10)}
+
+
+def storage_keys(function, sender, args, snapshots=False):
+    """
+    AppStorage slots read by a TokenFacet call of `sender`, `args` are the
+    decoded arguments by name without their leading underscore.
+    """
+
+    def balance(account):
+        keys = [mapping_slot(word(account), BALANCES_SLOT)]
+        if snapshots:
+            keys.append(mapping_slot(word(account), SNAPSHOT_STORAGE_POSITION))
+        return keys
+
+    def blacklisted(*accounts):
+        return [mapping_slot(word(a), BLACKLISTED_SLOT) for a in accounts]
+
+    def allowed(owner, spender):
+        return [mapping_slot(word(spender), mapping_slot(word(owner), ALLOWED_SLOT))]
+
+    def total_supply():
+        keys = [TOTAL_SUPPLY_SLOT]
+        if snapshots:
+            keys.append(SNAPSHOT_STORAGE_POSITION + 1)
+        return keys
+
+    keys = [PAUSED_SLOT]
+    if function == "transfer":
+        keys += blacklisted(sender, args["to"])
+        keys += balance(sender) + balance(args["to"])
+    elif function == "transferFrom":
+        keys += blacklisted(sender, args["from"], args["to"])
+        keys += allowed(args["from"], sender)
+        keys += balance(args["from"]) + balance(args["to"])
+    elif function in ("approve", "increaseAllowance", "decreaseAllowance"):
+        keys += blacklisted(sender, args["spender"])
+        keys += allowed(sender, args["spender"])
+    elif function in ("permit", "permitWithKey"):
+        keys += blacklisted(args["owner"], args["spender"])
+        if args.get("key"):
+            keys.append(
+                mapping_slot(
+                    word(args["key"]),
+                    mapping_slot(word(args["owner"]), PERMIT_NONCES_STORAGE_POSITION),
+                )
+            )
+        else:
+            keys.append(mapping_slot(word(args["owner"]), PERMIT_NONCES_SLOT))
+        keys.append(DOMAIN_SEPARATOR_SLOT)
+        keys += allowed(args["owner"], args["spender"])
+    elif function in ("transferWithAuthorization", "receiveWithAuthorization"):
+        keys += blacklisted(args["from"], args["to"])
+        keys.append(
+            mapping_slot(
+                bytes(args["nonce"]),
+                mapping_slot(word(args["from"]), AUTHORIZATION_STATES_SLOT),
+            )
+        )
+        keys.append(DOMAIN_SEPARATOR_SLOT)
+        keys += balance(args["from"]) + balance(args["to"])
+    elif function == "mint":
+        keys.append(mapping_slot(word(sender), MINTERS_SLOT))
+        keys += blacklisted(sender, args["to"])
+        keys.append(mapping_slot(word(sender), MINTER_ALLOWED_SLOT))
+        keys += total_supply() + balance(args["to"])
+    elif function == "burn":
+        keys += blacklisted(sender)
+        keys += balance(sender) + total_supply()
+    else:
+        return []
+    return list(dict.fromkeys(keys))
+
+
+def entry_saving(address, keys, warm):
+    """Gas saved by an access list entry, negative if it costs more."""
+
+    saving = len(keys) * (COLD_SLOAD_SAVING - STORAGE_KEY_COST)
+    if address not in warm:
+        saving += COLD_ACCESS_SAVING
+    return saving - ADDRESS_COST
+
+
+class AccessListBuilder:
+    """Access lists of the TokenFacet calls of the diamond of `token_facet`, a web3 contract."""
+
+    def __init__(self, web3, token_facet):
+        self.web3 = web3
+        self.token_facet = token_facet
+        self.diamond = to_checksum_address(token_facet.address)
+        self.facets = {}
+
+    def facet_address(self, selector):
+        """Facet of a selector, the high 20 bytes of ds.facets[selector]."""
+
+        selector = bytes(selector)
+        if selector not in self.facets:
+            value = self.web3.eth.get_storage_at(self.diamond, selector_slot(selector))
+            self.facets[selector] = to_checksum_address(
+                bytes(value).rjust(32, b"\0")[:20]
+            )
+        return self.facets[selector]
+
+    def snapshots(self):
+        """True if a snapshot was taken, transfers then read checkpoints."""
+
+        value = int.from_bytes(
+            bytes(self.web3.eth.get_storage_at(self.diamond, PAUSED_SLOT)), "big"
+        )
+        return (value >> (8 * CURRENT_SNAPSHOT_ID_OFFSET)) & (2**64 - 1) > 0
+
+    def predict(self, tx, snapshots=None):
+        """Every address and storage key the transaction accesses."""
+
+        data = (
+            bytes.fromhex(tx["data"][2:]) if isinstance(tx["data"], str) else tx["data"]
+        )
+        selector = data[:4]
+        function, args = self.token_facet.decode_function_input(data)
+        args = {name.lstrip("_"): value for name, value in args.items()}
+        if snapshots is None:
+            snapshots = self.snapshots()
+        keys = [selector_slot(selector)] + storage_keys(
+            function.fn_name, tx["from"], args, snapshots
+        )
+        return [
+            {"address": self.diamond, "storageKeys": [hex_slot(k) for k in keys]},
+            {"address": self.facet_address(selector), "storageKeys": []},
+        ]
+
+    def access_list(self, tx, snapshots=None):
+        """The entries of `predict` that lower the cost of the transaction."""
+
+        warm = {to_checksum_address(tx["from"]), self.diamond} | PRECOMPILES
+        return [
+            entry
+            for entry in self.predict(tx, snapshots)
+            if entry_saving(entry["address"], entry["storageKeys"], warm) > 0
+        ]
+
+    def build(self, tx, snapshots=None):
+        """`tx` with an access list if one lowers its cost."""
+
+        access_list = self.access_list(tx, snapshots)
+        if not access_list:
+            return dict(tx)
+        return dict(tx, accessList=access_list)
+
+    def check(self, tx, block_identifier="latest"):
+        """
+        Compare `predict` with eth_createAccessList of the node. Returns the
+        storage keys by address missing from the prediction and the ones
+        predicted but not accessed.
+        """
+
+        result = self.web3.manager.request_blocking(
+            "eth_createAccessList",
+            [
+                {
+                    "from": tx["from"],
+                    "to": self.diamond,
+                    "data": tx["data"],
+                    **({"gas": hex(tx["gas"])} if "gas" in tx else {}),
+                },
+                block_identifier,
+            ],
+        )
+
+        def keys_by_address(access_list):
+            return {
+                to_checksum_address(entry["address"]): {
+                    int(key, 16) for key in entry["storageKeys"]
+                }
+                for entry in access_list
+            }
+
+        predicted = keys_by_address(self.predict(tx))
+        accessed = keys_by_address(result["accessList"])
+        missing, extra = {}, {}
+        for address in predicted.keys() | accessed.keys():
+            if accessed.get(address, set()) - predicted.get(address, set()):
+                missing[address] = sorted(
+                    accessed[address] - predicted.get(address, set())
+                )
+            if predicted.get(address, set()) - accessed.get(address, set()):
+                extra[address] = sorted(
+                    predicted[address] - accessed.get(address, set())
+                )
+        return {
+            "missing": missing,
+            "extra": extra,
+            "gasUsed": int(result["gasUsed"], 16),
+        }
@@ -0,0 +1,39 @@
+"""
+Admin transactions of the token of the last deployed diamond, recorded by
+the metrics of scripts/deploy.py.
+
+    brownie run scripts/admin.py mint <to> <amount>
+    brownie run scripts/admin.py blacklist <account>
+"""
+
+from brownie import Contract, Diamond, TokenFacet
+
+from scripts.deploy import get_account, get_metrics
+
+
+def token_facet():
+    return Contract.from_abi("TokenFacet", Diamond[-1].address, abi=TokenFacet.abi)
+
+
+def mint(to, amount):
+    tx = get_metrics().measure(
+        "mint", token_facet().mint, to, int(amount), {"from": get_account()}
+    )
+    print(f"Minted {amount} to {to}")
+    return tx
+
+
+def blacklist(account):
+    tx = get_metrics().measure(
+        "blacklist", token_facet().blacklist, account, {"from": get_account()}
+    )
+    print(f"Blacklisted {account}")
+    return tx
+
+
+def unblacklist(account):
+    tx = get_metrics().measure(
+        "unBlacklist", token_facet().unBlacklist, account, {"from": get_account()}
+    )
+    print(f"Removed {account} from the blacklist")
+    return tx
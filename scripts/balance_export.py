@@ -0,0 +1,261 @@
+"""
+Export of the balances of every holder at past blocks.
+
+The Transfer logs of the diamond, mints and burns included, are read in
+block ranges and decoded a range at a time into NumPy arrays: the addresses
+are mapped to dense integer IDs and the values are split into 32 bit limbs.
+The Settlement events of NettingSettlementFacet are read as their credits
+and debits. The running balances of all accounts are summed per limb with
+`np.bincount` and carried after every chunk of `CHUNK_ROWS` transfers, so
+the sums stay exact for any uint256 value, and memory grows with the number
+of accounts instead of the number of transfers.
+
+At every target block the balances are written to `balances_<block>.npy`,
+one row per account in ID order and one uint64 column per 64 bits of
+balance, and the sum of the balances is compared with `totalSupply()` at
+that block. `accounts.npy` holds the 20 bytes of every account, the zero
+address excluded, and `manifest.json` the blocks, totals and mismatches.
+The files are read memory-mapped with `read_balances`.
+
+    brownie run scripts/balance_export.py export_balances 17000000,17500000 balances --network mainnet
+"""
+
+import json
+import os
+
+import numpy as np
+from eth_abi import decode_abi
+from eth_utils import keccak, to_checksum_address
+
+TRANSFER = "0x" + keccak(text="Transfer(address,address,uint256)").hex()
+SETTLEMENT = (
+    "0x"
+    + keccak(text="Settlement(address,uint256,address[],uint256[],uint256[])").hex()
+)
+ZERO = b"\0" * 20
+# blocks of logs read at a time
+LOG_BLOCK_RANGE = 5000
+# transfers summed at a time, the float64 sums of np.bincount are exact up to
+# 2**53, so 2**21 limbs of 32 bits
+CHUNK_ROWS = 2**21
+LIMB_BITS = 32
+LIMB_MASK = (1 << LIMB_BITS) - 1
+
+
+def hex_string(value):
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return str(value).lower()
+
+
+def raw(value):
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    return bytes.fromhex(str(value)[2:])
+
+
+def limbs(values):
+    """(n, 8) little endian 32 bit limbs of n 32 byte big endian values."""
+
+    return np.frombuffer(values, dtype=">u4").reshape(-1, 8)[:, ::-1].astype(np.int64)
+
+
+def to_int(lanes):
+    """A Python integer from its little endian limbs."""
+
+    return sum(int(lane) << (LIMB_BITS * i) for i, lane in enumerate(lanes))
+
+
+class BalanceExport:
+    """Running balances of the holders of the diamond at `diamond_address`."""
+
+    def __init__(self, web3, diamond_address, from_block=0):
+        self.web3 = web3
+        self.diamond = to_checksum_address(diamond_address)
+        self.from_block = from_block
+        # the zero address, the counterpart of mints and burns, is ID 0
+        self.ids = {ZERO: 0}
+        self.accounts = [ZERO]
+        self.balances = np.zeros((1, 1), dtype=np.int64)
+        self.transfers = 0
+
+    def _logs(self, start, end):
+        """The Transfer and Settlement logs of a block range as transfers."""
+
+        logs = self.web3.eth.get_logs(
+            {
+                "address": self.diamond,
+                "fromBlock": start,
+                "toBlock": end,
+                "topics": [[TRANSFER, SETTLEMENT]],
+            }
+        )
+        senders, receivers, values = [], [], []
+        for log in logs:
+            if hex_string(log["topics"][0]) == TRANSFER:
+                senders.append(raw(log["topics"][1])[12:])
+                receivers.append(raw(log["topics"][2])[12:])
+                values.append(raw(log["data"]).rjust(32, b"\0"))
+                continue
+            # the balance changes of a settlement as transfers from and to
+            # the zero address, they cancel out for the zero address
+            _, accounts, credits, debits = decode_abi(
+                ["uint256", "address[]", "uint256[]", "uint256[]"], raw(log["data"])
+            )
+            for account, credit, debit in zip(accounts, credits, debits):
+                account = raw(account)
+                senders += [ZERO, account]
+                receivers += [account, ZERO]
+                values += [credit.to_bytes(32, "big"), debit.to_bytes(32, "big")]
+        return senders, receivers, values
+
+    def _ids(self, senders, receivers):
+        """Dense IDs of the addresses, the new ones are added."""
+
+        addresses = np.frombuffer(b"".join(senders + receivers), dtype="S20")
+        unique, inverse = np.unique(addresses, return_inverse=True)
+        unique_ids = np.empty(len(unique), dtype=np.int64)
+        for i, address in enumerate(unique):
+            # S20 items lose their trailing zero bytes
+            address = bytes(address).ljust(20, b"\0")
+            if address not in self.ids:
+                self.ids[address] = len(self.accounts)
+                self.accounts.append(address)
+            unique_ids[i] = self.ids[address]
+        ids = unique_ids[inverse]
+        return ids[: len(senders)], ids[len(senders) :]
+
+    def _grow(self, values):
+        """Room for the new accounts and limbs, with a spare limb for the carries."""
+
+        used = np.flatnonzero(values.any(axis=0))
+        lanes = max(self.balances.shape[1], (used[-1] + 2) if len(used) else 1)
+        self.balances = np.pad(
+            self.balances,
+            (
+                (0, len(self.accounts) - self.balances.shape[0]),
+                (0, lanes - self.balances.shape[1]),
+            ),
+        )
+
+    def apply(self, senders, receivers, values):
+        """Add transfers to the running balances."""
+
+        if not senders:
+            return
+        from_ids, to_ids = self._ids(senders, receivers)
+        values = limbs(b"".join(values))
+        self._grow(values)
+        accounts = self.balances.shape[0]
+        for start in range(0, len(from_ids), CHUNK_ROWS):
+            chunk = slice(start, start + CHUNK_ROWS)
+            # the spare lanes of the balances only receive carries
+            for lane in range(values.shape[1]):
+                weights = values[chunk, lane]
+                if not weights.any():
+                    continue
+                credits = np.bincount(to_ids[chunk], weights, minlength=accounts)
+                debits = np.bincount(from_ids[chunk], weights, minlength=accounts)
+                self.balances[:, lane] += (credits - debits).astype(np.int64)
+            self._carry()
+        self.transfers += len(from_ids)
+
+    def _carry(self):
+        for lane in range(self.balances.shape[1] - 1):
+            self.balances[:, lane + 1] += self.balances[:, lane] >> LIMB_BITS
+            self.balances[:, lane] &= LIMB_MASK
+
+    def total(self):
+        """Sum of the balances of the accounts but the zero address."""
+
+        return to_int(self.balances[1:].sum(axis=0))
+
+    def write(self, directory, block):
+        """Write the balances as `balances_<block>.npy` in uint64 words."""
+
+        lanes = self.balances[1:]
+        if lanes.shape[1] % 2:
+            lanes = np.pad(lanes, ((0, 0), (0, 1)))
+        words = lanes[:, 0::2].astype(np.uint64) | (
+            lanes[:, 1::2].astype(np.uint64) << np.uint64(LIMB_BITS)
+        )
+        np.save(os.path.join(directory, f"balances_{block}.npy"), words)
+
+    def run(self, blocks, directory, token_facet=None):
+        """
+        Export the balances at `blocks` to `directory`. With `token_facet`,
+        a brownie contract, the totals are compared with totalSupply().
+        Returns the mismatches as (block, total, totalSupply).
+        """
+
+        os.makedirs(directory, exist_ok=True)
+        blocks = sorted(set(blocks))
+        totals, mismatches = {}, []
+        start = self.from_block
+        for block in blocks:
+            while start <= block:
+                end = min(start + LOG_BLOCK_RANGE - 1, block)
+                self.apply(*self._logs(start, end))
+                start = end + 1
+            self.write(directory, block)
+            totals[block] = self.total()
+            if token_facet is not None:
+                total_supply = token_facet.totalSupply(block_identifier=block)
+                if total_supply != totals[block]:
+                    mismatches.append((block, totals[block], total_supply))
+            print(
+                f"Block {block}: {len(self.accounts) - 1} accounts, "
+                f"{self.transfers} transfers, total {totals[block]}"
+            )
+
+        np.save(
+            os.path.join(directory, "accounts.npy"),
+            np.frombuffer(b"".join(self.accounts[1:]), dtype=np.uint8).reshape(-1, 20),
+        )
+        with open(os.path.join(directory, "manifest.json"), "w") as f:
+            json.dump(
+                {
+                    "diamond": self.diamond,
+                    "from_block": self.from_block,
+                    "blocks": blocks,
+                    "accounts": len(self.accounts) - 1,
+                    "transfers": self.transfers,
+                    "totals": {str(block): str(totals[block]) for block in blocks},
+                    "mismatches": [[b, str(t), str(s)] for b, t, s in mismatches],
+                },
+                f,
+                indent=2,
+            )
+        return mismatches
+
+
+def read_balances(directory, block):
+    """
+    The exported balances at `block` by checksum address. The accounts that
+    first appear after `block` have no row in its file.
+    """
+
+    accounts = np.load(os.path.join(directory, "accounts.npy"), mmap_mode="r")
+    words = np.load(os.path.join(directory, f"balances_{block}.npy"), mmap_mode="r")
+    return {
+        to_checksum_address(accounts[i].tobytes()): sum(
+            int(word) << (64 * k) for k, word in enumerate(words[i])
+        )
+        for i in range(len(words))
+    }
+
+
+def export_balances(blocks, directory="balances", from_block=0):
+    """Export the balances of the holders of the last diamond at the comma separated `blocks`."""
+
+    from brownie import Contract, Diamond, TokenFacet, web3
+
+    diamond = Diamond[-1]
+    token_facet = Contract.from_abi("TokenFacet", diamond.address, abi=TokenFacet.abi)
+    export = BalanceExport(web3, diamond.address, int(from_block))
+    mismatches = export.run(
+        [int(block) for block in str(blocks).split(",")], directory, token_facet
+    )
+    for block, total, total_supply in mismatches:
+        print(f"Block {block}: total {total} != totalSupply() {total_supply}")
+    return mismatches
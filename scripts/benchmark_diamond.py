@@ -0,0 +1,272 @@
+"""
+Scaling of the diamond with its number of selectors.
+
+A bare diamond with the loupe is grown with synthetic selectors, spread over
+facets of `FACET_SELECTORS` selectors each, up to every size of `SIZES`. At
+each size the benchmark measures the gas of the fallback dispatch of the
+first and the last selector, the gas of a diamondCut that adds, replaces and
+removes `CUT_BATCH` selectors, and the gas and response size of the loupe
+functions. A loupe call that needs more than `RPC_GAS_CAP`, the default
+eth_call gas cap of geth, fails on public nodes.
+
+The results are written to `benchmarks/` and compared with
+`benchmarks/diamond-baseline.json`, and plotted if matplotlib is installed.
+
+    brownie run scripts/benchmark_diamond.py --network ganache-local
+    brownie run scripts/benchmark_diamond.py main true --network ganache-local
+"""
+
+import json
+import os
+
+from brownie import (
+    Diamond,
+    DiamondCutFacet,
+    DiamondLoupeFacet,
+    SelectorFacetMock,
+    interface,
+    web3,
+)
+from eth_utils import function_signature_to_4byte_selector, keccak
+
+from scripts.benchmark_gas import BENCHMARK_DIR, get_accounts, write_results
+from scripts.deploy import ZERO_ADDRESS, deployed
+
+SIZES = (10, 100, 250, 500, 1000, 2000)
+# synthetic selectors per facet
+FACET_SELECTORS = 50
+# selectors of a measured diamondCut
+CUT_BATCH = 50
+# default gas cap of eth_call in geth
+RPC_GAS_CAP = 50_000_000
+BASELINE = os.path.join(BENCHMARK_DIR, "diamond-baseline.json")
+
+# Add=0, Replace=1, Remove=2
+ADD, REPLACE, REMOVE = 0, 1, 2
+
+FACETS = function_signature_to_4byte_selector("facets()")
+FACETS_PAGE = function_signature_to_4byte_selector("facetsPaginated(uint256,uint256)")
+FACET_ADDRESSES = function_signature_to_4byte_selector("facetAddresses()")
+FACET_FUNCTION_SELECTORS = function_signature_to_4byte_selector(
+    "facetFunctionSelectors(address)"
+)
+
+
+def synthetic_selectors(start, count):
+    return [
+        "0x" + keccak(text=f"benchmark{i}()")[:4].hex()
+        for i in range(start, start + count)
+    ]
+
+
+def word(value):
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:]).rjust(32, b"\0")
+    return value.to_bytes(32, "big")
+
+
+def call_cost(diamond_address, data, sender):
+    """Gas and response size of a view call, None if it exceeds the gas cap."""
+
+    tx = {"from": sender.address, "to": diamond_address, "data": "0x" + data.hex()}
+    try:
+        gas = web3.eth.estimate_gas(dict(tx, gas=RPC_GAS_CAP))
+    except ValueError:
+        return {"gas": None, "bytes": None}
+    return {"gas": gas, "bytes": len(web3.eth.call(tx))}
+
+
+class ScalingBenchmark:
+    """A bare diamond grown with synthetic selectors."""
+
+    def __init__(self, account):
+        self.account = account
+        cut_facet = deployed(DiamondCutFacet, account)
+        self.loupe_facet = deployed(DiamondLoupeFacet, account)
+        self.diamond = Diamond.deploy(account, cut_facet, {"from": account})
+        # Diamond[-1] stays the token diamond of the other scripts
+        Diamond.remove(self.diamond)
+        self.diamond_cut = interface.IDiamondCut(self.diamond.address)
+        self.cut(
+            ADD,
+            self.loupe_facet.address,
+            [
+                "0x" + selector.hex()
+                for selector in (
+                    FACETS,
+                    FACETS_PAGE,
+                    FACET_ADDRESSES,
+                    FACET_FUNCTION_SELECTORS,
+                )
+            ],
+        )
+        # (facet, its synthetic selectors)
+        self.facets = []
+        self.size = 0
+        # replacement facet of the measured Replace cuts
+        self.other_facet = SelectorFacetMock.deploy({"from": account})
+
+    def cut(self, action, facet_address, selectors):
+        tx = self.diamond_cut.diamondCut(
+            [[facet_address, action, selectors]],
+            ZERO_ADDRESS,
+            b"",
+            {"from": self.account},
+        )
+        tx.wait(1)
+        return tx.gas_used
+
+    def grow(self, size):
+        """Add synthetic selectors until the diamond has `size` of them."""
+
+        while self.size < size:
+            if not self.facets or len(self.facets[-1][1]) == FACET_SELECTORS:
+                facet = SelectorFacetMock.deploy({"from": self.account})
+                self.facets.append((facet.address, []))
+            facet_address, selectors = self.facets[-1]
+            count = min(FACET_SELECTORS - len(selectors), size - self.size)
+            new_selectors = synthetic_selectors(self.size, count)
+            self.cut(ADD, facet_address, new_selectors)
+            selectors += new_selectors
+            self.size += count
+
+    def dispatch_gas(self, selector):
+        return web3.eth.estimate_gas(
+            {"from": self.account.address, "to": self.diamond.address, "data": selector}
+        )
+
+    def cut_gas(self):
+        """Gas of Add, Replace and Remove cuts of `CUT_BATCH` selectors, the size is kept."""
+
+        selectors = synthetic_selectors(10**9 + self.size, CUT_BATCH)
+        facet_address = self.facets[-1][0]
+        return {
+            "add": self.cut(ADD, facet_address, selectors),
+            "replace": self.cut(REPLACE, self.other_facet.address, selectors),
+            "remove": self.cut(REMOVE, ZERO_ADDRESS, selectors),
+        }
+
+    def measure(self):
+        address = self.diamond.address
+        first = self.facets[0][1][0]
+        last = self.facets[-1][1][-1]
+        return {
+            "selectors": self.size,
+            "facets": len(self.facets),
+            "dispatch_first": self.dispatch_gas(first),
+            "dispatch_last": self.dispatch_gas(last),
+            "cut": self.cut_gas(),
+            "facets()": call_cost(address, FACETS, self.account),
+            "facetsPaginated(0,10)": call_cost(
+                address, FACETS_PAGE + word(0) + word(10), self.account
+            ),
+            "facetAddresses()": call_cost(address, FACET_ADDRESSES, self.account),
+            "facetFunctionSelectors()": call_cost(
+                address,
+                FACET_FUNCTION_SELECTORS + word(self.facets[-1][0]),
+                self.account,
+            ),
+        }
+
+    def run(self, sizes=SIZES):
+        results = []
+        for size in sorted(sizes):
+            self.grow(size)
+            results.append(self.measure())
+            print_result(results[-1])
+        return results
+
+
+def print_result(result):
+    def gas(call):
+        cost = result[call]
+        if cost["gas"] is None:
+            return f"{'over cap':>12}"
+        return f"{cost['gas']:>12}{cost['bytes']:>9}"
+
+    print(
+        f"{result['selectors']} selectors in {result['facets']} facets: "
+        f"dispatch {result['dispatch_first']}/{result['dispatch_last']}, "
+        f"cut add {result['cut']['add']} replace {result['cut']['replace']} "
+        f"remove {result['cut']['remove']}"
+    )
+    for call in (
+        "facets()",
+        "facetsPaginated(0,10)",
+        "facetAddresses()",
+        "facetFunctionSelectors()",
+    ):
+        print(f"    {call:<28}{gas(call)}")
+
+
+def compare(baseline, results):
+    """Print the gas changes from the baseline at the sizes of both."""
+
+    baseline = {result["selectors"]: result for result in baseline}
+    print(f"{'selectors':>10} {'measure':<28}{'baseline':>12}{'now':>12}")
+    for result in results:
+        base = baseline.get(result["selectors"])
+        if base is None:
+            continue
+        rows = [
+            ("dispatch_last", base["dispatch_last"], result["dispatch_last"]),
+        ]
+        rows += [(f"cut {k}", base["cut"][k], v) for k, v in result["cut"].items()]
+        rows += [
+            (call, base[call]["gas"], result[call]["gas"])
+            for call in result
+            if call.endswith(")")
+        ]
+        for name, before, now in rows:
+            if before != now:
+                print(f"{result['selectors']:>10} {name:<28}{before!s:>12}{now!s:>12}")
+
+
+def plot(results, path):
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib isn't installed, no plot")
+        return
+
+    sizes = [result["selectors"] for result in results]
+    figure, (cut_axis, loupe_axis) = plt.subplots(1, 2, figsize=(12, 5))
+    cut_axis.plot(sizes, [r["dispatch_last"] for r in results], label="dispatch")
+    for action in ("add", "replace", "remove"):
+        cut_axis.plot(
+            sizes,
+            [r["cut"][action] / CUT_BATCH for r in results],
+            label=f"cut {action} / selector",
+        )
+    cut_axis.set_xlabel("selectors")
+    cut_axis.set_ylabel("gas")
+    cut_axis.legend()
+    for call in ("facets()", "facetAddresses()", "facetFunctionSelectors()"):
+        loupe_axis.plot(sizes, [r[call]["gas"] for r in results], label=call)
+    loupe_axis.axhline(RPC_GAS_CAP, linestyle="--", color="grey", label="eth_call cap")
+    loupe_axis.set_xlabel("selectors")
+    loupe_axis.set_ylabel("gas")
+    loupe_axis.set_yscale("log")
+    loupe_axis.legend()
+    figure.tight_layout()
+    figure.savefig(path)
+    print(f"Plot written to {path}")
+
+
+def main(save_baseline="false"):
+    account, _ = get_accounts()
+    results = ScalingBenchmark(account).run()
+
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            compare(json.load(f), results)
+    write_results("diamond", results)
+    plot(results, os.path.join(BENCHMARK_DIR, "diamond.png"))
+    if save_baseline.lower() == "true":
+        with open(BASELINE, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {BASELINE}")
+    return results
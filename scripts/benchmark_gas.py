@@ -0,0 +1,363 @@
+import json
+import os
+import time
+
+from brownie import (
+    accounts,
+    config,
+    history,
+    network,
+    project,
+    web3,
+    Contract,
+    PackedCalldataFacet,
+    SnapshotFacet,
+    TokenFacet,
+)
+from brownie.exceptions import VirtualMachineError
+from eth_account import Account
+
+from scripts.deploy import add_facet, deploy_diamond
+from scripts.lean_client import LeanClient
+from scripts.packed_calldata import (
+    calldata_gas,
+    encode_transfer,
+    encode_transfer_from,
+    encode_transfer_with_authorization,
+)
+
+BENCHMARK_DIR = "benchmarks"
+# bytecode sizes and revert gas that `main` compares with, saved by `main true`
+# on an earlier tree, such as the one with revert strings before the custom errors
+BASELINE = os.path.join(BENCHMARK_DIR, "gas-baseline.json")
+# Gas limit of the reverting transactions, they skip gas estimation
+REVERT_GAS_LIMIT = 200000
+
+
+def get_accounts():
+    networks = config["networks"][network.show_active()]
+    account = accounts.add(networks["from_key"])
+    other_account = accounts.add(networks["other_key"])
+    return account, other_account
+
+
+def fund(token_facet, account, amount):
+    token_facet.configureMinter(account, amount, {"from": account}).wait(1)
+    token_facet.mint(account, amount, {"from": account}).wait(1)
+
+
+def call_gas(contract_address, data, sender):
+    return web3.eth.estimate_gas(
+        {"from": sender.address, "to": contract_address, "data": data}
+    )
+
+
+def measure_token_calls(diamond_address):
+    """
+    Gas used by TokenFacet calls through the diamond at `diamond_address`:
+    the hot calls of a HotDiamond, then increaseAllowance and balanceOf that
+    a HotDiamond looks up in diamond storage like a Diamond.
+    """
+
+    account, other_account = get_accounts()
+    token_facet = Contract.from_abi("TokenFacet", diamond_address, abi=TokenFacet.abi)
+    amount = 10 * 10 ** config["token"]["decimals"]
+    fund(token_facet, account, amount)
+
+    gas = {}
+    # warm up the recipient balance so every variant pays the same SSTORE costs
+    token_facet.transfer(other_account, 1, {"from": account}).wait(1)
+    tx = token_facet.transfer(other_account, 1, {"from": account})
+    gas["transfer"] = tx.gas_used
+    tx = token_facet.approve(other_account, amount, {"from": account})
+    gas["approve"] = tx.gas_used
+    tx = token_facet.transferFrom(account, other_account, 1, {"from": other_account})
+    gas["transferFrom"] = tx.gas_used
+    tx = token_facet.increaseAllowance(other_account, 1, {"from": account})
+    gas["increaseAllowance"] = tx.gas_used
+    gas["balanceOf"] = call_gas(
+        diamond_address, token_facet.balanceOf.encode_input(account), account
+    )
+    return gas
+
+
+def revert_gas(contract_function, *args, sender):
+    """Gas used by a transaction that reverts."""
+
+    try:
+        contract_function(
+            *args,
+            {"from": sender, "gas_limit": REVERT_GAS_LIMIT, "allow_revert": True},
+        )
+    except VirtualMachineError:
+        pass
+    return history[-1].gas_used
+
+
+def measure_token_reverts(diamond_address):
+    """Gas used by TokenFacet calls that revert through the diamond at `diamond_address`."""
+
+    account, other_account = get_accounts()
+    token_facet = Contract.from_abi("TokenFacet", diamond_address, abi=TokenFacet.abi)
+    # more than any balance or allowance
+    value = 2**256 - 1
+
+    return {
+        "transfer_exceeds_balance": revert_gas(
+            token_facet.transfer, other_account, value, sender=account
+        ),
+        "transfer_to_zero_address": revert_gas(
+            token_facet.transfer, f"0x{'0' * 40}", 1, sender=account
+        ),
+        "transferFrom_exceeds_allowance": revert_gas(
+            token_facet.transferFrom,
+            account,
+            other_account,
+            value,
+            sender=other_account,
+        ),
+        "pause_not_pauser": revert_gas(token_facet.pause, sender=other_account),
+    }
+
+
+def bytecode_sizes():
+    """Runtime bytecode size in bytes of every contract of the project."""
+
+    sizes = {}
+    for loaded_project in project.get_loaded_projects():
+        for container in loaded_project:
+            deployed_bytecode = container._build.get("deployedBytecode", "")
+            if deployed_bytecode:
+                sizes[container._name] = len(deployed_bytecode) // 2
+    return sizes
+
+
+def write_results(name, results):
+    os.makedirs(BENCHMARK_DIR, exist_ok=True)
+    path = os.path.join(BENCHMARK_DIR, f"{name}-{int(time.time())}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {path}")
+
+
+def print_comparison(title, baseline, candidate):
+    print(title)
+    print(f"{'call':<32}{'baseline':>12}{'candidate':>12}{'saving':>10}")
+    for call, baseline_gas in baseline.items():
+        candidate_gas = candidate[call]
+        print(
+            f"{call:<32}{baseline_gas:>12}{candidate_gas:>12}"
+            f"{baseline_gas - candidate_gas:>10}"
+        )
+
+
+def compare(baseline, results):
+    """
+    Print the savings in bytecode size and revert gas from the baseline, for
+    the contracts and reverts measured in both, and return them.
+    """
+
+    savings = {}
+    for measure, title in (
+        ("bytecode_sizes", "Runtime bytecode size in bytes"),
+        ("reverts", "Revert gas"),
+    ):
+        base = {
+            name: value
+            for name, value in baseline.get(measure, {}).items()
+            if name in results[measure]
+        }
+        print_comparison(title, base, results[measure])
+        savings[measure] = {
+            name: value - results[measure][name] for name, value in base.items()
+        }
+    return savings
+
+
+def hot_dispatch():
+    diamond_gas = measure_token_calls(deploy_diamond())
+    hot_diamond_gas = measure_token_calls(deploy_diamond(hot=True))
+    # the calls after the hot ones cost the same plus the check of the hot
+    # selectors, a few dozen gas
+    print_comparison("Diamond vs HotDiamond dispatch", diamond_gas, hot_diamond_gas)
+    return {"Diamond": diamond_gas, "HotDiamond": hot_diamond_gas}
+
+
+def reverts():
+    diamond_address = deploy_diamond()
+    measure_token_calls(diamond_address)
+    gas = measure_token_reverts(diamond_address)
+    print(f"{'revert':<32}{'gas':>10}")
+    for call, gas_used in gas.items():
+        print(f"{call:<32}{gas_used:>10}")
+    return gas
+
+
+def snapshots():
+    """Transfer gas without snapshots, on the first change and on later changes in a snapshot."""
+
+    account, other_account = get_accounts()
+    diamond_address = deploy_diamond()
+    measure_token_calls(diamond_address)
+    token_facet = Contract.from_abi("TokenFacet", diamond_address, abi=TokenFacet.abi)
+    add_facet(diamond_address, SnapshotFacet, account)
+    snapshot_facet = Contract.from_abi(
+        "SnapshotFacet", diamond_address, abi=SnapshotFacet.abi
+    )
+
+    gas = {}
+    tx = token_facet.transfer(other_account, 1, {"from": account})
+    gas["no_snapshot"] = tx.gas_used
+    snapshot_facet.snapshot({"from": account}).wait(1)
+    tx = token_facet.transfer(other_account, 1, {"from": account})
+    gas["first_change_in_snapshot"] = tx.gas_used
+    tx = token_facet.transfer(other_account, 1, {"from": account})
+    gas["later_change_in_snapshot"] = tx.gas_used
+
+    print(f"{'transfer':<32}{'gas':>10}")
+    for case, gas_used in gas.items():
+        print(f"{case:<32}{gas_used:>10}")
+    return gas
+
+
+def calldata():
+    """Calldata bytes and gas of TokenFacet calls and their packed versions."""
+
+    account, other_account = get_accounts()
+    diamond_address = deploy_diamond()
+    measure_token_calls(diamond_address)
+    token_facet = Contract.from_abi("TokenFacet", diamond_address, abi=TokenFacet.abi)
+    add_facet(diamond_address, PackedCalldataFacet, account)
+
+    value = 10 ** config["token"]["decimals"]
+    valid_before = int(time.time()) + 3600
+    nonce, r, s = os.urandom(32), os.urandom(32), os.urandom(32)
+    authorization = (account, other_account, value, 0, valid_before, nonce, 27, r, s)
+    calls = {
+        "transfer": (
+            token_facet.transfer.encode_input(other_account, value),
+            encode_transfer(other_account, value),
+        ),
+        "transferFrom": (
+            token_facet.transferFrom.encode_input(account, other_account, value),
+            encode_transfer_from(account, other_account, value),
+        ),
+        "transferWithAuthorization": (
+            token_facet.transferWithAuthorization.encode_input(*authorization),
+            encode_transfer_with_authorization(*authorization),
+        ),
+    }
+
+    results = {}
+    print(f"{'call':<28}{'bytes':>8}{'packed':>8}{'gas':>8}{'packed':>8}")
+    for call, (standard, packed) in calls.items():
+        results[call] = {
+            "bytes": len(standard) // 2 - 1,
+            "packed_bytes": len(packed) // 2 - 1,
+            "calldata_gas": calldata_gas(standard),
+            "packed_calldata_gas": calldata_gas(packed),
+        }
+        result = results[call]
+        print(
+            f"{call:<28}{result['bytes']:>8}{result['packed_bytes']:>8}"
+            f"{result['calldata_gas']:>8}{result['packed_calldata_gas']:>8}"
+        )
+
+    # gas used including execution, the allowance is set by measure_token_calls
+    for call in ("transfer", "transferFrom"):
+        sender = account if call == "transfer" else other_account
+        standard, packed = calls[call]
+        results[call]["gas_used"] = sender.transfer(
+            diamond_address, data=standard
+        ).gas_used
+        results[call]["packed_gas_used"] = sender.transfer(
+            diamond_address, data=packed
+        ).gas_used
+    return results
+
+
+def client(count=200):
+    """Python time to encode and sign a transfer, through brownie and with LeanClient."""
+
+    count = int(count)
+    account, other_account = get_accounts()
+    diamond_address = deploy_diamond()
+    measure_token_calls(diamond_address)
+    private_key = config["networks"][network.show_active()]["from_key"]
+
+    def per_transaction(function):
+        start = time.perf_counter()
+        for _ in range(count):
+            function()
+        return (time.perf_counter() - start) / count * 10**6
+
+    def brownie_path():
+        # what a Contract.from_abi(...).transfer(...) call does before sending
+        token_facet = Contract.from_abi(
+            "TokenFacet", diamond_address, abi=TokenFacet.abi
+        )
+        data = token_facet.transfer.encode_input(other_account, 1)
+        tx = {
+            "from": account.address,
+            "to": diamond_address,
+            "data": data,
+            "value": 0,
+            "nonce": web3.eth.get_transaction_count(account.address),
+            "gasPrice": web3.eth.gas_price,
+            "chainId": web3.eth.chain_id,
+        }
+        tx["gas"] = web3.eth.estimate_gas(tx)
+        Account.sign_transaction(tx, private_key)
+
+    lean_client = LeanClient(web3, diamond_address, private_key)
+    results = {
+        "brownie_us": per_transaction(brownie_path),
+        "lean_us": per_transaction(
+            lambda: lean_client.sign("transfer", other_account, 1)
+        ),
+    }
+
+    # the signed transactions are valid: send a batch of them
+    lean_client.sync_nonce()
+    start = time.perf_counter()
+    hashes = lean_client.submit([("transfer", (other_account, 1))] * count)
+    results["lean_submit_us"] = (time.perf_counter() - start) / count * 10**6
+    receipt = web3.eth.wait_for_transaction_receipt(hashes[-1])
+    results["lean_status"] = receipt["status"]
+
+    print(f"{'path':<24}{'us/tx':>10}")
+    for path in ("brownie_us", "lean_us", "lean_submit_us"):
+        print(f"{path:<24}{results[path]:>10.0f}")
+    return results
+
+
+def main(save_baseline="false"):
+    sizes = bytecode_sizes()
+    print(f"{'contract':<24}{'bytes':>10}")
+    for name, size in sorted(sizes.items()):
+        print(f"{name:<24}{size:>10}")
+
+    results = {
+        "network": network.show_active(),
+        "bytecode_sizes": sizes,
+        "hot_dispatch": hot_dispatch(),
+        "reverts": reverts(),
+        "snapshots": snapshots(),
+        "calldata": calldata(),
+        "client": client(),
+    }
+    if os.path.exists(BASELINE):
+        with open(BASELINE) as f:
+            results["baseline_savings"] = compare(json.load(f), results)
+    write_results("gas", results)
+    if save_baseline.lower() == "true":
+        with open(BASELINE, "w") as f:
+            json.dump(
+                {
+                    measure: results[measure]
+                    for measure in ("bytecode_sizes", "reverts")
+                },
+                f,
+                indent=2,
+            )
+        print(f"Baseline written to {BASELINE}")
@@ -0,0 +1,269 @@
+"""
+Synchronizes the blacklist of the token with a compliance feed.
+
+The on-chain blacklist is rebuilt from the Blacklisted and UnBlacklisted
+logs of the diamond and compared with the feed in memory, so only the
+addresses that change are sent, as `blacklist` and `unBlacklist`
+transactions signed locally with consecutive nonces and sent `window` at a
+time without waiting for each other. A run compares the feed with the mined
+state, so a run that stopped part way is finished by running it again.
+
+With a state file, the blacklist is saved with the block it was replayed to,
+`CONFIRMATIONS` blocks behind the head so a reorg can't change it, and the
+next run reads only the logs after that block.
+
+    brownie run scripts/blacklist_sync.py sync_blacklist feed.csv other_key --network NETWORK
+"""
+
+import csv
+import json
+import os
+import time
+
+from eth_account import Account
+from eth_utils import (
+    function_signature_to_4byte_selector,
+    is_address,
+    keccak,
+    to_canonical_address,
+    to_checksum_address,
+)
+from web3.exceptions import TimeExhausted
+
+BLACKLISTED = "0x" + keccak(text="Blacklisted(address)").hex()
+UNBLACKLISTED = "0x" + keccak(text="UnBlacklisted(address)").hex()
+BLACKLIST = function_signature_to_4byte_selector("blacklist(address)")
+UNBLACKLIST = function_signature_to_4byte_selector("unBlacklist(address)")
+# blocks of logs read at a time
+LOG_BLOCK_RANGE = 5000
+# transactions sent before waiting for the oldest one
+WINDOW = 16
+# margin over the estimated gas of the first change
+GAS_MARGIN = 1.2
+# blocks behind the head of the saved blacklist
+CONFIRMATIONS = 12
+
+
+def hex_string(value):
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return str(value).lower()
+
+
+def read_feed(path):
+    """The set of addresses of the first column of a CSV file."""
+
+    addresses = set()
+    with open(path, newline="") as f:
+        for line, row in enumerate(csv.reader(f), 1):
+            if not row or not row[0].strip() or row[0].strip().lower() == "address":
+                continue
+            address = row[0].strip()
+            if not is_address(address):
+                raise ValueError(f"Invalid address {address!r} on line {line}")
+            addresses.add(to_checksum_address(address))
+    return addresses
+
+
+def calldata(selector, address):
+    return selector + to_canonical_address(address).rjust(32, b"\0")
+
+
+class BlacklistSync:
+    """Blacklist of the diamond at `diamond_address` kept equal to a feed."""
+
+    def __init__(
+        self,
+        web3,
+        diamond_address,
+        private_key,
+        from_block=0,
+        window=WINDOW,
+        state_path=None,
+    ):
+        self.web3 = web3
+        self.diamond = to_checksum_address(diamond_address)
+        self.account = Account.from_key(private_key)
+        self.from_block = from_block
+        self.window = window
+        self.state_path = state_path
+        self.log_requests = 0
+
+    def _replay(self, blacklisted, from_block, to_block):
+        """Apply the logs of `from_block` to `to_block` to the `blacklisted` set."""
+
+        for start in range(from_block, to_block + 1, LOG_BLOCK_RANGE):
+            logs = self.web3.eth.get_logs(
+                {
+                    "address": self.diamond,
+                    "fromBlock": start,
+                    "toBlock": min(start + LOG_BLOCK_RANGE - 1, to_block),
+                    "topics": [[BLACKLISTED, UNBLACKLISTED]],
+                }
+            )
+            self.log_requests += 1
+            # logs are in block and log index order
+            for log in logs:
+                account = to_checksum_address("0x" + hex_string(log["topics"][1])[-40:])
+                if hex_string(log["topics"][0]) == BLACKLISTED:
+                    blacklisted.add(account)
+                else:
+                    blacklisted.discard(account)
+
+    def load_state(self):
+        """The saved blacklist and its block, None without a state of the diamond."""
+
+        if not self.state_path or not os.path.exists(self.state_path):
+            return None
+        with open(self.state_path) as f:
+            state = json.load(f)
+        if state["diamond"] != self.diamond or state["block"] < self.from_block - 1:
+            return None
+        return set(state["blacklisted"]), state["block"]
+
+    def save_state(self, blacklisted, block):
+        if not self.state_path:
+            return
+        path = f"{self.state_path}.tmp"
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "diamond": self.diamond,
+                    "block": block,
+                    "blacklisted": sorted(blacklisted),
+                },
+                f,
+            )
+        os.replace(path, self.state_path)
+
+    def onchain(self, to_block):
+        """
+        The blacklisted addresses at `to_block`, replayed from the logs after
+        the saved state.
+        """
+
+        blacklisted, synced = set(), self.from_block - 1
+        state = self.load_state()
+        if state is not None and state[1] <= to_block:
+            blacklisted, synced = state
+        confirmed = to_block - CONFIRMATIONS
+        if confirmed > synced:
+            self._replay(blacklisted, synced + 1, confirmed)
+            synced = confirmed
+            self.save_state(blacklisted, synced)
+        self._replay(blacklisted, synced + 1, to_block)
+        return blacklisted
+
+    def plan(self, feed, to_block=None):
+        """The addresses to blacklist and to remove from the blacklist, sorted."""
+
+        if to_block is None:
+            to_block = self.web3.eth.block_number
+        blacklisted = self.onchain(to_block)
+        return sorted(feed - blacklisted), sorted(blacklisted - feed)
+
+    def submit(self, changes):
+        """
+        Send the (selector, address) `changes` with consecutive nonces,
+        `window` transactions ahead of the mined ones. Stops at the first
+        change that reverts or isn't mined in time. Returns the receipts of
+        the mined changes.
+        """
+
+        if not changes:
+            return []
+        nonce = self.web3.eth.get_transaction_count(self.account.address, "pending")
+        chain_id = self.web3.eth.chain_id
+        gas_price = self.web3.eth.gas_price
+        selector, address = changes[0]
+        gas = int(
+            self.web3.eth.estimate_gas(
+                {
+                    "from": self.account.address,
+                    "to": self.diamond,
+                    "data": "0x" + calldata(selector, address).hex(),
+                }
+            )
+            * GAS_MARGIN
+        )
+
+        sent, receipts = [], []
+        for selector, address in changes:
+            signed = self.account.sign_transaction(
+                {
+                    "to": self.diamond,
+                    "data": calldata(selector, address),
+                    "value": 0,
+                    "nonce": nonce,
+                    "gas": gas,
+                    "gasPrice": gas_price,
+                    "chainId": chain_id,
+                }
+            )
+            sent.append(
+                (
+                    address,
+                    nonce,
+                    self.web3.eth.send_raw_transaction(signed.rawTransaction),
+                )
+            )
+            nonce += 1
+            if len(sent) >= self.window and not self._wait(sent, receipts):
+                return receipts
+        while sent:
+            if not self._wait(sent, receipts):
+                break
+        return receipts
+
+    def _wait(self, sent, receipts):
+        address, nonce, tx_hash = sent.pop(0)
+        try:
+            receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
+        except TimeExhausted:
+            print(
+                f"Change of {address} not mined in {hex_string(tx_hash)} with nonce "
+                f"{nonce}, run again once it is mined or replaced"
+            )
+            return False
+        if receipt["status"] != 1:
+            print(f"Change of {address} reverted in {hex_string(tx_hash)}, run again")
+            return False
+        receipts.append(receipt)
+        return True
+
+    def run(self, feed):
+        """Apply the diff of the feed, returns the numbers of added and removed addresses."""
+
+        started = time.perf_counter()
+        add, remove = self.plan(feed)
+        print(
+            f"{len(feed)} addresses in the feed, {len(add)} to blacklist, "
+            f"{len(remove)} to remove"
+        )
+        changes = [(BLACKLIST, a) for a in add] + [(UNBLACKLIST, a) for a in remove]
+        receipts = self.submit(changes)
+        print(
+            f"Applied {len(receipts)} of {len(changes)} changes in "
+            f"{time.perf_counter() - started:.1f}s"
+        )
+        return len(add), len(remove)
+
+
+def sync_blacklist(path, key="other_key", from_block=0, state_path=None):
+    """
+    Sync the blacklist of the last diamond with the feed, signed by the `key`
+    account. The blacklist is saved to `state_path`, `<path>.state.json` by
+    default, and the next run resumes from it.
+    """
+
+    from brownie import Diamond, config, network, web3
+
+    private_key = config["networks"][network.show_active()][key]
+    sync = BlacklistSync(
+        web3,
+        Diamond[-1].address,
+        private_key,
+        int(from_block),
+        state_path=state_path or f"{path}.state.json",
+    )
+    return sync.run(read_feed(path))
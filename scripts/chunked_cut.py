@@ -0,0 +1,277 @@
+"""
+Planner of the diamond cuts too large for one transaction.
+
+The cut is split in chunks of selectors in order, and every chunk is sent as
+a diamondCut. Add, Replace and Remove cost different amounts, so the gas of
+each action is estimated for one selector and for `PROBE_SELECTORS`
+selectors, and the chunks are sized so every diamondCut stays under the gas
+budget, a share of the block gas limit by default.
+
+The diamond has only part of the cut until the last chunk is mined, so the
+chunks are applied with the token paused: the first chunk pauses it with
+ChunkedCutInit.pause and the last one unpauses it with ChunkedCutInit.unpause,
+which then calls the initialization function of the cut, if any. A token
+already paused by its pauser is cut without them and stays paused.
+
+A run that stopped part way resumes after the chunks the loupe shows as
+applied. `upgrade` saves the facet it deployed and the chunks in a state
+file, so running it again reuses them and the token is unpaused by the same
+last chunk.
+
+    brownie run scripts/chunked_cut.py upgrade TokenFacet --network NETWORK
+"""
+
+import json
+import os
+from fractions import Fraction
+
+ZERO_ADDRESS = f"0x{'0' * 40}"
+# Add=0, Replace=1, Remove=2
+ADD, REPLACE, REMOVE = 0, 1, 2
+# share of the block gas limit a diamondCut can use
+BLOCK_GAS_SHARE = 0.5
+# selectors of the chunk that measures the gas of a selector
+PROBE_SELECTORS = 16
+# margin over the estimated gas
+GAS_MARGIN = 1.2
+
+
+def selector_bytes(selector):
+    if isinstance(selector, str):
+        return bytes.fromhex(selector[2:])
+    return bytes(selector)
+
+
+def normalize(cut):
+    """(facet address, action, selectors as bytes) of every facet of a cut."""
+
+    return [
+        (str(facet_address), int(action), [selector_bytes(s) for s in selectors])
+        for facet_address, action, selectors in cut
+        if selectors
+    ]
+
+
+def chunk_cut(cut, max_selectors):
+    """
+    Split a cut in chunks in order. `max_selectors` is the number of selectors
+    of a chunk, or a dict of it for every action of the cut: a chunk with
+    several actions holds the same share of the gas budget.
+    """
+
+    if not isinstance(max_selectors, dict):
+        max_selectors = {action: max_selectors for action in (ADD, REPLACE, REMOVE)}
+    # share of the gas budget used by the chunk
+    chunks, chunk, used = [], [], Fraction(0)
+    for facet_address, action, selectors in normalize(cut):
+        limit = max_selectors[action]
+        start = 0
+        while start < len(selectors):
+            count = min(len(selectors) - start, int((1 - used) * limit))
+            if count:
+                chunk.append((facet_address, action, selectors[start : start + count]))
+                used += Fraction(count, limit)
+                start += count
+            if not count or used == 1:
+                chunks.append(chunk)
+                chunk, used = [], Fraction(0)
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+class ChunkedCutPlanner:
+    """
+    Chunked cuts of the diamond of `diamond_cut` and `diamond_loupe`, brownie
+    contracts at the diamond. `cut_init` is the ChunkedCutInit that pauses the
+    token around the chunks.
+    """
+
+    def __init__(
+        self, diamond_cut, diamond_loupe, account, cut_init=None, gas_budget=None
+    ):
+        from brownie import web3
+
+        self.diamond_cut = diamond_cut
+        self.diamond_loupe = diamond_loupe
+        self.account = account
+        self.cut_init = cut_init
+        self.block_gas_limit = web3.eth.get_block("latest")["gasLimit"]
+        if gas_budget is None:
+            gas_budget = int(self.block_gas_limit * BLOCK_GAS_SHARE)
+        self.gas_budget = gas_budget
+
+    def cut_gas(self, chunk):
+        """Estimated gas of `chunk` as a diamondCut."""
+
+        return self.diamond_cut.diamondCut.estimate_gas(
+            chunk, ZERO_ADDRESS, b"", {"from": self.account}
+        )
+
+    def max_selectors(self, cut):
+        """
+        Selectors of a chunk that fits the gas budget for every action of
+        `cut`, multiples of 8. Each action is probed on its own.
+        """
+
+        result = {}
+        for action in (ADD, REPLACE, REMOVE):
+            part = [c for c in normalize(cut) if c[1] == action]
+            selectors = sum(len(selectors) for _, _, selectors in part)
+            if not selectors:
+                continue
+            one = self.cut_gas(chunk_cut(part, 1)[0])
+            probe = min(PROBE_SELECTORS, selectors)
+            if probe > 1:
+                many = self.cut_gas(chunk_cut(part, probe)[0])
+                per_selector = max((many - one) / (probe - 1), 1)
+            else:
+                per_selector = one
+            fitting = int((self.gas_budget / GAS_MARGIN - one) / per_selector) + 1
+            # selectors are stored 8 to a slot
+            result[action] = max(fitting - fitting % 8, 1)
+        return result
+
+    def plan(self, cut, max_selectors=None):
+        if max_selectors is None:
+            max_selectors = self.max_selectors(cut)
+        return chunk_cut(cut, max_selectors)
+
+    def applied(self, chunk):
+        """True if the loupe shows every selector of `chunk` as cut."""
+
+        for facet_address, action, selectors in chunk:
+            expected = ZERO_ADDRESS if action == REMOVE else facet_address
+            for selector in selectors:
+                if self.diamond_loupe.facetAddress(selector) != expected:
+                    return False
+        return True
+
+    def chunk_init(self, index, count, init, calldata, pause):
+        """Initialization address and calldata of the chunk at `index` of `count`."""
+
+        last = index == count - 1
+        if pause and count > 1:
+            if self.cut_init is None:
+                raise ValueError("A ChunkedCutInit is needed to pause the token")
+            if index == 0:
+                return self.cut_init.address, self.cut_init.pause.encode_input()
+            if last:
+                return (
+                    self.cut_init.address,
+                    self.cut_init.unpause.encode_input(init, calldata),
+                )
+        if last:
+            return init, calldata
+        return ZERO_ADDRESS, b""
+
+    def apply(self, chunks, init=ZERO_ADDRESS, calldata=b"", pause=True):
+        """
+        Send the chunks after the ones already applied, the last one with the
+        initialization. With `pause` the first chunk pauses the token and the
+        last one unpauses it. Returns the receipts of the sent chunks.
+        """
+
+        start = 0
+        while start < len(chunks) and self.applied(chunks[start]):
+            start += 1
+        if start:
+            print(f"Chunks 1 to {start} of {len(chunks)} are already applied")
+        receipts = []
+        for index in range(start, len(chunks)):
+            tx = self.diamond_cut.diamondCut(
+                chunks[index],
+                *self.chunk_init(index, len(chunks), init, calldata, pause),
+                {"from": self.account},
+            )
+            tx.wait(1)
+            print(f"Applied chunk {index + 1}/{len(chunks)}, {tx.gas_used} gas")
+            receipts.append(tx)
+        return receipts
+
+    def run(self, cut, init=ZERO_ADDRESS, calldata=b"", max_selectors=None, pause=True):
+        chunks = self.plan(cut, max_selectors)
+        print(
+            f"{sum(len(s) for c in chunks for _, _, s in c)} selectors "
+            f"in {len(chunks)} chunks"
+        )
+        return self.apply(chunks, init, calldata, pause)
+
+
+def upgrade(facet_name, max_selectors=0, state_path=None):
+    """
+    Deploy the facet `facet_name` and add or replace all of its selectors in
+    the last diamond with a chunked cut. The facet and the chunks are saved in
+    `state_path` until the last chunk is applied, and reused by the next run.
+    """
+
+    from brownie import (
+        ChunkedCutInit,
+        Contract,
+        Diamond,
+        DiamondLoupeFacet,
+        TokenFacet,
+        interface,
+        project,
+    )
+
+    from scripts.deploy import deploy, get_account
+
+    account = get_account()
+    diamond_address = Diamond[-1].address
+    if state_path is None:
+        state_path = f"chunked-cut-{facet_name}.json"
+    loupe = Contract.from_abi(
+        "DiamondLoupeFacet", diamond_address, abi=DiamondLoupeFacet.abi
+    )
+    state = None
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+        if state["diamond"] != diamond_address:
+            state = None
+
+    if state is None:
+        facet = deploy(project.get_loaded_projects()[0][facet_name], account)
+        add, replace = [], []
+        for selector in facet.selectors:
+            if loupe.facetAddress(selector) == ZERO_ADDRESS:
+                add.append(selector)
+            else:
+                replace.append(selector)
+        token = Contract.from_abi("TokenFacet", diamond_address, abi=TokenFacet.abi)
+        state = {
+            "diamond": diamond_address,
+            "facet": facet.address,
+            "cut": [(facet.address, ADD, add), (facet.address, REPLACE, replace)],
+            # a token paused by its pauser is cut without pausing it again
+            "pause": not token.paused(),
+            "cut_init": deploy(ChunkedCutInit, account).address,
+        }
+        planner = ChunkedCutPlanner(
+            interface.IDiamondCut(diamond_address), loupe, account
+        )
+        state["max_selectors"] = int(max_selectors) or planner.max_selectors(
+            state["cut"]
+        )
+        with open(state_path, "w") as f:
+            json.dump(state, f, indent=2)
+        print(f"Upgrade of {facet_name} saved in {state_path}")
+    else:
+        print(f"Resuming the upgrade of {facet_name} from {state_path}")
+
+    max_selectors = state["max_selectors"]
+    if isinstance(max_selectors, dict):
+        # JSON keys are strings
+        max_selectors = {int(action): n for action, n in max_selectors.items()}
+    cut_init = Contract.from_abi(
+        "ChunkedCutInit", state["cut_init"], abi=ChunkedCutInit.abi
+    )
+    planner = ChunkedCutPlanner(
+        interface.IDiamondCut(diamond_address), loupe, account, cut_init
+    )
+    receipts = planner.run(
+        state["cut"], max_selectors=max_selectors, pause=state["pause"]
+    )
+    os.remove(state_path)
+    return receipts
@@ -0,0 +1,120 @@
+"""
+Miner of CREATE2 salts giving the diamond an address with leading zero bytes.
+
+A zero byte of calldata costs 4 gas instead of 16, so every call that passes
+the diamond address saves 12 gas per leading zero byte. The salts of
+DiamondFactory.deployDiamondWithSalt start with the sender address, the
+miner searches the 12 bytes after it. Every zero byte multiplies the
+expected number of hashes by 256: 2 bytes take seconds, 3 bytes minutes and
+4 bytes hours on a few cores.
+
+    brownie run scripts/deploy.py factory_create2 3 --network NETWORK
+"""
+
+import os
+import time
+from multiprocessing import Pool
+
+from eth_abi import encode_abi
+from eth_utils import keccak, to_canonical_address, to_checksum_address
+
+# salts hashed by a worker at a time
+BATCH_SIZE = 1 << 16
+COUNTER_SIZE = 12
+
+
+def init_code_hash(bytecode, factory, diamond_cut_facet):
+    """Hash of the Diamond creation code with the constructor arguments of the factory."""
+
+    bytecode = bytes.fromhex(bytecode[2:] if bytecode.startswith("0x") else bytecode)
+    return keccak(
+        bytecode
+        + encode_abi(
+            ["address", "address"],
+            [to_checksum_address(factory), to_checksum_address(diamond_cut_facet)],
+        )
+    )
+
+
+def salt(sender, counter):
+    return to_canonical_address(sender) + counter.to_bytes(COUNTER_SIZE, "big")
+
+
+def create2_address(deployer, salt, init_code_hash):
+    return to_checksum_address(
+        keccak(b"\xff" + to_canonical_address(deployer) + salt + init_code_hash)[12:]
+    )
+
+
+def leading_zero_bytes(address):
+    address = to_canonical_address(address)
+    return len(address) - len(address.lstrip(b"\0"))
+
+
+def _search(args):
+    """The first counter of a batch whose address has `zero_bytes` zero bytes."""
+
+    prefix, suffix, zero_bytes, start = args
+    zeros = b"\0" * zero_bytes
+    end = 12 + zero_bytes
+    for counter in range(start, start + BATCH_SIZE):
+        digest = keccak(prefix + counter.to_bytes(COUNTER_SIZE, "big") + suffix)
+        if digest[12:end] == zeros:
+            return counter
+    return None
+
+
+def mine(
+    deployer,
+    sender,
+    init_code_hash,
+    zero_bytes=2,
+    processes=None,
+    start=0,
+    progress_interval=10,
+):
+    """
+    Mine a salt of `sender` whose CREATE2 address from `deployer` starts with
+    `zero_bytes` zero bytes. Returns the salt, the address and the number of
+    salts in the rounds of batches searched.
+    """
+
+    prefix = b"\xff" + to_canonical_address(deployer) + to_canonical_address(sender)
+    batches = (processes or os.cpu_count()) * 4
+    expected = 256**zero_bytes
+    started = reported = time.perf_counter()
+    hashed = 0
+    counter = None
+
+    with Pool(processes) as pool:
+        while counter is None:
+            # a round of batches at a time, Pool.imap would queue them all
+            results = pool.map(
+                _search,
+                [
+                    (prefix, init_code_hash, zero_bytes, start + i * BATCH_SIZE)
+                    for i in range(batches)
+                ],
+            )
+            hashed += batches * BATCH_SIZE
+            start += batches * BATCH_SIZE
+            found = [result for result in results if result is not None]
+            if found:
+                counter = found[0]
+            elif time.perf_counter() - reported >= progress_interval:
+                reported = time.perf_counter()
+                elapsed = reported - started
+                print(
+                    f"Hashed {hashed} salts in {elapsed:.0f}s, "
+                    f"{hashed / elapsed:,.0f} keccak/s, "
+                    f"{hashed / expected:.0%} of the expected {expected}"
+                )
+
+    elapsed = time.perf_counter() - started
+    mined_salt = salt(sender, counter)
+    address = create2_address(deployer, mined_salt, init_code_hash)
+    print(
+        f"Mined salt 0x{mined_salt.hex()} for {address}, hashed {hashed} salts "
+        f"in {elapsed:.1f}s, {hashed / elapsed:,.0f} keccak/s"
+    )
+    return mined_salt, address, hashed
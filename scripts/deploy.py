@@ -4,63 +4,119 @@ from brownie import (
     network,
     chain,
     config,
+    web3,
     Contract,
+    BatchViewFacet,
     DiamondCutFacet,
     Diamond,
+    DiamondFactory,
     DiamondInit,
     DiamondLoupeFacet,
+    HotDiamond,
+    HotDispatchInit,
+    MerkleDistributionFacet,
+    NettingSettlementFacet,
     OwnershipFacet,
+    PackedCalldataFacet,
+    SnapshotFacet,
     TokenFacet,
 )
 
+from scripts.create2 import init_code_hash, mine
+from scripts.metrics import Metrics
 
-def deploy_diamond():
+ZERO_ADDRESS = f"0x{'0' * 40}"
 
-    account = accounts.add(config["networks"][network.show_active()]["from_key"])
+# TokenFacet functions that a HotDiamond dispatches without a storage lookup
+HOT_FUNCTIONS = [
+    "transfer(address,uint256)",
+    "transferFrom(address,address,uint256)",
+    "approve(address,uint256)",
+]
+
+
+def hot_selectors():
+    return [web3.keccak(text=signature)[:4].hex() for signature in HOT_FUNCTIONS]
+
+
+# transactions of the scripts, see scripts/metrics.py
+_metrics = None
+
+
+def get_metrics():
+    """
+    The metrics of the scripts, made on first use so importing this module
+    doesn't start the metrics server.
+    """
+
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics.from_env()
+    return _metrics
+
+
+def get_account():
+    return accounts.add(config["networks"][network.show_active()]["from_key"])
+
+
+def deploy(container, account, *args):
+    """Deploy a contract, publishing its source on networks with `verify` set."""
+
+    return get_metrics().measure(
+        f"deploy {container._name}",
+        container.deploy,
+        *args,
+        {"from": account},
+        publish_source=config["networks"][network.show_active()].get("verify"),
+    )
+
+
+def deploy_diamond(hot=False):
+
+    account = get_account()
     print(f"Account: {account}")
 
     active_network = network.show_active()
     print(f"Network: {active_network}")
 
-    diamond_cut_facet = DiamondCutFacet.deploy(
-        {"from": account},
-        publish_source=config["networks"][active_network].get("verify"),
-    )
-    diamond = Diamond.deploy(
-        account,
-        diamond_cut_facet.address,
-        {"from": account},
-        publish_source=config["networks"][active_network].get("verify"),
-    )
-    diamond_init = DiamondInit.deploy(
-        {"from": account},
-        publish_source=config["networks"][active_network].get("verify"),
-    )
-    diamond_loupe_facet = DiamondLoupeFacet.deploy(
-        {"from": account},
-        publish_source=config["networks"][active_network].get("verify"),
-    )
-    ownership_facet = OwnershipFacet.deploy(
-        {"from": account},
-        publish_source=config["networks"][active_network].get("verify"),
-    )
-    token_facet = TokenFacet.deploy(
-        {"from": account},
-        publish_source=config["networks"][active_network].get("verify"),
-    )
+    diamond_cut_facet = deploy(DiamondCutFacet, account)
+    token_facet = deploy(TokenFacet, account)
+    if hot:
+        # The hot selectors are added by the HotDiamond constructor
+        diamond = deploy(
+            HotDiamond,
+            account,
+            account,
+            diamond_cut_facet.address,
+            token_facet.address,
+            hot_selectors(),
+        )
+    else:
+        diamond = deploy(Diamond, account, account, diamond_cut_facet.address)
+    diamond_init = deploy(DiamondInit, account)
+    diamond_loupe_facet = deploy(DiamondLoupeFacet, account)
+    ownership_facet = deploy(OwnershipFacet, account)
+
+    token_selectors = list(token_facet.selectors.keys())
+    if hot:
+        token_selectors = [
+            selector for selector in token_selectors if selector not in hot_selectors()
+        ]
 
     # Add=0, Replace=1, Remove=2
 
     cut = [
         [diamond_loupe_facet.address, 0, list(diamond_loupe_facet.selectors.keys())],
         [ownership_facet.address, 0, list(ownership_facet.selectors.keys())],
-        [token_facet.address, 0, list(token_facet.selectors.keys())],
+        [token_facet.address, 0, token_selectors],
     ]
 
     diamond_cut = interface.IDiamondCut(diamond.address)
     function_call = diamond_init.init.encode_input()
 
-    tx = diamond_cut.diamondCut(
+    tx = get_metrics().measure(
+        "diamondCut",
+        diamond_cut.diamondCut,
         cut,
         diamond_init.address,
         function_call,
@@ -72,7 +128,9 @@ def deploy_diamond():
 
     token_facet = Contract.from_abi("TokenFacet", diamond.address, abi=TokenFacet.abi)
 
-    token_facet.setup(
+    get_metrics().measure(
+        "setup",
+        token_facet.setup,
         config["token"]["name"],
         config["token"]["version"],
         config["token"]["symbol"],
@@ -85,5 +143,175 @@ def deploy_diamond():
     return diamond.address
 
 
+def deployed(container, account):
+    """The last deployment of a contract on the active network, or a new one."""
+
+    if len(container) > 0:
+        return container[-1]
+    return deploy(container, account)
+
+
+def deploy_diamond_with_factory(zero_bytes=0):
+    """
+    Deploy the diamond, add its facets, run DiamondInit and set up the token
+    in one DiamondFactory transaction. Facets and the factory that are already
+    deployed on the network are reused. With `zero_bytes` the diamond is
+    deployed with CREATE2 at an address starting with that many zero bytes.
+    """
+
+    account = get_account()
+    print(f"Account: {account}")
+    print(f"Network: {network.show_active()}")
+
+    diamond_factory = deployed(DiamondFactory, account)
+    diamond_cut_facet = deployed(DiamondCutFacet, account)
+    diamond_init = deployed(DiamondInit, account)
+    diamond_loupe_facet = deployed(DiamondLoupeFacet, account)
+    ownership_facet = deployed(OwnershipFacet, account)
+    token_facet = deployed(TokenFacet, account)
+
+    # Add=0, Replace=1, Remove=2
+
+    cut = [
+        [diamond_loupe_facet.address, 0, list(diamond_loupe_facet.selectors.keys())],
+        [ownership_facet.address, 0, list(ownership_facet.selectors.keys())],
+        [token_facet.address, 0, list(token_facet.selectors.keys())],
+    ]
+    token_setup = [
+        config["token"]["name"],
+        config["token"]["version"],
+        config["token"]["symbol"],
+        config["token"]["decimals"],
+    ]
+
+    args = [
+        account,
+        diamond_cut_facet.address,
+        cut,
+        diamond_init.address,
+        diamond_init.init.encode_input(),
+        token_setup,
+    ]
+    if zero_bytes:
+        salt, _, _ = mine(
+            diamond_factory.address,
+            account.address,
+            init_code_hash(
+                Diamond.bytecode, diamond_factory.address, diamond_cut_facet.address
+            ),
+            zero_bytes,
+        )
+        tx = get_metrics().measure(
+            "deployDiamondWithSalt",
+            diamond_factory.deployDiamondWithSalt,
+            *args,
+            salt,
+            {"from": account},
+        )
+    else:
+        tx = get_metrics().measure(
+            "deployDiamond", diamond_factory.deployDiamond, *args, {"from": account}
+        )
+    tx.wait(1)
+
+    diamond_address = tx.events["DiamondDeployed"]["diamond"]
+    # register the diamond so Diamond[-1] is the new diamond
+    Diamond.at(diamond_address)
+
+    print(f"Completed diamond deployment and token setup: {diamond_address}")
+
+    return diamond_address
+
+
+def add_facet(diamond_address, facet_container, account):
+    """Deploy a facet and add all of its functions to the diamond."""
+
+    facet = deploy(facet_container, account)
+
+    # Add=0, Replace=1, Remove=2
+
+    cut = [[facet.address, 0, list(facet.selectors.keys())]]
+
+    diamond_cut = interface.IDiamondCut(diamond_address)
+    tx = get_metrics().measure(
+        "diamondCut", diamond_cut.diamondCut, cut, ZERO_ADDRESS, b"", {"from": account}
+    )
+    tx.wait(1)
+
+    print(f"Added {facet_container._name} to diamond {diamond_address}")
+
+    return facet
+
+
+def set_hot_dispatch(diamond_address, enabled, account):
+    """
+    Turn the bytecode dispatch of the HotDiamond at `diamond_address` on or
+    off, see contracts/upgradeInitializers/HotDispatchInit.sol. It must be
+    off to replace or remove the hot selectors.
+    """
+
+    hot_dispatch_init = deploy(HotDispatchInit, account)
+    if enabled:
+        function_call = hot_dispatch_init.enable.encode_input(hot_selectors())
+    else:
+        function_call = hot_dispatch_init.disable.encode_input()
+
+    diamond_cut = interface.IDiamondCut(diamond_address)
+    tx = get_metrics().measure(
+        "diamondCut",
+        diamond_cut.diamondCut,
+        [],
+        hot_dispatch_init.address,
+        function_call,
+        {"from": account},
+    )
+    tx.wait(1)
+
+    print(
+        f"Turned the hot dispatch of diamond {diamond_address} "
+        f"{'on' if enabled else 'off'}"
+    )
+
+
 def main():
     deploy_diamond()
+
+
+def hot():
+    deploy_diamond(hot=True)
+
+
+def factory():
+    deploy_diamond_with_factory()
+
+
+def factory_create2(zero_bytes=2):
+    deploy_diamond_with_factory(int(zero_bytes))
+
+
+def disable_hot_dispatch():
+    set_hot_dispatch(HotDiamond[-1].address, False, get_account())
+
+
+def enable_hot_dispatch():
+    set_hot_dispatch(HotDiamond[-1].address, True, get_account())
+
+
+def add_snapshot_facet():
+    add_facet(Diamond[-1].address, SnapshotFacet, get_account())
+
+
+def add_merkle_distribution_facet():
+    add_facet(Diamond[-1].address, MerkleDistributionFacet, get_account())
+
+
+def add_batch_view_facet():
+    add_facet(Diamond[-1].address, BatchViewFacet, get_account())
+
+
+def add_packed_calldata_facet():
+    add_facet(Diamond[-1].address, PackedCalldataFacet, get_account())
+
+
+def add_netting_settlement_facet():
+    add_facet(Diamond[-1].address, NettingSettlementFacet, get_account())
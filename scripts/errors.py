@@ -0,0 +1,137 @@
+"""
+Decoder of the custom errors the contracts revert with.
+
+The contracts revert with custom errors instead of revert strings, which
+makes their bytecode smaller and their reverts cheaper, but the revert data
+is then a 4 byte selector and ABI encoded arguments instead of a readable
+message. ErrorDecoder finds the error by its selector in the ABIs of the
+project, and `recorded_revert_data` keeps the revert data of failed JSON-RPC
+requests, which some clients drop from their exceptions.
+"""
+
+from collections import namedtuple
+from contextlib import contextmanager
+
+from eth_abi import decode_abi
+from eth_utils import function_signature_to_4byte_selector
+
+# Error(string) and Panic(uint256) are raised by require() and failed asserts
+ERROR_STRING_ABI = {
+    "type": "error",
+    "name": "Error",
+    "inputs": [{"name": "reason", "type": "string"}],
+}
+PANIC_ABI = {
+    "type": "error",
+    "name": "Panic",
+    "inputs": [{"name": "code", "type": "uint256"}],
+}
+
+DecodedError = namedtuple("DecodedError", ["name", "args"])
+
+
+def abi_type(abi_input):
+    """Canonical type of an ABI input, expanding tuples into their components."""
+
+    if not abi_input["type"].startswith("tuple"):
+        return abi_input["type"]
+    components = ",".join(abi_type(c) for c in abi_input["components"])
+    return f"({components}){abi_input['type'][len('tuple'):]}"
+
+
+def error_selector(abi_entry):
+    types = ",".join(abi_type(i) for i in abi_entry["inputs"])
+    signature = f"{abi_entry['name']}({types})"
+    return "0x" + function_signature_to_4byte_selector(signature).hex()
+
+
+class ErrorDecoder:
+    """Decodes revert data into custom errors by their 4 byte selectors."""
+
+    def __init__(self, abis=()):
+        self.errors = {}
+        self.add_abi([ERROR_STRING_ABI, PANIC_ABI])
+        for abi in abis:
+            self.add_abi(abi)
+
+    def add_abi(self, abi):
+        for abi_entry in abi:
+            if abi_entry["type"] == "error":
+                self.errors[error_selector(abi_entry)] = abi_entry
+
+    def decode(self, data):
+        """Decode revert data given as a hex string or bytes, None if unknown."""
+
+        if isinstance(data, (bytes, bytearray)):
+            data = "0x" + bytes(data).hex()
+        if not isinstance(data, str) or len(data) < 10:
+            return None
+        abi_entry = self.errors.get(data[:10].lower())
+        if abi_entry is None:
+            return None
+        inputs = abi_entry["inputs"]
+        try:
+            values = decode_abi([abi_type(i) for i in inputs], bytes.fromhex(data[10:]))
+        except Exception:
+            return None
+        return DecodedError(
+            abi_entry["name"], {i["name"]: v for i, v in zip(inputs, values)}
+        )
+
+    def find(self, value):
+        """
+        Search an RPC error, exception or nested container for revert data
+        and decode the first known error found in it.
+        """
+
+        if isinstance(value, BaseException):
+            return self.find(value.args)
+        if isinstance(value, dict):
+            value = list(value.values())
+        if isinstance(value, (list, tuple)):
+            for item in value:
+                decoded = self.find(item)
+                if decoded is not None:
+                    return decoded
+            return None
+        if isinstance(value, str) and value.startswith("0x"):
+            return self.decode(value)
+        return None
+
+
+def project_error_decoder():
+    """ErrorDecoder that knows the errors of every contract of the loaded project."""
+
+    from brownie import project
+
+    decoder = ErrorDecoder()
+    for loaded_project in project.get_loaded_projects():
+        for container in loaded_project:
+            decoder.add_abi(container.abi)
+    return decoder
+
+
+@contextmanager
+def recorded_revert_data(web3):
+    """
+    Record the error data of failed JSON-RPC requests made through `web3`.
+    Clients that only keep the error message of a failed request, such as gas
+    estimation, lose the revert data needed to decode custom errors.
+    """
+
+    recorded = []
+
+    def middleware(make_request, w3):
+        def record_revert_data(method, params):
+            response = make_request(method, params)
+            if "error" in response:
+                recorded.append(response["error"])
+            return response
+
+        return record_revert_data
+
+    web3.middleware_onion.add(middleware, "recorded_revert_data")
+    try:
+        yield recorded
+    finally:
+        web3.middleware_onion.remove("recorded_revert_data")
@@ -0,0 +1,205 @@
+"""
+Lean submission path of the hot TokenFacet calls.
+
+The selectors and the encoders of the static arguments are made once, the
+chain id, gas price and pending nonce are read once, and the RLP fields that
+are the same for every transaction of a function are encoded once per gas
+price. A transaction is then the calldata words, the RLP of its nonce and
+data, one keccak and one signature, without the ABI, account or gas
+estimation machinery of brownie. Signed transactions are sent in JSON-RPC
+batches of eth_sendRawTransaction.
+
+    client = LeanClient(web3, diamond_address, private_key)
+    client.submit([("transfer", (to, value)) for to, value in payouts])
+
+The local nonce is the pending nonce when the client is made, call
+`sync_nonce` after a transaction was rejected.
+"""
+
+import requests
+from eth_keys import keys
+from eth_utils import (
+    function_signature_to_4byte_selector,
+    keccak,
+    to_canonical_address,
+)
+
+from scripts.packed_calldata import packed_bytes32
+
+SIGNATURES = {
+    "transfer": "transfer(address,uint256)",
+    "transferFrom": "transferFrom(address,address,uint256)",
+    "approve": "approve(address,uint256)",
+    "permit": "permit(address,address,uint256,uint256,uint8,bytes32,bytes32)",
+    "transferWithAuthorization": (
+        "transferWithAuthorization"
+        "(address,address,uint256,uint256,uint256,bytes32,uint8,bytes32,bytes32)"
+    ),
+    "receiveWithAuthorization": (
+        "receiveWithAuthorization"
+        "(address,address,uint256,uint256,uint256,bytes32,uint8,bytes32,bytes32)"
+    ),
+    "cancelAuthorization": "cancelAuthorization(address,bytes32,uint8,bytes32,bytes32)",
+}
+# gas limits of the transactions, above the gas used with snapshots and cold
+# balances, the unused gas isn't paid
+GAS_LIMITS = {
+    "transfer": 150000,
+    "transferFrom": 170000,
+    "approve": 80000,
+    "permit": 130000,
+    "transferWithAuthorization": 200000,
+    "receiveWithAuthorization": 200000,
+    "cancelAuthorization": 90000,
+}
+# eth_sendRawTransaction requests in a JSON-RPC batch
+BATCH_SIZE = 500
+
+
+def _address(account):
+    return to_canonical_address(str(getattr(account, "address", account))).rjust(
+        32, b"\0"
+    )
+
+
+def _uint(value):
+    return value.to_bytes(32, "big")
+
+
+_WORDS = {
+    "address": _address,
+    "uint256": _uint,
+    "uint8": _uint,
+    "bytes32": packed_bytes32,
+}
+
+
+class StaticEncoder:
+    """ABI encoder of a function whose arguments are all static."""
+
+    def __init__(self, signature):
+        self.selector = function_signature_to_4byte_selector(signature)
+        types = signature[signature.index("(") + 1 : -1].split(",")
+        self.words = [_WORDS[t] for t in types]
+
+    def __call__(self, *args):
+        if len(args) != len(self.words):
+            raise TypeError(f"{len(self.words)} arguments expected, got {len(args)}")
+        return self.selector + b"".join(
+            word(arg) for word, arg in zip(self.words, args)
+        )
+
+
+ENCODERS = {name: StaticEncoder(signature) for name, signature in SIGNATURES.items()}
+
+
+def rlp_length(length, offset):
+    if length < 56:
+        return bytes([offset + length])
+    length = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes([offset + 55 + len(length)]) + length
+
+
+def rlp_bytes(value):
+    if len(value) == 1 and value[0] < 0x80:
+        return value
+    return rlp_length(len(value), 0x80) + value
+
+
+def rlp_int(value):
+    return rlp_bytes(value.to_bytes((value.bit_length() + 7) // 8, "big"))
+
+
+def rlp_list(payload):
+    return rlp_length(len(payload), 0xC0) + payload
+
+
+class LeanClient:
+    """Signer and sender of TokenFacet calls of `private_key` to the diamond at `diamond_address`."""
+
+    def __init__(self, web3, diamond_address, private_key, gas_limits=None):
+        self.web3 = web3
+        self.diamond = to_canonical_address(diamond_address)
+        if isinstance(private_key, str):
+            private_key = bytes.fromhex(private_key[2:])
+        self.key = keys.PrivateKey(private_key)
+        self.address = self.key.public_key.to_checksum_address()
+        self.chain_id = web3.eth.chain_id
+        self.gas_limits = dict(GAS_LIMITS, **(gas_limits or {}))
+        # EIP-155 fields of the signed message
+        self._chain_fields = rlp_int(self.chain_id) + rlp_int(0) + rlp_int(0)
+        self.sync_nonce()
+        self.refresh_gas_price()
+
+    def sync_nonce(self):
+        self.nonce = self.web3.eth.get_transaction_count(self.address, "pending")
+
+    def refresh_gas_price(self, gas_price=None):
+        self.gas_price = self.web3.eth.gas_price if gas_price is None else gas_price
+        # function -> RLP of gas price, gas, to and value
+        self._templates = {
+            function: rlp_int(self.gas_price)
+            + rlp_int(gas)
+            + rlp_bytes(self.diamond)
+            + rlp_int(0)
+            for function, gas in self.gas_limits.items()
+        }
+
+    def sign(self, function, *args):
+        """The signed raw transaction of a call, with the next nonce."""
+
+        fields = (
+            rlp_int(self.nonce)
+            + self._templates[function]
+            + rlp_bytes(ENCODERS[function](*args))
+        )
+        signature = self.key.sign_msg_hash(
+            keccak(rlp_list(fields + self._chain_fields))
+        )
+        self.nonce += 1
+        return rlp_list(
+            fields
+            + rlp_int(signature.v + 35 + 2 * self.chain_id)
+            + rlp_int(signature.r)
+            + rlp_int(signature.s)
+        )
+
+    def send(self, raw_transactions):
+        """Send signed transactions, returns their hashes."""
+
+        uri = getattr(self.web3.provider, "endpoint_uri", None)
+        if not uri or not str(uri).startswith("http"):
+            # other providers don't take batches
+            return [
+                "0x" + bytes(self.web3.eth.send_raw_transaction(raw)).hex()
+                for raw in raw_transactions
+            ]
+
+        hashes = []
+        for start in range(0, len(raw_transactions), BATCH_SIZE):
+            chunk = raw_transactions[start : start + BATCH_SIZE]
+            response = requests.post(
+                str(uri),
+                json=[
+                    {
+                        "jsonrpc": "2.0",
+                        "id": i,
+                        "method": "eth_sendRawTransaction",
+                        "params": ["0x" + raw.hex()],
+                    }
+                    for i, raw in enumerate(chunk)
+                ],
+                timeout=60,
+            )
+            response.raise_for_status()
+            results = sorted(response.json(), key=lambda result: result["id"])
+            for result in results:
+                if "error" in result:
+                    raise ValueError(result["error"])
+                hashes.append(result["result"])
+        return hashes
+
+    def submit(self, calls):
+        """Sign and send (function, args) calls, returns the transaction hashes."""
+
+        return self.send([self.sign(function, *args) for function, args in calls])
@@ -0,0 +1,250 @@
+"""
+Merkle trees and proofs of MerkleDistributionFacet distributions.
+
+The claims are read from a CSV file of `account,amount` rows, the row number
+is the leaf index. Every level of the tree is written to its own file of 32
+byte nodes so the tree of millions of claims is built and its proofs are
+written without holding it in memory, the hashing is spread over a process
+pool.
+
+    python -m scripts.merkle_distribution claims.csv tree/
+"""
+
+import argparse
+import csv
+import json
+import mmap
+import os
+from itertools import islice
+from multiprocessing import Pool
+
+from eth_utils import keccak, to_canonical_address, to_checksum_address
+
+NODE_SIZE = 32
+# rows or nodes hashed by a worker at a time, nodes need an even chunk size
+CHUNK_SIZE = 1 << 14
+
+
+def leaf_hash(index, account, amount):
+    """keccak256(abi.encodePacked(uint256 index, address account, uint256 amount))"""
+
+    return keccak(
+        index.to_bytes(32, "big")
+        + to_canonical_address(account)
+        + amount.to_bytes(32, "big")
+    )
+
+
+def hash_pair(a, b):
+    return keccak(a + b) if a <= b else keccak(b + a)
+
+
+def read_claims(path):
+    """Yield the (index, account, amount) claims of a CSV file."""
+
+    with open(path, newline="") as f:
+        rows = csv.reader(f)
+        index = 0
+        for row in rows:
+            if not row or row[0].strip().lower() == "account":
+                continue
+            account, amount = row[0].strip(), int(row[1])
+            if amount <= 0 or amount >= 2**256:
+                raise ValueError(f"Invalid amount {amount} for {account}")
+            yield index, account, amount
+            index += 1
+
+
+def chunks(iterable, size=CHUNK_SIZE):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _hash_leaves(claims):
+    return b"".join(leaf_hash(*claim) for claim in claims)
+
+
+def _hash_nodes(nodes):
+    parents = [
+        hash_pair(nodes[i : i + NODE_SIZE], nodes[i + NODE_SIZE : i + 2 * NODE_SIZE])
+        for i in range(0, len(nodes) - NODE_SIZE, 2 * NODE_SIZE)
+    ]
+    if len(nodes) // NODE_SIZE % 2:
+        # a node without a sibling moves up unchanged
+        parents.append(nodes[-NODE_SIZE:])
+    return b"".join(parents)
+
+
+def level_path(directory, level):
+    return os.path.join(directory, f"level-{level}.bin")
+
+
+def read_nodes(path, size=CHUNK_SIZE):
+    with open(path, "rb") as f:
+        while True:
+            nodes = f.read(size * NODE_SIZE)
+            if not nodes:
+                return
+            yield nodes
+
+
+class MerkleTree:
+    """The levels of a tree written by `build_tree`, leaves are level 0."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.levels = []
+        self._files = []
+        level = 0
+        while os.path.exists(level_path(directory, level)):
+            f = open(level_path(directory, level), "rb")
+            self._files.append(f)
+            self.levels.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            level += 1
+
+    def close(self):
+        for level in self.levels:
+            level.close()
+        for f in self._files:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def node(self, level, index):
+        return self.levels[level][index * NODE_SIZE : (index + 1) * NODE_SIZE]
+
+    def node_count(self, level):
+        return len(self.levels[level]) // NODE_SIZE
+
+    @property
+    def root(self):
+        return self.node(len(self.levels) - 1, 0)
+
+    def proof(self, index):
+        """Siblings of the nodes on the path from leaf `index` to the root."""
+
+        proof = []
+        for level in range(len(self.levels) - 1):
+            sibling = index ^ 1
+            if sibling < self.node_count(level):
+                proof.append(self.node(level, sibling))
+            index >>= 1
+        return proof
+
+
+def build_tree(claims, directory, processes=None):
+    """
+    Hash the (index, account, amount) `claims` into a tree written to
+    `directory`. Returns the root, the number of claims and their total.
+    """
+
+    os.makedirs(directory, exist_ok=True)
+    level = 0
+    while os.path.exists(level_path(directory, level)):
+        os.remove(level_path(directory, level))
+        level += 1
+
+    count = total = 0
+
+    def counted(claims):
+        nonlocal count, total
+        for claim in claims:
+            count += 1
+            total += claim[2]
+            yield claim
+
+    with Pool(processes) as pool:
+        with open(level_path(directory, 0), "wb") as f:
+            for leaves in pool.imap(_hash_leaves, chunks(counted(claims))):
+                f.write(leaves)
+        if count == 0:
+            raise ValueError("No claims")
+
+        level, node_count = 0, count
+        while node_count > 1:
+            with open(level_path(directory, level + 1), "wb") as f:
+                for parents in pool.imap(
+                    _hash_nodes, read_nodes(level_path(directory, level))
+                ):
+                    f.write(parents)
+            level, node_count = level + 1, (node_count + 1) // 2
+
+    with MerkleTree(directory) as tree:
+        return tree.root, count, total
+
+
+def write_proofs(claims, directory, path):
+    """Write a JSON line with the proof of every claim to `path`."""
+
+    with MerkleTree(directory) as tree, open(path, "w") as f:
+        for index, account, amount in claims:
+            claim = {
+                "index": index,
+                "account": to_checksum_address(account),
+                "amount": str(amount),
+                "proof": ["0x" + node.hex() for node in tree.proof(index)],
+            }
+            f.write(json.dumps(claim) + "\n")
+
+
+def read_proofs(path):
+    with open(path) as f:
+        for line in f:
+            claim = json.loads(line)
+            claim["amount"] = int(claim["amount"])
+            yield claim
+
+
+def build(claims_path, directory, processes=None):
+    """Build the tree and the proofs of the claims of a CSV file."""
+
+    root, count, total = build_tree(read_claims(claims_path), directory, processes)
+    write_proofs(
+        read_claims(claims_path), directory, os.path.join(directory, "proofs.jsonl")
+    )
+    summary = {"merkleRoot": "0x" + root.hex(), "claims": count, "total": str(total)}
+    with open(os.path.join(directory, "root.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    print(f"Merkle root {summary['merkleRoot']} of {count} claims totalling {total}")
+    return summary
+
+
+def create_distribution(directory, minter):
+    """Commit the root built in `directory`, reserving its total from `minter`."""
+
+    from brownie import Contract, Diamond, MerkleDistributionFacet
+    from scripts.deploy import get_account
+
+    with open(os.path.join(directory, "root.json")) as f:
+        summary = json.load(f)
+    merkle_distribution_facet = Contract.from_abi(
+        "MerkleDistributionFacet", Diamond[-1].address, MerkleDistributionFacet.abi
+    )
+    tx = merkle_distribution_facet.createDistribution(
+        summary["merkleRoot"], minter, int(summary["total"]), {"from": get_account()}
+    )
+    tx.wait(1)
+    distribution_id = tx.return_value
+    print(f"Created distribution {distribution_id}")
+    return distribution_id
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("claims", help="CSV file of account,amount rows")
+    parser.add_argument("directory", help="directory of the tree and proofs")
+    parser.add_argument("--processes", type=int, help="number of hashing processes")
+    args = parser.parse_args()
+    build(args.claims, args.directory, args.processes)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,220 @@
+"""
+Metrics of the transactions and RPC requests of the deploy and admin scripts.
+
+Every transaction sent through `Metrics.measure` is written as a JSON line
+with its submit time, inclusion block, confirmation latency, gas used,
+effective gas price and the RPC requests made until it was confirmed, the
+transactions that revert included. The totals are served in the Prometheus
+text format by `Metrics.serve`.
+
+    METRICS_PATH=metrics.jsonl METRICS_PORT=9100 brownie run scripts/deploy.py
+"""
+
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "bf_token"
+
+
+def _receipt(error):
+    """The receipt of the transaction of a brownie error, None if none was sent."""
+
+    txid = getattr(error, "txid", None)
+    if not txid:
+        return None
+    from brownie import chain
+
+    return chain.get_transaction(txid)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    """Recorder of the transactions and RPC requests of a script run."""
+
+    def __init__(self, path=None):
+        self.path = path
+        # method -> [requests, seconds]
+        self.rpc = defaultdict(lambda: [0, 0.0])
+        # (name, status) -> [transactions, gas used, fees, confirmation seconds]
+        self.transactions = defaultdict(lambda: [0, 0, 0, 0.0])
+        self._lock = threading.Lock()
+        self._web3 = None
+
+    @classmethod
+    def from_env(cls):
+        """Metrics written to $METRICS_PATH and served on $METRICS_PORT if set."""
+
+        metrics = cls(os.environ.get("METRICS_PATH"))
+        if os.environ.get("METRICS_PORT"):
+            metrics.serve(int(os.environ["METRICS_PORT"]))
+        return metrics
+
+    def middleware(self, make_request, web3):
+        def middleware(method, params):
+            start = time.perf_counter()
+            try:
+                return make_request(method, params)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.rpc[method][0] += 1
+                    self.rpc[method][1] += elapsed
+
+        return middleware
+
+    def install(self, web3):
+        """Count the RPC requests made through `web3`."""
+
+        if self._web3 is not web3:
+            web3.middleware_onion.add(self.middleware, "metrics")
+            self._web3 = web3
+
+    def rpc_totals(self):
+        with self._lock:
+            return (
+                sum(count for count, _ in self.rpc.values()),
+                sum(seconds for _, seconds in self.rpc.values()),
+            )
+
+    def measure(self, name, function, *args, **kwargs):
+        """
+        Send a transaction with a brownie contract function or deploy and
+        record it under `name`. Returns what `function` returns, a revert is
+        recorded with status 0 and raised again.
+        """
+
+        if self._web3 is None:
+            from brownie import web3
+
+            self.install(web3)
+
+        rpc_calls, rpc_seconds = self.rpc_totals()
+        submitted_at = time.time()
+        start = time.perf_counter()
+        tx = None
+        try:
+            result = function(*args, **kwargs)
+            # a deployment returns the contract, its receipt is `tx`
+            tx = getattr(result, "tx", result)
+            if tx.status == -1:
+                # sent with required_confs=0
+                tx.wait(1)
+            return result
+        except Exception as error:
+            tx = _receipt(error)
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            calls, seconds = self.rpc_totals()
+            self.record(
+                {
+                    "name": name,
+                    "txid": tx.txid if tx is not None else None,
+                    "status": max(int(tx.status), 0) if tx is not None else 0,
+                    "submitted_at": submitted_at,
+                    "block_number": tx.block_number if tx is not None else None,
+                    "confirmation_seconds": latency,
+                    "gas_used": (tx.gas_used or 0) if tx is not None else 0,
+                    "gas_price": (tx.gas_price or 0) if tx is not None else 0,
+                    "rpc_calls": calls - rpc_calls,
+                    "rpc_seconds": seconds - rpc_seconds,
+                }
+            )
+
+    def record(self, record):
+        with self._lock:
+            totals = self.transactions[record["name"], record["status"]]
+            totals[0] += 1
+            totals[1] += record["gas_used"]
+            totals[2] += record["gas_used"] * record["gas_price"]
+            totals[3] += record["confirmation_seconds"]
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(record) + "\n")
+
+    def prometheus(self):
+        """The totals in the Prometheus text exposition format."""
+
+        lines = []
+
+        def family(metric, kind, help_text, samples):
+            lines.append(f"# HELP {PREFIX}_{metric} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{metric} {kind}")
+            for labels, value in samples:
+                labels = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+                lines.append(f"{PREFIX}_{metric}{{{labels}}} {value}")
+
+        with self._lock:
+            rpc = sorted(self.rpc.items())
+            transactions = sorted(self.transactions.items())
+
+        family(
+            "rpc_requests_total",
+            "counter",
+            "RPC requests by method.",
+            [({"method": method}, count) for method, (count, _) in rpc],
+        )
+        family(
+            "rpc_request_seconds_total",
+            "counter",
+            "Time spent in RPC requests by method.",
+            [({"method": method}, seconds) for method, (_, seconds) in rpc],
+        )
+        for index, (metric, help_text) in enumerate(
+            [
+                ("transactions_total", "Transactions by name and status."),
+                ("transaction_gas_used_total", "Gas used by the transactions."),
+                ("transaction_fees_wei_total", "Fees paid for the transactions."),
+                (
+                    "transaction_confirmation_seconds_total",
+                    "Time from submit to confirmation of the transactions.",
+                ),
+            ]
+        ):
+            family(
+                metric,
+                "counter",
+                help_text,
+                [
+                    ({"name": name, "status": status}, totals[index])
+                    for (name, status), totals in transactions
+                ],
+            )
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host=""):
+        """Serve `prometheus` on http://host:port/metrics from a daemon thread."""
+
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+def read_records(path):
+    with open(path) as f:
+        for line in f:
+            yield json.loads(line)
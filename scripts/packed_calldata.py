@@ -0,0 +1,110 @@
+"""
+Calldata encoders of the PackedCalldataFacet functions. The arguments follow
+the selector without padding, see contracts/facets/PackedCalldataFacet.sol.
+"""
+
+from eth_utils import function_signature_to_4byte_selector, to_canonical_address
+
+TRANSFER = function_signature_to_4byte_selector("transferPacked()")
+TRANSFER_FROM = function_signature_to_4byte_selector("transferFromPacked()")
+TRANSFER_WITH_AUTHORIZATION = function_signature_to_4byte_selector(
+    "transferWithAuthorizationPacked()"
+)
+RECEIVE_WITH_AUTHORIZATION = function_signature_to_4byte_selector(
+    "receiveWithAuthorizationPacked()"
+)
+
+
+def packed_uint(value, size):
+    """`value` as `size` big endian bytes, ValueError if it doesn't fit."""
+
+    if not 0 <= value < 2 ** (8 * size):
+        raise ValueError(f"{value} doesn't fit in {8 * size} bits")
+    return value.to_bytes(size, "big")
+
+
+def packed_bytes32(value):
+    if isinstance(value, str):
+        value = bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    return bytes(value).rjust(32, b"\0")
+
+
+def packed_address(account):
+    return to_canonical_address(str(getattr(account, "address", account)))
+
+
+def encode_transfer(to, value):
+    return "0x" + (TRANSFER + packed_address(to) + packed_uint(value, 12)).hex()
+
+
+def encode_transfer_from(_from, to, value):
+    return (
+        "0x"
+        + (
+            TRANSFER_FROM
+            + packed_address(_from)
+            + packed_address(to)
+            + packed_uint(value, 12)
+        ).hex()
+    )
+
+
+def _encode_authorization(
+    selector, _from, to, value, valid_after, valid_before, nonce, v, r, s
+):
+    return (
+        "0x"
+        + (
+            selector
+            + packed_address(_from)
+            + packed_address(to)
+            + packed_uint(value, 12)
+            + packed_uint(valid_after, 5)
+            + packed_uint(valid_before, 5)
+            + packed_bytes32(nonce)
+            + packed_uint(v, 1)
+            + packed_bytes32(r)
+            + packed_bytes32(s)
+        ).hex()
+    )
+
+
+def encode_transfer_with_authorization(
+    _from, to, value, valid_after, valid_before, nonce, v, r, s
+):
+    return _encode_authorization(
+        TRANSFER_WITH_AUTHORIZATION,
+        _from,
+        to,
+        value,
+        valid_after,
+        valid_before,
+        nonce,
+        v,
+        r,
+        s,
+    )
+
+
+def encode_receive_with_authorization(
+    _from, to, value, valid_after, valid_before, nonce, v, r, s
+):
+    return _encode_authorization(
+        RECEIVE_WITH_AUTHORIZATION,
+        _from,
+        to,
+        value,
+        valid_after,
+        valid_before,
+        nonce,
+        v,
+        r,
+        s,
+    )
+
+
+def calldata_gas(data):
+    """Intrinsic gas of calldata: 4 per zero byte and 16 per non zero byte."""
+
+    data = bytes.fromhex(data[2:]) if isinstance(data, str) else data
+    return sum(4 if byte == 0 else 16 for byte in data)
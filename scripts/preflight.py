@@ -0,0 +1,417 @@
+"""
+Pre-flight checks of pending TokenFacet transactions.
+
+`TokenRules` applies the checks of TokenFacet (pause, blacklist, balance,
+allowance, minter allowance, permit deadline and authorization nonces) to a
+`TokenState` cached from the chain, so transactions that would revert are
+rejected before they are sent. Signatures are not checked. `Preflight` keeps
+the cached state and simulates the transactions with eth_call instead when
+the state is older than `max_age` blocks.
+"""
+
+from collections import namedtuple
+
+from eth_utils import to_checksum_address
+
+from scripts.errors import DecodedError, project_error_decoder, recorded_revert_data
+
+ZERO_ADDRESS = f"0x{'0' * 40}"
+MAX_UINT256 = 2**256 - 1
+# Panic code of an arithmetic underflow or overflow
+PANIC_ARITHMETIC = 0x11
+
+# `function` is the TokenFacet function name and `args` its arguments
+PendingTransaction = namedtuple("PendingTransaction", ["sender", "function", "args"])
+
+
+class PreflightError(Exception):
+    """A transaction that TokenFacet would revert with `error`."""
+
+    def __init__(self, name, **args):
+        self.error = DecodedError(name, args)
+        super().__init__(f"{name}({', '.join(f'{k}={v}' for k, v in args.items())})")
+
+
+def address(account):
+    """Lower case address, the state is keyed by lower case addresses."""
+
+    return str(getattr(account, "address", account)).lower()
+
+
+def nonce_key(nonce):
+    if isinstance(nonce, (bytes, bytearray)):
+        return "0x" + bytes(nonce).hex()
+    return str(nonce).lower()
+
+
+class TokenState:
+    """TokenFacet state of some accounts at a block."""
+
+    def __init__(self, block_number=0, timestamp=0, paused=False):
+        self.block_number = block_number
+        self.timestamp = timestamp
+        self.paused = paused
+        self.total_supply = 0
+        self.balances = {}
+        self.allowances = {}
+        self.blacklisted = {}
+        self.minters = {}
+        self.minter_allowances = {}
+        self.permit_nonces = {}
+        self.authorization_states = {}
+
+    def copy(self):
+        state = TokenState(self.block_number, self.timestamp, self.paused)
+        state.total_supply = self.total_supply
+        for name in (
+            "balances",
+            "allowances",
+            "blacklisted",
+            "minters",
+            "minter_allowances",
+            "permit_nonces",
+            "authorization_states",
+        ):
+            setattr(state, name, dict(getattr(self, name)))
+        return state
+
+    def load(self, token_facet, transactions):
+        """Load the state the `transactions` depend on that isn't cached."""
+
+        block = {"block_identifier": self.block_number}
+        for account in _accounts(transactions):
+            if account not in self.balances:
+                self.balances[account] = token_facet.balanceOf(account, **block)
+                self.blacklisted[account] = token_facet.isBlacklisted(account, **block)
+                self.minters[account] = token_facet.isMinter(account, **block)
+                self.minter_allowances[account] = token_facet.minterAllowance(
+                    account, **block
+                )
+                self.permit_nonces[account] = token_facet.nonces(account, **block)
+        for owner, spender in _allowances(transactions):
+            if (owner, spender) not in self.allowances:
+                self.allowances[owner, spender] = token_facet.allowance(
+                    owner, spender, **block
+                )
+        for authorizer, nonce in _authorizations(transactions):
+            if (authorizer, nonce_key(nonce)) not in self.authorization_states:
+                self.authorization_states[
+                    authorizer, nonce_key(nonce)
+                ] = token_facet.authorizationState(authorizer, nonce, **block)
+
+
+def _accounts(transactions):
+    accounts = set()
+    for tx in transactions:
+        accounts.add(address(tx.sender))
+        for arg in tx.args:
+            if hasattr(arg, "address") or (
+                isinstance(arg, str) and len(arg) == 42 and arg.startswith("0x")
+            ):
+                accounts.add(address(arg))
+    return accounts
+
+
+def _allowances(transactions):
+    pairs = set()
+    for tx in transactions:
+        if tx.function == "transferFrom":
+            pairs.add((address(tx.args[0]), address(tx.sender)))
+        elif tx.function in ("increaseAllowance", "decreaseAllowance"):
+            pairs.add((address(tx.sender), address(tx.args[0])))
+    return pairs
+
+
+def _authorizations(transactions):
+    authorizations = set()
+    for tx in transactions:
+        if tx.function in ("transferWithAuthorization", "receiveWithAuthorization"):
+            authorizations.add((address(tx.args[0]), tx.args[5]))
+        elif tx.function == "cancelAuthorization":
+            authorizations.add((address(tx.args[0]), tx.args[1]))
+    return authorizations
+
+
+class TokenRules:
+    """
+    The checks and state changes of TokenFacet functions, in the order the
+    contract makes them. Every function raises PreflightError with the error
+    the contract would revert with, or applies the changes to the state.
+    """
+
+    def __init__(self, state):
+        self.state = state
+
+    def apply(self, tx):
+        getattr(self, tx.function)(address(tx.sender), *tx.args)
+
+    def check(self, transactions):
+        """The error of each transaction applied in order, None if it succeeds."""
+
+        errors = []
+        for tx in transactions:
+            try:
+                self.apply(tx)
+                errors.append(None)
+            except PreflightError as e:
+                errors.append(e.error)
+        return errors
+
+    def _when_not_paused(self):
+        if self.state.paused:
+            raise PreflightError("TokenPaused")
+
+    def _not_blacklisted(self, *accounts):
+        for account in accounts:
+            if self.state.blacklisted.get(address(account), False):
+                raise PreflightError("AccountBlacklisted", _account=address(account))
+
+    def _balance(self, account):
+        return self.state.balances.get(address(account), 0)
+
+    def _allowance(self, owner, spender):
+        return self.state.allowances.get((address(owner), address(spender)), 0)
+
+    def _transfer(self, _from, _to, _value):
+        _from, _to = address(_from), address(_to)
+        if _from == ZERO_ADDRESS:
+            raise PreflightError("TransferFromZeroAddress")
+        if _to == ZERO_ADDRESS:
+            raise PreflightError("TransferToZeroAddress")
+        balance = self._balance(_from)
+        if _value > balance:
+            raise PreflightError(
+                "TransferAmountExceedsBalance",
+                _account=_from,
+                _value=_value,
+                _balance=balance,
+            )
+        self.state.balances[_from] = balance - _value
+        self.state.balances[_to] = self._balance(_to) + _value
+
+    def _approve(self, _owner, _spender, _value):
+        if address(_owner) == ZERO_ADDRESS:
+            raise PreflightError("ApproveFromZeroAddress")
+        if address(_spender) == ZERO_ADDRESS:
+            raise PreflightError("ApproveToZeroAddress")
+        if not 0 <= _value <= MAX_UINT256:
+            raise PreflightError("Panic", code=PANIC_ARITHMETIC)
+        self.state.allowances[address(_owner), address(_spender)] = _value
+
+    def _require_valid_authorization(
+        self, _authorizer, _nonce, _valid_after, _valid_before
+    ):
+        if self.state.timestamp <= _valid_after:
+            raise PreflightError("AuthorizationNotYetValid", _validAfter=_valid_after)
+        if self.state.timestamp >= _valid_before:
+            raise PreflightError("AuthorizationExpired", _validBefore=_valid_before)
+        self._require_unused_authorization(_authorizer, _nonce)
+
+    def _require_unused_authorization(self, _authorizer, _nonce):
+        key = (address(_authorizer), nonce_key(_nonce))
+        if self.state.authorization_states.get(key, False):
+            raise PreflightError(
+                "AuthorizationUsedOrCanceled", _authorizer=key[0], _nonce=_nonce
+            )
+
+    def _mark_authorization_as_used(self, _authorizer, _nonce):
+        self.state.authorization_states[address(_authorizer), nonce_key(_nonce)] = True
+
+    def transfer(self, sender, _to, _value):
+        self._when_not_paused()
+        self._not_blacklisted(sender, _to)
+        self._transfer(sender, _to, _value)
+
+    def transferFrom(self, sender, _from, _to, _value):
+        self._when_not_paused()
+        self._not_blacklisted(sender, _from, _to)
+        allowance = self._allowance(_from, sender)
+        if _value > allowance:
+            raise PreflightError(
+                "TransferAmountExceedsAllowance",
+                _owner=address(_from),
+                _spender=sender,
+                _value=_value,
+                _allowance=allowance,
+            )
+        self._transfer(_from, _to, _value)
+        if allowance != MAX_UINT256:
+            self.state.allowances[address(_from), sender] = allowance - _value
+
+    def approve(self, sender, _spender, _value):
+        self._when_not_paused()
+        self._not_blacklisted(sender, _spender)
+        self._approve(sender, _spender, _value)
+
+    def increaseAllowance(self, sender, _spender, _increment):
+        self._when_not_paused()
+        self._not_blacklisted(sender, _spender)
+        self._approve(sender, _spender, self._allowance(sender, _spender) + _increment)
+
+    def decreaseAllowance(self, sender, _spender, _decrement):
+        self._when_not_paused()
+        self._not_blacklisted(sender, _spender)
+        self._approve(sender, _spender, self._allowance(sender, _spender) - _decrement)
+
+    def mint(self, sender, _to, _amount):
+        self._when_not_paused()
+        if not self.state.minters.get(sender, False):
+            raise PreflightError("CallerNotMinter", _caller=sender)
+        self._not_blacklisted(sender, _to)
+        minter_allowance = self.state.minter_allowances.get(sender, 0)
+        if _amount > minter_allowance:
+            raise PreflightError(
+                "MintAmountExceedsMinterAllowance",
+                _minter=sender,
+                _amount=_amount,
+                _minterAllowance=minter_allowance,
+            )
+        if address(_to) == ZERO_ADDRESS:
+            raise PreflightError("MintToZeroAddress")
+        if _amount == 0:
+            raise PreflightError("MintAmountZero")
+        self.state.minter_allowances[sender] = minter_allowance - _amount
+        self.state.total_supply += _amount
+        self.state.balances[address(_to)] = self._balance(_to) + _amount
+
+    def burn(self, sender, _amount):
+        self._when_not_paused()
+        self._not_blacklisted(sender)
+        balance = self._balance(sender)
+        if _amount == 0:
+            raise PreflightError("BurnAmountZero")
+        if _amount > balance:
+            raise PreflightError(
+                "BurnAmountExceedsBalance",
+                _account=sender,
+                _amount=_amount,
+                _balance=balance,
+            )
+        self.state.total_supply -= _amount
+        self.state.balances[sender] = balance - _amount
+
+    def permit(self, sender, _owner, _spender, _value, _deadline, _v, _r, _s):
+        self._when_not_paused()
+        self._not_blacklisted(_owner, _spender)
+        if _deadline < self.state.timestamp:
+            raise PreflightError("PermitExpired", _deadline=_deadline)
+        owner = address(_owner)
+        self.state.permit_nonces[owner] = self.state.permit_nonces.get(owner, 0) + 1
+        self._approve(_owner, _spender, _value)
+
+    def permitWithKey(
+        self, sender, _owner, _spender, _value, _key, _deadline, _v, _r, _s
+    ):
+        if _key == 0:
+            return self.permit(sender, _owner, _spender, _value, _deadline, _v, _r, _s)
+        self._when_not_paused()
+        self._not_blacklisted(_owner, _spender)
+        if _deadline < self.state.timestamp:
+            raise PreflightError("PermitExpired", _deadline=_deadline)
+        self._approve(_owner, _spender, _value)
+
+    def transferWithAuthorization(
+        self,
+        sender,
+        _from,
+        _to,
+        _value,
+        _valid_after,
+        _valid_before,
+        _nonce,
+        _v,
+        _r,
+        _s,
+    ):
+        self._when_not_paused()
+        self._not_blacklisted(_from, _to)
+        self._require_valid_authorization(_from, _nonce, _valid_after, _valid_before)
+        self._mark_authorization_as_used(_from, _nonce)
+        self._transfer(_from, _to, _value)
+
+    def receiveWithAuthorization(
+        self,
+        sender,
+        _from,
+        _to,
+        _value,
+        _valid_after,
+        _valid_before,
+        _nonce,
+        _v,
+        _r,
+        _s,
+    ):
+        self._when_not_paused()
+        self._not_blacklisted(_from, _to)
+        if address(_to) != sender:
+            raise PreflightError("CallerNotPayee", _caller=sender, _payee=address(_to))
+        self._require_valid_authorization(_from, _nonce, _valid_after, _valid_before)
+        self._mark_authorization_as_used(_from, _nonce)
+        self._transfer(_from, _to, _value)
+
+    def cancelAuthorization(self, sender, _authorizer, _nonce, _v, _r, _s):
+        self._when_not_paused()
+        self._require_unused_authorization(_authorizer, _nonce)
+        self._mark_authorization_as_used(_authorizer, _nonce)
+
+
+class Preflight:
+    """
+    Checks batches of pending transactions of the TokenFacet of a diamond
+    against a cached state, or with eth_call once the cached state is more
+    than `max_age` blocks old. Call `refresh` to cache the latest state.
+    """
+
+    def __init__(self, token_facet, web3, max_age=2):
+        self.token_facet = token_facet
+        self.web3 = web3
+        self.max_age = max_age
+        self.state = None
+        self.decoder = project_error_decoder()
+
+    def refresh(self):
+        block = self.web3.eth.get_block("latest")
+        self.state = TokenState(
+            block.number,
+            block.timestamp,
+            self.token_facet.paused(block_identifier=block.number),
+        )
+        self.state.total_supply = self.token_facet.totalSupply(
+            block_identifier=block.number
+        )
+
+    def is_stale(self):
+        return (
+            self.state is None
+            or self.web3.eth.block_number - self.state.block_number > self.max_age
+        )
+
+    def check(self, transactions):
+        """
+        The error of each transaction applied in order, None if it succeeds.
+        Simulated with eth_call, each transaction is checked on its own.
+        """
+
+        if self.is_stale():
+            return [self.call(tx) for tx in transactions]
+        self.state.load(self.token_facet, transactions)
+        return TokenRules(self.state.copy()).check(transactions)
+
+    def call(self, tx):
+        """Simulate a single transaction with eth_call at the latest block."""
+
+        data = getattr(self.token_facet, tx.function).encode_input(*tx.args)
+        with recorded_revert_data(self.web3) as recorded:
+            try:
+                self.web3.eth.call(
+                    {
+                        "from": to_checksum_address(address(tx.sender)),
+                        "to": self.token_facet.address,
+                        "data": data,
+                    }
+                )
+            except Exception as e:
+                error = self.decoder.find(e) or self.decoder.find(recorded)
+                return error or DecodedError("Error", {"reason": str(e)})
+        return None
@@ -0,0 +1,221 @@
+"""
+Read cache of TokenFacet state kept up to date by the logs of the diamond.
+
+Every read is made at the block the cache is synced to, so the values served
+together are consistent at that block. `sync` reads the logs of the blocks
+after it and evicts exactly the entries the logs change; a DiamondCut evicts
+everything. transferFrom lowers an allowance without an Approval event, so a
+Transfer evicts the cached allowances of its sender too, and a compact
+settlement of NettingSettlementFacet emits one Settlement event instead of
+its Transfer events, so it evicts the balances of the accounts it lists.
+The least recently used entries are evicted past `max_size`.
+"""
+
+import time
+from collections import OrderedDict, defaultdict
+
+from eth_abi import decode_abi
+from eth_utils import keccak, to_checksum_address
+
+ZERO_ADDRESS = f"0x{'0' * 40}"
+# blocks of logs read at a time
+LOG_BLOCK_RANGE = 5000
+
+
+def topic(signature):
+    return "0x" + keccak(text=signature).hex()
+
+
+TRANSFER = topic("Transfer(address,address,uint256)")
+SETTLEMENT = topic("Settlement(address,uint256,address[],uint256[],uint256[])")
+APPROVAL = topic("Approval(address,address,uint256)")
+BLACKLISTED = topic("Blacklisted(address)")
+UNBLACKLISTED = topic("UnBlacklisted(address)")
+PAUSE = topic("Pause()")
+UNPAUSE = topic("Unpause()")
+MINT = topic("Mint(address,address,uint256)")
+MINTER_CONFIGURED = topic("MinterConfigured(address,uint256)")
+MINTER_REMOVED = topic("MinterRemoved(address)")
+DISTRIBUTION_CREATED = topic("DistributionCreated(uint256,bytes32,address,uint256)")
+DISTRIBUTION_CLOSED = topic("DistributionClosed(uint256,uint256)")
+DIAMOND_CUT = topic("DiamondCut((address,uint8,bytes4[])[],address,bytes)")
+
+
+def hex_string(value):
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return str(value).lower()
+
+
+def topic_address(log, index):
+    return to_checksum_address("0x" + hex_string(log["topics"][index])[-40:])
+
+
+def settlement_accounts(log):
+    """The accounts whose balances a Settlement log changed."""
+
+    _, accounts, _, _ = decode_abi(
+        ["uint256", "address[]", "uint256[]", "uint256[]"],
+        bytes.fromhex(hex_string(log["data"])[2:]),
+    )
+    return [to_checksum_address(account) for account in accounts]
+
+
+class TokenReadCache:
+    """
+    LRU cache of balanceOf, allowance, isBlacklisted, isMinter,
+    minterAllowance and paused of the TokenFacet of a diamond.
+    """
+
+    def __init__(self, token_facet, web3, max_size=100000, block_number=None):
+        self.token_facet = token_facet
+        self.web3 = web3
+        self.max_size = max_size
+        self.block_number = (
+            web3.eth.block_number if block_number is None else block_number
+        )
+        self.entries = OrderedDict()
+        # owner -> spenders of the allowances read, to evict them on a
+        # Transfer from the owner
+        self.spenders = defaultdict(set)
+        self.hits = self.misses = 0
+
+    def _read(self, function, *args):
+        key = (function, *args)
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            value = getattr(self.token_facet, function)(
+                *args, block_identifier=self.block_number
+            )
+            self.entries[key] = value
+            if function == "allowance":
+                self.spenders[args[0]].add(args[1])
+            if len(self.entries) > self.max_size:
+                self._unindex(self.entries.popitem(last=False)[0])
+            return value
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def balance_of(self, account):
+        return self._read("balanceOf", to_checksum_address(account))
+
+    def allowance(self, owner, spender):
+        return self._read(
+            "allowance", to_checksum_address(owner), to_checksum_address(spender)
+        )
+
+    def is_blacklisted(self, account):
+        return self._read("isBlacklisted", to_checksum_address(account))
+
+    def is_minter(self, account):
+        return self._read("isMinter", to_checksum_address(account))
+
+    def minter_allowance(self, minter):
+        return self._read("minterAllowance", to_checksum_address(minter))
+
+    def paused(self):
+        return self._read("paused")
+
+    def _unindex(self, key):
+        """Remove an evicted allowance entry from the spenders of its owner."""
+
+        if key[0] != "allowance":
+            return
+        _, owner, spender = key
+        spenders = self.spenders.get(owner)
+        if spenders is not None:
+            spenders.discard(spender)
+            if not spenders:
+                del self.spenders[owner]
+
+    def evict(self, function, *args):
+        key = (function, *args)
+        self.entries.pop(key, None)
+        self._unindex(key)
+
+    def evict_function(self, function):
+        for key in [key for key in self.entries if key[0] == function]:
+            del self.entries[key]
+            self._unindex(key)
+
+    def evict_allowances(self, owner):
+        for spender in self.spenders.pop(owner, ()):
+            self.evict("allowance", owner, spender)
+
+    def flush(self):
+        self.entries.clear()
+        self.spenders.clear()
+
+    def _evict_minter(self, minter):
+        self.evict("isMinter", minter)
+        self.evict("minterAllowance", minter)
+
+    def apply_log(self, log):
+        """Evict the entries changed by a log of the diamond."""
+
+        topics = [hex_string(t) for t in log["topics"]]
+        if not topics:
+            return
+        event = topics[0]
+        if event == TRANSFER:
+            for index in (1, 2):
+                account = topic_address(log, index)
+                if account != ZERO_ADDRESS:
+                    self.evict("balanceOf", account)
+            # the finite allowances of the sender may have been spent
+            self.evict_allowances(topic_address(log, 1))
+        elif event == SETTLEMENT:
+            for account in settlement_accounts(log):
+                self.evict("balanceOf", account)
+        elif event == APPROVAL:
+            self.evict("allowance", topic_address(log, 1), topic_address(log, 2))
+        elif event in (BLACKLISTED, UNBLACKLISTED):
+            self.evict("isBlacklisted", topic_address(log, 1))
+        elif event in (PAUSE, UNPAUSE):
+            self.evict("paused")
+        elif event in (MINT, MINTER_CONFIGURED, MINTER_REMOVED):
+            self._evict_minter(topic_address(log, 1))
+        elif event == DISTRIBUTION_CREATED:
+            self._evict_minter(topic_address(log, 2))
+        elif event == DISTRIBUTION_CLOSED:
+            # the minter of the distribution isn't in the log
+            self.evict_function("minterAllowance")
+        elif event == DIAMOND_CUT:
+            self.flush()
+
+    def sync(self, to_block="latest"):
+        """Apply the logs up to `to_block` and serve reads at that block."""
+
+        if to_block == "latest":
+            to_block = self.web3.eth.block_number
+        # in ranges of LOG_BLOCK_RANGE blocks, that providers serve after a
+        # long pause too
+        while self.block_number < to_block:
+            end = min(self.block_number + LOG_BLOCK_RANGE, to_block)
+            logs = self.web3.eth.get_logs(
+                {
+                    "address": self.token_facet.address,
+                    "fromBlock": self.block_number + 1,
+                    "toBlock": end,
+                }
+            )
+            self.apply_logs(logs, end)
+        return self.block_number
+
+    def apply_logs(self, logs, block_number):
+        """Apply the logs of the blocks up to `block_number` and serve reads at it."""
+
+        for log in logs:
+            self.apply_log(log)
+        self.block_number = block_number
+        return self.block_number
+
+    def run(self, poll_interval=1):
+        """Sync with every new block until interrupted."""
+
+        while True:
+            self.sync()
+            time.sleep(poll_interval)
@@ -0,0 +1,70 @@
+"""
+Storage layout of the diamond: the slots of AppStorage, of the state
+variables of TokenFacetBase after it and of the diamond storage libraries.
+"""
+
+from eth_utils import keccak
+
+DIAMOND_STORAGE_POSITION = int.from_bytes(
+    keccak(text="diamond.standard.diamond.storage"), "big"
+)
+SNAPSHOT_STORAGE_POSITION = int.from_bytes(
+    keccak(text="diamond.token.snapshot.storage"), "big"
+)
+PERMIT_NONCES_STORAGE_POSITION = int.from_bytes(
+    keccak(text="diamond.token.permit.nonces.storage"), "big"
+)
+
+# AppStorage slots, see contracts/libraries/LibAppStorage.sol
+NAME_SLOT = 0
+VERSION_SLOT = 1
+SYMBOL_SLOT = 2
+DECIMALS_SLOT = 3
+TOTAL_SUPPLY_SLOT = 4
+# paused, blacklister, currentSnapshotId and hotDispatchDisabled
+PAUSED_SLOT = 5
+BLACKLISTER_OFFSET = 1
+CURRENT_SNAPSHOT_ID_OFFSET = 21
+HOT_DISPATCH_DISABLED_OFFSET = 29
+PAUSER_SLOT = 6
+RESCUER_SLOT = 7
+BALANCES_SLOT = 8
+ALLOWED_SLOT = 9
+MINTERS_SLOT = 10
+MINTER_ALLOWED_SLOT = 11
+BLACKLISTED_SLOT = 12
+PERMIT_NONCES_SLOT = 13
+AUTHORIZATION_STATES_SLOT = 14
+# TokenFacetBase state variables after AppStorage
+INITIALIZED_SLOT = 15
+DOMAIN_SEPARATOR_SLOT = 16
+
+# LibDiamond.DiamondStorage slots after DIAMOND_STORAGE_POSITION
+FACETS_OFFSET = 0
+CONTRACT_OWNER_OFFSET = 4
+
+
+def word(value):
+    """32 byte big endian word of a slot, a uint or an address."""
+
+    if isinstance(value, str):
+        value = int(value, 16)
+    return value.to_bytes(32, "big")
+
+
+def mapping_slot(key, slot):
+    """Slot of mapping[key] of the mapping at `slot`, `key` a 32 byte word."""
+
+    return int.from_bytes(keccak(key + word(slot)), "big")
+
+
+def selector_slot(selector):
+    """Slot of ds.facets[selector] in diamond storage."""
+
+    return mapping_slot(
+        bytes(selector).ljust(32, b"\0"), DIAMOND_STORAGE_POSITION + FACETS_OFFSET
+    )
+
+
+def hex_slot(slot):
+    return "0x" + word(slot).hex()
@@ -0,0 +1,293 @@
+"""
+Reads of the token state straight from the storage of the diamond.
+
+The slots of the values are computed from the storage layout, see
+scripts/storage_layout.py, and read at one pinned block, without executing
+the view functions: with JSON-RPC batches of eth_getStorageAt over HTTP, or
+with one eth_getProof per `PROOF_SIZE` slots. `StorageReader.self_check`
+compares the decoded values with the view functions at the same block.
+"""
+
+import requests
+from eth_utils import keccak, to_checksum_address
+
+from scripts.storage_layout import (
+    ALLOWED_SLOT,
+    AUTHORIZATION_STATES_SLOT,
+    BALANCES_SLOT,
+    BLACKLISTED_SLOT,
+    BLACKLISTER_OFFSET,
+    CONTRACT_OWNER_OFFSET,
+    CURRENT_SNAPSHOT_ID_OFFSET,
+    DECIMALS_SLOT,
+    DIAMOND_STORAGE_POSITION,
+    DOMAIN_SEPARATOR_SLOT,
+    HOT_DISPATCH_DISABLED_OFFSET,
+    INITIALIZED_SLOT,
+    MINTER_ALLOWED_SLOT,
+    MINTERS_SLOT,
+    NAME_SLOT,
+    PAUSED_SLOT,
+    PAUSER_SLOT,
+    PERMIT_NONCES_SLOT,
+    RESCUER_SLOT,
+    SYMBOL_SLOT,
+    TOTAL_SUPPLY_SLOT,
+    VERSION_SLOT,
+    hex_slot,
+    mapping_slot,
+    selector_slot,
+    word,
+)
+
+# eth_getStorageAt requests in a JSON-RPC batch
+BATCH_SIZE = 500
+# storage keys of an eth_getProof request
+PROOF_SIZE = 1000
+
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def packed(value, offset, size):
+    """`size` bytes at byte `offset` from the right of a slot."""
+
+    return (value >> (8 * offset)) & ((1 << (8 * size)) - 1)
+
+
+def address(value, offset=0):
+    return to_checksum_address(word(packed(value, offset, 20))[12:])
+
+
+class StorageReader:
+    """
+    Reads of the diamond at `diamond_address` at `block_identifier`, the
+    latest block when the reader is made by default. `method` is
+    "eth_getStorageAt" or "eth_getProof".
+    """
+
+    def __init__(
+        self, web3, diamond_address, block_identifier=None, method="eth_getStorageAt"
+    ):
+        self.web3 = web3
+        self.diamond = to_checksum_address(diamond_address)
+        self.block_identifier = (
+            web3.eth.block_number if block_identifier is None else block_identifier
+        )
+        self.method = method
+        self.requests = 0
+
+    def read(self, slots):
+        """The values of `slots` as integers, by slot."""
+
+        slots = list(dict.fromkeys(slots))
+        if self.method == "eth_getProof":
+            return self._read_proofs(slots)
+        return self._read_storage(slots)
+
+    def _read_proofs(self, slots):
+        values = {}
+        for chunk in chunks(slots, PROOF_SIZE):
+            proof = self.web3.eth.get_proof(
+                self.diamond, [hex_slot(slot) for slot in chunk], self.block_identifier
+            )
+            self.requests += 1
+            for slot, storage_proof in zip(chunk, proof["storageProof"]):
+                values[slot] = int.from_bytes(bytes(storage_proof["value"]), "big")
+        return values
+
+    def _read_storage(self, slots):
+        uri = getattr(self.web3.provider, "endpoint_uri", None)
+        if not uri or not str(uri).startswith("http"):
+            # other providers don't take batches
+            values = {}
+            for slot in slots:
+                value = self.web3.eth.get_storage_at(
+                    self.diamond, slot, self.block_identifier
+                )
+                self.requests += 1
+                values[slot] = int.from_bytes(bytes(value), "big")
+            return values
+
+        block = self.block_identifier
+        if isinstance(block, int):
+            block = hex(block)
+        values = {}
+        for chunk in chunks(slots, BATCH_SIZE):
+            response = requests.post(
+                str(uri),
+                json=[
+                    {
+                        "jsonrpc": "2.0",
+                        "id": i,
+                        "method": "eth_getStorageAt",
+                        "params": [self.diamond, hex(slot), block],
+                    }
+                    for i, slot in enumerate(chunk)
+                ],
+                timeout=60,
+            )
+            response.raise_for_status()
+            self.requests += 1
+            for result in response.json():
+                if "error" in result:
+                    raise ValueError(result["error"])
+                values[chunk[result["id"]]] = int(result["result"], 16)
+        return values
+
+    def _mapping(self, slot, keys, decode=lambda value: value):
+        slots = {key: mapping_slot(word(key), slot) for key in keys}
+        values = self.read(slots.values())
+        return {key: decode(values[slots[key]]) for key in keys}
+
+    def _nested_mapping(self, slot, pairs, decode=lambda value: value):
+        slots = {
+            (a, b): mapping_slot(
+                b if isinstance(b, bytes) else word(b), mapping_slot(word(a), slot)
+            )
+            for a, b in pairs
+        }
+        values = self.read(slots.values())
+        return {pair: decode(values[slots[pair]]) for pair in pairs}
+
+    def balances(self, accounts):
+        return self._mapping(BALANCES_SLOT, accounts)
+
+    def allowances(self, pairs):
+        """Allowances of the (owner, spender) pairs."""
+
+        return self._nested_mapping(ALLOWED_SLOT, pairs)
+
+    def minters(self, accounts):
+        return self._mapping(MINTERS_SLOT, accounts, bool)
+
+    def minter_allowances(self, accounts):
+        return self._mapping(MINTER_ALLOWED_SLOT, accounts)
+
+    def blacklisted(self, accounts):
+        return self._mapping(BLACKLISTED_SLOT, accounts, bool)
+
+    def permit_nonces(self, accounts):
+        return self._mapping(PERMIT_NONCES_SLOT, accounts)
+
+    def authorization_states(self, pairs):
+        """States of the (authorizer, 32 byte nonce) pairs."""
+
+        return self._nested_mapping(AUTHORIZATION_STATES_SLOT, pairs, bool)
+
+    def facet(self, selector):
+        """Facet of a selector, the high 20 bytes of ds.facets[selector]."""
+
+        value = self.read([selector_slot(selector)])[selector_slot(selector)]
+        return address(value, 12)
+
+    def _strings(self, values):
+        """Decode string slots, reading the data slots of the long ones."""
+
+        data_slots = {}
+        for slot, value in values.items():
+            if value & 1:
+                # long string: the slot holds 2 * length + 1
+                length = (value - 1) // 2
+                start = int.from_bytes(keccak(word(slot)), "big")
+                data_slots[slot] = (length, range(start, start + (length + 31) // 32))
+        data = self.read(s for _, slots in data_slots.values() for s in slots)
+
+        strings = {}
+        for slot, value in values.items():
+            if slot in data_slots:
+                length, slots = data_slots[slot]
+                raw = b"".join(word(data[s]) for s in slots)[:length]
+            else:
+                # short string: the data is left aligned, the lowest byte is 2 * length
+                raw = word(value)[: (value & 0xFF) // 2]
+            strings[slot] = raw.decode()
+        return strings
+
+    def token_state(self):
+        """The values of AppStorage outside of the mappings."""
+
+        owner_slot = DIAMOND_STORAGE_POSITION + CONTRACT_OWNER_OFFSET
+        values = self.read(
+            [
+                NAME_SLOT,
+                VERSION_SLOT,
+                SYMBOL_SLOT,
+                DECIMALS_SLOT,
+                TOTAL_SUPPLY_SLOT,
+                PAUSED_SLOT,
+                PAUSER_SLOT,
+                RESCUER_SLOT,
+                INITIALIZED_SLOT,
+                DOMAIN_SEPARATOR_SLOT,
+                owner_slot,
+            ]
+        )
+        strings = self._strings(
+            {slot: values[slot] for slot in (NAME_SLOT, VERSION_SLOT, SYMBOL_SLOT)}
+        )
+        paused = values[PAUSED_SLOT]
+        return {
+            "name": strings[NAME_SLOT],
+            "version": strings[VERSION_SLOT],
+            "symbol": strings[SYMBOL_SLOT],
+            "decimals": packed(values[DECIMALS_SLOT], 0, 1),
+            "totalSupply": values[TOTAL_SUPPLY_SLOT],
+            "paused": bool(packed(paused, 0, 1)),
+            "blacklister": address(paused, BLACKLISTER_OFFSET),
+            "currentSnapshotId": packed(paused, CURRENT_SNAPSHOT_ID_OFFSET, 8),
+            "hotDispatchDisabled": bool(
+                packed(paused, HOT_DISPATCH_DISABLED_OFFSET, 1)
+            ),
+            "pauser": address(values[PAUSER_SLOT]),
+            "rescuer": address(values[RESCUER_SLOT]),
+            "initialized": bool(packed(values[INITIALIZED_SLOT], 0, 1)),
+            "DOMAIN_SEPARATOR": "0x" + word(values[DOMAIN_SEPARATOR_SLOT]).hex(),
+            "owner": address(values[owner_slot]),
+        }
+
+    def self_check(self, token_facet, accounts):
+        """
+        Compare the decoded values with the view functions of `token_facet`,
+        a brownie contract, at the same block. Returns the mismatches as
+        (function, args, storage value, view value).
+        """
+
+        block = {"block_identifier": self.block_identifier}
+        pairs = [(owner, spender) for owner in accounts for spender in accounts]
+        checks = [
+            ("balanceOf", self.balances(accounts)),
+            ("allowance", self.allowances(pairs)),
+            ("isMinter", self.minters(accounts)),
+            ("minterAllowance", self.minter_allowances(accounts)),
+            ("isBlacklisted", self.blacklisted(accounts)),
+            ("nonces", self.permit_nonces(accounts)),
+        ]
+        mismatches = []
+        for function, values in checks:
+            for key, value in values.items():
+                args = key if isinstance(key, tuple) else (key,)
+                view = getattr(token_facet, function)(*args, **block)
+                if view != value:
+                    mismatches.append((function, args, value, view))
+
+        state = self.token_state()
+        for function in ("name", "version", "symbol", "decimals", "totalSupply"):
+            view = getattr(token_facet, function)(**block)
+            if view != state[function]:
+                mismatches.append((function, (), state[function], view))
+        if token_facet.paused(**block) != state["paused"]:
+            mismatches.append(("paused", (), state["paused"], not state["paused"]))
+        domain_separator = "0x" + bytes(token_facet.DOMAIN_SEPARATOR(**block)).hex()
+        if domain_separator != state["DOMAIN_SEPARATOR"]:
+            mismatches.append(
+                (
+                    "DOMAIN_SEPARATOR",
+                    (),
+                    state["DOMAIN_SEPARATOR"],
+                    domain_separator,
+                )
+            )
+        return mismatches
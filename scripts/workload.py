@@ -0,0 +1,517 @@
+"""
+Capture of the token activity of a block window and its replay against a
+local diamond.
+
+`capture` reads the Transfer, Approval, AuthorizationUsed and Settlement logs
+of the diamond and the inputs of their transactions, and writes one JSON
+line per TokenFacet operation. Calls to the diamond are decoded from their
+input, the intents of a `settle` call as transferWithAuthorization
+operations, calls made by other contracts are rebuilt from their logs. A
+compact settlement made by another contract has no Transfer logs, its net
+balance changes are rebuilt as transfers. `replay` maps
+every address of the workload to a local account, signs the permits and
+authorizations again with the keys of the local accounts and sends the
+operations to a new diamond at their original pace, `speed` times faster or
+as fast as possible, then reports the gas of every operation and the
+throughput.
+
+    brownie run scripts/workload.py capture_workload 17000000 17000100 --network mainnet
+    brownie run scripts/workload.py replay_workload workload.jsonl 10 --network ganache-local
+"""
+
+import json
+import os
+import time
+from collections import defaultdict
+
+from eth_abi import decode_abi, encode_abi
+from eth_account import Account
+from eth_utils import function_signature_to_4byte_selector, keccak, to_checksum_address
+
+ZERO_ADDRESS = f"0x{'0' * 40}"
+# blocks of logs read at a time
+LOG_BLOCK_RANGE = 2000
+# balance minted to every local account before the replay
+ACCOUNT_BALANCE = 2**128
+# validBefore of the authorizations signed again, seconds from the replay
+AUTHORIZATION_VALIDITY = 24 * 3600
+# gas limit of the replayed transactions, they skip gas estimation so the
+# operations that revert are sent and counted too
+REPLAY_GAS_LIMIT = 500000
+
+TRANSFER = "0x" + keccak(text="Transfer(address,address,uint256)").hex()
+APPROVAL = "0x" + keccak(text="Approval(address,address,uint256)").hex()
+AUTHORIZATION_USED = "0x" + keccak(text="AuthorizationUsed(address,bytes32)").hex()
+SETTLEMENT = (
+    "0x"
+    + keccak(text="Settlement(address,uint256,address[],uint256[],uint256[])").hex()
+)
+# NettingSettlementFacet.Intent
+INTENT = "(address,address,uint256,uint256,uint256,bytes32,uint8,bytes32,bytes32)"
+SETTLE = function_signature_to_4byte_selector(f"settle({INTENT}[],bool)")
+
+# TokenFacet functions replayed, with the order of their arguments
+OPERATIONS = {
+    "transfer": ["to", "value"],
+    "transferFrom": ["from", "to", "value"],
+    "approve": ["spender", "value"],
+    "increaseAllowance": ["spender", "increment"],
+    "decreaseAllowance": ["spender", "decrement"],
+    "permit": ["owner", "spender", "value", "deadline"],
+    "transferWithAuthorization": [
+        "from",
+        "to",
+        "value",
+        "validAfter",
+        "validBefore",
+        "nonce",
+    ],
+    "receiveWithAuthorization": [
+        "from",
+        "to",
+        "value",
+        "validAfter",
+        "validBefore",
+        "nonce",
+    ],
+    "mint": ["to", "amount"],
+    "burn": ["amount"],
+}
+
+
+def hex_string(value):
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return str(value).lower()
+
+
+def topic_address(topic):
+    return to_checksum_address("0x" + hex_string(topic)[-40:])
+
+
+def json_value(value):
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return value
+
+
+def operation(tx, timestamp, function, sender, args):
+    return {
+        "block": tx["blockNumber"],
+        "timestamp": timestamp,
+        "tx": hex_string(tx["hash"]),
+        "function": function,
+        "sender": to_checksum_address(sender),
+        "args": {name: json_value(value) for name, value in args.items()},
+    }
+
+
+def _settle_operations(tx, timestamp, data):
+    """transferWithAuthorization operations of the intents of a settle call."""
+
+    intents, _ = decode_abi([f"{INTENT}[]", "bool"], data[4:])
+    return [
+        operation(
+            tx,
+            timestamp,
+            "transferWithAuthorization",
+            tx["from"],
+            {
+                "from": to_checksum_address(_from),
+                "to": to_checksum_address(to),
+                "value": value,
+                "validAfter": valid_after,
+                "validBefore": valid_before,
+                "nonce": nonce,
+            },
+        )
+        for _from, to, value, valid_after, valid_before, nonce, _, _, _ in intents
+    ]
+
+
+def _settlement_transfers(log):
+    """Transfers with the net balance changes of a Settlement log."""
+
+    _, accounts, credits, debits = decode_abi(
+        ["uint256", "address[]", "uint256[]", "uint256[]"],
+        bytes.fromhex(hex_string(log["data"])[2:]),
+    )
+    accounts = [to_checksum_address(account) for account in accounts]
+    payers = [[a, d - c] for a, c, d in zip(accounts, credits, debits) if d > c]
+    payees = [[a, c - d] for a, c, d in zip(accounts, credits, debits) if c > d]
+    # the net changes sum to zero
+    transfers = []
+    for payee in payees:
+        while payee[1]:
+            payer = payers[0]
+            value = min(payer[1], payee[1])
+            transfers.append([payer[0], payee[0], value])
+            payer[1] -= value
+            payee[1] -= value
+            if not payer[1]:
+                payers.pop(0)
+    return transfers
+
+
+def _log_operations(tx, timestamp, logs):
+    """Operations of a transaction that called the diamond from another contract."""
+
+    transfers = []
+    operations = []
+    for log in logs:
+        topics = [hex_string(topic) for topic in log["topics"]]
+        data = hex_string(log["data"])
+        if topics[0] == TRANSFER:
+            transfers.append(
+                [topic_address(topics[1]), topic_address(topics[2]), int(data, 16)]
+            )
+        elif topics[0] == SETTLEMENT:
+            transfers += _settlement_transfers(log)
+        elif topics[0] == APPROVAL:
+            owner, spender = topic_address(topics[1]), topic_address(topics[2])
+            operations.append(
+                operation(
+                    tx,
+                    timestamp,
+                    "approve",
+                    owner,
+                    {"spender": spender, "value": int(data, 16)},
+                )
+            )
+    authorizations = [
+        (topic_address(log["topics"][1]), hex_string(log["topics"][2]))
+        for log in logs
+        if hex_string(log["topics"][0]) == AUTHORIZATION_USED
+    ]
+    for authorizer, nonce in authorizations:
+        for transfer in transfers:
+            if transfer[0] == authorizer:
+                transfers.remove(transfer)
+                _from, to, value = transfer
+                args = {
+                    "from": _from,
+                    "to": to,
+                    "value": value,
+                    "validAfter": 0,
+                    "validBefore": timestamp + AUTHORIZATION_VALIDITY,
+                    "nonce": nonce,
+                }
+                operations.append(
+                    operation(
+                        tx, timestamp, "transferWithAuthorization", tx["from"], args
+                    )
+                )
+                break
+    for _from, to, value in transfers:
+        if _from == ZERO_ADDRESS:
+            operations.append(
+                operation(
+                    tx, timestamp, "mint", tx["from"], {"to": to, "amount": value}
+                )
+            )
+        elif to == ZERO_ADDRESS:
+            operations.append(
+                operation(tx, timestamp, "burn", _from, {"amount": value})
+            )
+        else:
+            operations.append(
+                operation(tx, timestamp, "transfer", _from, {"to": to, "value": value})
+            )
+    return operations
+
+
+def capture(web3, token_facet, from_block, to_block, path):
+    """
+    Write the operations on the diamond of `token_facet`, a web3 contract,
+    from `from_block` to `to_block` to `path`. Returns their number.
+    """
+
+    logs = defaultdict(list)
+    for start in range(from_block, to_block + 1, LOG_BLOCK_RANGE):
+        for log in web3.eth.get_logs(
+            {
+                "address": token_facet.address,
+                "fromBlock": start,
+                "toBlock": min(start + LOG_BLOCK_RANGE - 1, to_block),
+                "topics": [[TRANSFER, APPROVAL, AUTHORIZATION_USED, SETTLEMENT]],
+            }
+        ):
+            logs[hex_string(log["transactionHash"])].append(log)
+
+    timestamps = {}
+    count = 0
+    with open(path, "w") as f:
+        for tx_hash, tx_logs in sorted(
+            logs.items(),
+            key=lambda item: (
+                item[1][0]["blockNumber"],
+                item[1][0]["transactionIndex"],
+            ),
+        ):
+            tx = web3.eth.get_transaction(tx_hash)
+            if tx["blockNumber"] not in timestamps:
+                timestamps[tx["blockNumber"]] = web3.eth.get_block(tx["blockNumber"])[
+                    "timestamp"
+                ]
+            timestamp = timestamps[tx["blockNumber"]]
+
+            operations = None
+            data = bytes.fromhex(hex_string(tx["input"])[2:])
+            if tx["to"] and tx["to"].lower() == token_facet.address.lower():
+                try:
+                    function, args = token_facet.decode_function_input(tx["input"])
+                except ValueError:
+                    function = None
+                if data[:4] == SETTLE:
+                    operations = _settle_operations(tx, timestamp, data)
+                elif function is not None and function.fn_name in OPERATIONS:
+                    args = {name.lstrip("_"): value for name, value in args.items()}
+                    operations = [
+                        operation(tx, timestamp, function.fn_name, tx["from"], args)
+                    ]
+            if operations is None:
+                operations = _log_operations(tx, timestamp, tx_logs)
+
+            for op in operations:
+                f.write(json.dumps(op) + "\n")
+            count += len(operations)
+    print(f"Captured {count} operations of blocks {from_block} to {to_block}")
+    return count
+
+
+def read_workload(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+class LocalAccounts:
+    """Local accounts of the addresses of a workload, in order of appearance."""
+
+    def __init__(self, seed=b"workload"):
+        self.seed = seed
+        self.keys = {}
+
+    def key(self, address):
+        address = address.lower()
+        if address not in self.keys:
+            self.keys[address] = (
+                "0x" + keccak(self.seed + len(self.keys).to_bytes(32, "big")).hex()
+            )
+        return self.keys[address]
+
+    def address(self, address):
+        if address.lower() == ZERO_ADDRESS:
+            return ZERO_ADDRESS
+        return Account.from_key(self.key(address)).address
+
+    def rewrite(self, op):
+        """`op` with the addresses of the local accounts."""
+
+        args = dict(op["args"])
+        for name in ("to", "from", "owner", "spender"):
+            if name in args:
+                args[name] = self.address(args[name])
+        return dict(op, sender=self.address(op["sender"]), args=args)
+
+
+def sign(domain_separator, types, values, key):
+    digest = keccak(b"\x19\x01" + domain_separator + keccak(encode_abi(types, values)))
+    signed = Account._sign_hash(digest, key)
+    return signed.v, signed.r.to_bytes(32, "big"), signed.s.to_bytes(32, "big")
+
+
+class Replay:
+    """Sends the operations of a workload to the TokenFacet of a local diamond."""
+
+    def __init__(self, token_facet, minter, accounts=None):
+        self.token_facet = token_facet
+        self.minter = minter
+        self.accounts = accounts or LocalAccounts()
+        self.domain_separator = bytes(token_facet.DOMAIN_SEPARATOR())
+        self.typehashes = {
+            "permit": bytes(token_facet.PERMIT_TYPEHASH()),
+            "transferWithAuthorization": bytes(
+                token_facet.TRANSFER_WITH_AUTHORIZATION_TYPEHASH()
+            ),
+            "receiveWithAuthorization": bytes(
+                token_facet.RECEIVE_WITH_AUTHORIZATION_TYPEHASH()
+            ),
+        }
+        self.permit_nonces = {}
+        self._local_accounts = {}
+
+    def account(self, address):
+        """The brownie account of the local account of `address`."""
+
+        from brownie import accounts
+
+        key = self.accounts.key(address)
+        if key not in self._local_accounts:
+            self._local_accounts[key] = accounts.add(key)
+        return self._local_accounts[key]
+
+    def prepare(self, ops, gas_funding):
+        """Fund the local accounts with ether and tokens and allow their transferFroms."""
+
+        senders = {op["sender"].lower() for op in ops if op["function"] != "mint"}
+        holders = senders | {
+            op["args"][name].lower()
+            for op in ops
+            for name in ("from", "owner")
+            if name in op["args"]
+        }
+        mints = sum(op["args"]["amount"] for op in ops if op["function"] == "mint")
+        self.token_facet.configureMinter(
+            self.minter,
+            ACCOUNT_BALANCE * len(holders) + mints,
+            {"from": self.minter},
+        ).wait(1)
+        for address in holders:
+            account = self.account(address)
+            if address in senders:
+                self.minter.transfer(account, gas_funding).wait(1)
+            self.token_facet.mint(account, ACCOUNT_BALANCE, {"from": self.minter}).wait(
+                1
+            )
+        for owner, spender in {
+            (op["args"]["from"], op["sender"])
+            for op in ops
+            if op["function"] == "transferFrom"
+        }:
+            self.token_facet.approve(
+                self.accounts.address(spender),
+                ACCOUNT_BALANCE,
+                {"from": self.account(owner)},
+            ).wait(1)
+
+    def _signature(self, op, args):
+        """v, r and s of the operation signed by its local account."""
+
+        function = op["function"]
+        if function == "permit":
+            owner = args["owner"]
+            nonce = self.permit_nonces.get(owner, self.token_facet.nonces(owner))
+            self.permit_nonces[owner] = nonce + 1
+            types = ["address", "address", "uint256", "uint256", "uint256"]
+            values = [owner, args["spender"], args["value"], nonce, args["deadline"]]
+            signer = op["args"]["owner"]
+        else:
+            types = ["address", "address", "uint256", "uint256", "uint256", "bytes32"]
+            values = [
+                args["from"],
+                args["to"],
+                args["value"],
+                args["validAfter"],
+                args["validBefore"],
+                bytes.fromhex(args["nonce"][2:]),
+            ]
+            signer = op["args"]["from"]
+        return sign(
+            self.domain_separator,
+            ["bytes32", *types],
+            [self.typehashes[function], *values],
+            self.accounts.key(signer),
+        )
+
+    def send(self, op):
+        """Send an operation without waiting for it, returns its receipt."""
+
+        local = self.accounts.rewrite(op)
+        args = local["args"]
+        function = op["function"]
+        if function == "permit":
+            args["deadline"] = 2**256 - 1
+        elif function.endswith("WithAuthorization"):
+            args["validAfter"] = 0
+            args["validBefore"] = int(time.time()) + AUTHORIZATION_VALIDITY
+        if function == "mint":
+            sender = self.minter
+        else:
+            sender = self.account(op["sender"])
+        values = [args[name] for name in OPERATIONS[function]]
+        if function == "permit" or function.endswith("WithAuthorization"):
+            values += self._signature(op, args)
+        return getattr(self.token_facet, function)(
+            *values,
+            {
+                "from": sender,
+                "required_confs": 0,
+                "allow_revert": True,
+                "gas_limit": REPLAY_GAS_LIMIT,
+            },
+        )
+
+    def run(self, ops, speed=0):
+        """
+        Send `ops` `speed` times faster than they were sent, as fast as
+        possible if `speed` is 0. Returns the gas used by every function and
+        the throughput.
+        """
+
+        receipts = []
+        start = time.perf_counter()
+        first = ops[0]["timestamp"] if ops else 0
+        for op in ops:
+            if speed:
+                delay = (op["timestamp"] - first) / speed - (
+                    time.perf_counter() - start
+                )
+                if delay > 0:
+                    time.sleep(delay)
+            receipts.append((op["function"], self.send(op)))
+
+        gas = defaultdict(lambda: {"count": 0, "reverted": 0, "gas_used": 0})
+        for function, tx in receipts:
+            tx.wait(1)
+            gas[function]["count"] += 1
+            if tx.status != 1:
+                gas[function]["reverted"] += 1
+            gas[function]["gas_used"] += tx.gas_used
+        elapsed = time.perf_counter() - start
+
+        for totals in gas.values():
+            totals["mean_gas_used"] = totals["gas_used"] // totals["count"]
+        return {
+            "operations": len(receipts),
+            "seconds": elapsed,
+            "operations_per_second": len(receipts) / elapsed if elapsed else 0,
+            "gas_used": sum(totals["gas_used"] for totals in gas.values()),
+            "functions": dict(gas),
+        }
+
+
+def print_report(report):
+    print(f"{'function':<28}{'count':>8}{'reverted':>10}{'gas':>14}{'mean':>10}")
+    for function, totals in sorted(report["functions"].items()):
+        print(
+            f"{function:<28}{totals['count']:>8}{totals['reverted']:>10}"
+            f"{totals['gas_used']:>14}{totals['mean_gas_used']:>10}"
+        )
+    print(
+        f"{report['operations']} operations, {report['gas_used']} gas in "
+        f"{report['seconds']:.1f}s, {report['operations_per_second']:.1f} operations/s"
+    )
+
+
+def capture_workload(from_block, to_block, path="workload.jsonl"):
+    from brownie import Diamond, TokenFacet, web3
+
+    token_facet = web3.eth.contract(address=Diamond[-1].address, abi=TokenFacet.abi)
+    return capture(web3, token_facet, int(from_block), int(to_block), path)
+
+
+def replay_workload(path="workload.jsonl", speed=0):
+    from brownie import Contract, TokenFacet, web3
+    from scripts.benchmark_gas import write_results
+    from scripts.deploy import deploy_diamond, get_account
+
+    ops = read_workload(path)
+    account = get_account()
+    diamond_address = deploy_diamond()
+    token_facet = Contract.from_abi("TokenFacet", diamond_address, abi=TokenFacet.abi)
+    replay = Replay(token_facet, account)
+    replay.prepare(ops, web3.toWei(1, "ether"))
+    report = replay.run(ops, float(speed))
+    print_report(report)
+    write_results("workload", dict(report, workload=os.path.basename(path)))
+    return report
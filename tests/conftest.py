@@ -0,0 +1,228 @@
+"""
+Timing, gas and RPC requests of every test.
+
+The RPC requests made through brownie's web3 are counted and timed per test
+and method, and the gas used by the transactions a test sends is summed from
+their receipts. The slowest tests and the RPC methods that take the most time
+are printed after the run, and with `--suite-report PATH` the measurements are
+written as JSON, to compare runs over time:
+
+    brownie test -s --network ganache-local --suite-report reports/suite.json
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+
+import pytest
+from web3.exceptions import TransactionNotFound
+
+SEND_METHODS = ("eth_sendTransaction", "eth_sendRawTransaction")
+RECEIPT_METHOD = "eth_getTransactionReceipt"
+
+
+def _int(value):
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+def _hash(value):
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return str(value).lower()
+
+
+class SuiteReport:
+    """Measurements of the tests of a session."""
+
+    def __init__(self):
+        self.tests = []
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._web3 = None
+        self._test = None
+        # transactions sent by the current test -> gas used, None until
+        # its receipt is seen
+        self._transactions = {}
+
+    def middleware(self, make_request, web3):
+        def middleware(method, params):
+            start = time.perf_counter()
+            response = None
+            try:
+                response = make_request(method, params)
+                return response
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    if self._test is not None:
+                        self._record(method, params, response, elapsed)
+
+        return middleware
+
+    def _record(self, method, params, response, elapsed):
+        rpc = self._test["rpc"][method]
+        rpc[0] += 1
+        rpc[1] += elapsed
+        result = (response or {}).get("result")
+        if not result:
+            return
+        if method in SEND_METHODS:
+            self._transactions.setdefault(_hash(result), None)
+        elif method == RECEIPT_METHOD and _hash(params[0]) in self._transactions:
+            self._transactions[_hash(params[0])] = _int(result["gasUsed"])
+
+    def install(self, web3):
+        if self._web3 is not web3:
+            web3.middleware_onion.add(self.middleware, "suite_report")
+            self._web3 = web3
+
+    def start(self, nodeid):
+        from brownie import network, web3
+
+        if network.is_connected():
+            self.install(web3)
+        with self._lock:
+            self._transactions = {}
+            self._test = {
+                "nodeid": nodeid,
+                "outcome": "passed",
+                "rpc": defaultdict(lambda: [0, 0.0]),
+                "start": time.perf_counter(),
+            }
+
+    def finish(self):
+        with self._lock:
+            test, self._test = self._test, None
+            transactions = self._transactions
+        if test is None:
+            return
+        seconds = time.perf_counter() - test.pop("start")
+        # receipts the test didn't ask for, read outside of its measurements.
+        # A transaction left unmined, or reverted away with the chain, has no
+        # receipt and no gas.
+        for tx_hash, gas_used in transactions.items():
+            if gas_used is None and self._web3 is not None:
+                try:
+                    receipt = self._web3.eth.get_transaction_receipt(tx_hash)
+                except (TransactionNotFound, ValueError):
+                    receipt = None
+                if receipt is not None:
+                    transactions[tx_hash] = receipt["gasUsed"]
+        rpc = {
+            method: {"calls": calls, "seconds": elapsed}
+            for method, (calls, elapsed) in sorted(test["rpc"].items())
+        }
+        self.tests.append(
+            {
+                "nodeid": test["nodeid"],
+                "outcome": test["outcome"],
+                "seconds": seconds,
+                "rpc_calls": sum(r["calls"] for r in rpc.values()),
+                "rpc_seconds": sum(r["seconds"] for r in rpc.values()),
+                "transactions": len(transactions),
+                "gas_used": sum(
+                    gas_used for gas_used in transactions.values() if gas_used
+                ),
+                "rpc": rpc,
+            }
+        )
+
+    def outcome(self, report):
+        with self._lock:
+            if self._test is not None and (report.failed or report.skipped):
+                if self._test["outcome"] != "failed":
+                    self._test["outcome"] = report.outcome
+
+    def rpc_totals(self):
+        """Calls and seconds of every RPC method over the session."""
+
+        totals = defaultdict(lambda: {"calls": 0, "seconds": 0.0})
+        for test in self.tests:
+            for method, rpc in test["rpc"].items():
+                totals[method]["calls"] += rpc["calls"]
+                totals[method]["seconds"] += rpc["seconds"]
+        return dict(sorted(totals.items()))
+
+    def report(self):
+        return {
+            "started_at": self.started_at,
+            "seconds": sum(test["seconds"] for test in self.tests),
+            "rpc_calls": sum(test["rpc_calls"] for test in self.tests),
+            "gas_used": sum(test["gas_used"] for test in self.tests),
+            "rpc": self.rpc_totals(),
+            "tests": self.tests,
+        }
+
+    def write(self, path):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def summary(self, terminalreporter, top):
+        if not self.tests:
+            return
+        write = terminalreporter.write_line
+        terminalreporter.section("suite report")
+        write(
+            f"{'seconds':>8} {'rpc calls':>9} {'rpc s':>7} {'txs':>4} "
+            f"{'gas used':>10}  test"
+        )
+        for test in sorted(self.tests, key=lambda t: -t["seconds"])[:top]:
+            write(
+                f"{test['seconds']:8.1f} {test['rpc_calls']:9} "
+                f"{test['rpc_seconds']:7.1f} {test['transactions']:4} "
+                f"{test['gas_used']:10}  {test['nodeid']}"
+            )
+        write("")
+        write(f"{'seconds':>8} {'calls':>7} {'ms/call':>8}  method")
+        totals = sorted(self.rpc_totals().items(), key=lambda item: -item[1]["seconds"])
+        for method, rpc in totals[:top]:
+            write(
+                f"{rpc['seconds']:8.1f} {rpc['calls']:7} "
+                f"{1000 * rpc['seconds'] / rpc['calls']:8.1f}  {method}"
+            )
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("suite report")
+    group.addoption(
+        "--suite-report",
+        metavar="PATH",
+        default=None,
+        help="write the timing, gas and RPC requests of every test as JSON",
+    )
+    group.addoption(
+        "--suite-report-top",
+        type=int,
+        default=10,
+        help="tests and RPC methods listed in the summary",
+    )
+
+
+def pytest_configure(config):
+    config.suite_report = SuiteReport()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    item.config.suite_report.start(item.nodeid)
+    yield
+    item.config.suite_report.finish()
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    item.config.suite_report.outcome(outcome.get_result())
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    config.suite_report.summary(
+        terminalreporter, config.getoption("--suite-report-top")
+    )
+
+
+def pytest_sessionfinish(session):
+    path = session.config.getoption("--suite-report")
+    if path:
+        session.config.suite_report.write(path)
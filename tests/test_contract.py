@@ -1,37 +1,86 @@
+import json
 import sys
 import time
 
 import eth_abi
 import pytest
 from brownie import (
+    BatchViewFacet,
+    ChunkedCutInit,
     Contract,
     Diamond,
     DiamondCutFacet,
+    DiamondFactory,
+    DiamondInit,
     DiamondLoupeFacet,
+    ERC1363ReceiverMock,
+    HotDiamond,
+    HotDispatchInit,
+    MerkleDistributionFacet,
+    NettingSettlementFacet,
     OwnershipFacet,
+    PackedCalldataFacet,
+    SelectorFacetMock,
+    SnapshotFacet,
     TokenFacet,
     accounts,
     config,
     interface,
     network,
+    web3,
 )
+from brownie.exceptions import VirtualMachineError
 from eth_account import Account
 from eth_account.messages import encode_defunct
 from eth_typing import Primitives
 from web3.auto import w3
 
+from scripts.access_list import AccessListBuilder, storage_keys
+from scripts.balance_export import BalanceExport, read_balances
+from scripts.benchmark_diamond import FACET_SELECTORS, ScalingBenchmark
+from scripts.blacklist_sync import BlacklistSync, read_feed
+from scripts.chunked_cut import ADD, REMOVE, REPLACE, ChunkedCutPlanner, chunk_cut
+from scripts.create2 import init_code_hash, leading_zero_bytes, mine
+from scripts.deploy import add_facet, hot_selectors
+from scripts.errors import project_error_decoder, recorded_revert_data
+from scripts.lean_client import ENCODERS, GAS_LIMITS, LeanClient
+from scripts.merkle_distribution import MerkleTree, build_tree
+from scripts.metrics import Metrics, read_records
+from scripts.packed_calldata import (
+    encode_receive_with_authorization,
+    encode_transfer,
+    encode_transfer_from,
+    encode_transfer_with_authorization,
+)
+from scripts.preflight import PendingTransaction, Preflight
+from scripts.read_cache import DIAMOND_CUT, TokenReadCache
+from scripts.storage_layout import BALANCES_SLOT, PAUSED_SLOT, mapping_slot, word
+from scripts.storage_reader import StorageReader
+from scripts.workload import Replay, capture, read_workload
+
 
 # Is required to solve brownie reverts problem with Python >= 3.10
+# `reason` is either a revert reason string or the name of a custom error,
+# custom errors are decoded by their selector from the revert data.
 class reverts(object):
     def __init__(self, reason=""):
+        self.error_name = reason
         self.reason = f" {reason}" if reason != "" else ""
 
     def __enter__(self):
-        pass
+        self.recorder = recorded_revert_data(web3)
+        self.recorded = self.recorder.__enter__()
 
     def __exit__(self, e_typ, e_val, trcbak):
-        if e_typ is ValueError:
-            return str(e_val).find(f"revert{self.reason}") >= 0
+        self.recorder.__exit__(None, None, None)
+
+        if e_typ is ValueError or e_typ is VirtualMachineError:
+            if str(e_val).find(f"revert{self.reason}") >= 0:
+                return True
+
+            decoder = project_error_decoder()
+            error = decoder.find(e_val) or decoder.find(self.recorded)
+            return error is not None and error.name == self.error_name
 
         elif e_typ is None:
             assert False, "Transaction did not revert"
@@ -47,6 +96,75 @@ def to_32byte_hex(val: Primitives) -> str:
     return w3.toHex(w3.toBytes(val).rjust(32, b"\0"))
 
 
+def permit_digest(
+    owner: str, spender: str, value: int, nonce: int, deadline: int
+) -> str:
+    return w3.keccak(
+        hexstr=(
+            pytest.MAGIC_BYTES
+            + w3.toBytes(hexstr=pytest.DOMAIN_SEPARATOR)
+            + w3.keccak(
+                hexstr=eth_abi.abi.encode_abi(
+                    [
+                        "bytes32",
+                        "address",
+                        "address",
+                        "uint256",
+                        "uint256",
+                        "uint256",
+                    ],
+                    [
+                        w3.toBytes(hexstr=pytest.PERMIT_TYPEHASH),
+                        owner,
+                        spender,
+                        value,
+                        nonce,
+                        deadline,
+                    ],
+                ).hex()
+            )
+        ).hex()
+    ).hex()
+
+
+def transfer_authorization_digest(
+    authorizer: str,
+    to: str,
+    value: int,
+    valid_after: int,
+    valid_before: int,
+    nonce: str,
+) -> str:
+    return w3.keccak(
+        hexstr=(
+            pytest.MAGIC_BYTES
+            + w3.toBytes(hexstr=pytest.DOMAIN_SEPARATOR)
+            + w3.keccak(
+                hexstr=eth_abi.abi.encode_abi(
+                    [
+                        "bytes32",
+                        "address",
+                        "address",
+                        "uint256",
+                        "uint256",
+                        "uint256",
+                        "bytes32",
+                    ],
+                    [
+                        w3.toBytes(hexstr=pytest.TRANSFER_WITH_AUTHORIZATION_TYPEHASH),
+                        authorizer,
+                        to,
+                        value,
+                        valid_after,
+                        valid_before,
+                        w3.toBytes(hexstr=nonce),
+                    ],
+                ).hex()
+            )
+        ).hex()
+    ).hex()
+
+
 @pytest.fixture
 def global_var():
 
@@ -205,11 +323,11 @@ def test_002_ownership_facet(global_var):
     assert current_owner == pytest.account.address
 
     """
-    All subsequent functions with notBlacklisted modifier must revert with `Must be contract owner` reason.
+    All subsequent functions with notBlacklisted modifier must revert with `NotContractOwner` reason.
     (configureMinter, removeMinter, updateRescuer, updatePauser, updateBlacklister)
     """
 
-    with reverts("Must be contract owner"):
+    with reverts("NotContractOwner"):
         pytest.token_facet.configureMinter(
             pytest.other_account, 0, {"from": pytest.other_account}
         )
@@ -234,7 +352,7 @@ def test_003_token_facet_setup(global_var):
         setup(string memory _name, string memory _symbol, uint8 _decimals) external;
     """
 
-    with reverts():
+    with reverts("AlreadyInitialized"):
         pytest.token_facet.setup(
             pytest.DEPLOYED_NAME,
             pytest.DEPLOYED_VERSION,
@@ -309,15 +427,15 @@ def test_005_token_facet_mint_burn(global_var):
     assert pytest.token_facet.isMinter(pytest.account.address) == True
     assert post_config_minter_allowance == pytest.TEST_SUPPLY
 
-    with reverts("Mint to the zero address"):
+    with reverts("MintToZeroAddress"):
         pytest.token_facet.mint(
             pytest.ZERO_ADDRESS, pytest.TEST_SUPPLY, {"from": pytest.account}
         )
 
-    with reverts("Mint amount not greater than 0"):
+    with reverts("MintAmountZero"):
         pytest.token_facet.mint(pytest.account.address, 0, {"from": pytest.account})
 
-    with reverts("Mint amount exceeds minterAllowance"):
+    with reverts("MintAmountExceedsMinterAllowance"):
         pytest.token_facet.mint(
             pytest.account.address, pytest.TEST_SUPPLY + 1, {"from": pytest.account}
         )
@@ -340,10 +458,10 @@ def test_005_token_facet_mint_burn(global_var):
     expected_total_supply = pre_burn_total_supply - pytest.TEST_AMOUNT
     expected_balance = pre_burn_balance - pytest.TEST_AMOUNT
 
-    with reverts("Burn amount not greater than 0"):
+    with reverts("BurnAmountZero"):
         pytest.token_facet.burn(0, {"from": pytest.account})
 
-    with reverts("Burn amount exceeds balance"):
+    with reverts("BurnAmountExceedsBalance"):
         pytest.token_facet.burn(pytest.TEST_SUPPLY + 1, {"from": pytest.account})
 
     tx = pytest.token_facet.burn(pytest.TEST_AMOUNT, {"from": pytest.account})
@@ -380,12 +498,12 @@ def test_006_token_facet_transfer(global_var):
     expected_balance_from = pre_transfer_balance_from - pytest.TEST_AMOUNT
     expected_balance_to = pre_transfer_balance_to + pytest.TEST_AMOUNT
 
-    with reverts("Transfer to the zero address"):
+    with reverts("TransferToZeroAddress"):
         pytest.token_facet.transfer(
             pytest.ZERO_ADDRESS, pytest.TEST_AMOUNT, {"from": pytest.account}
         )
 
-    with reverts("Transfer amount exceeds balance"):
+    with reverts("TransferAmountExceedsBalance"):
         pytest.token_facet.transfer(
             pytest.other_account.address,
             pytest.TEST_SUPPLY + 1,
@@ -412,7 +530,7 @@ def test_006_token_facet_transfer(global_var):
     expected_balance_from = pre_transfer_balance_from - pytest.TEST_AMOUNT
     expected_balance_to = pre_transfer_balance_to + pytest.TEST_AMOUNT
 
-    with reverts("Approve to the zero address"):
+    with reverts("ApproveToZeroAddress"):
         pytest.token_facet.approve(
             pytest.ZERO_ADDRESS, pytest.TEST_AMOUNT, {"from": pytest.account}
         )
@@ -423,7 +541,7 @@ def test_006_token_facet_transfer(global_var):
     tx.wait(1)
     time.sleep(5)
 
-    with reverts("Transfer amount exceeds allowance"):
+    with reverts("TransferAmountExceedsAllowance"):
         pytest.token_facet.transferFrom(
             pytest.account.address,
             pytest.other_account.address,
@@ -587,7 +705,7 @@ def test_008_token_facet_eip2612(global_var_and_domain_separator):
         digest, pytest.ACCOUNT_PRIVATE_KEY
     )
 
-    with reverts("Permit is expired"):
+    with reverts("PermitExpired"):
         pytest.token_facet.permit(
             pytest.account.address,
             pytest.other_account.address,
@@ -599,7 +717,7 @@ def test_008_token_facet_eip2612(global_var_and_domain_separator):
             {"from": pytest.other_account},
         )
 
-    with reverts("Invalid signature"):
+    with reverts("InvalidSignatureVValue"):
         pytest.token_facet.permit(
             pytest.account.address,
             pytest.other_account.address,
@@ -766,7 +884,7 @@ def test_009_token_facet_eip3009(global_var_and_domain_separator):
     expected_balance_from = pre_transfer_balance_from - pytest.TEST_AMOUNT
     expected_balance_to = pre_transfer_balance_to + pytest.TEST_AMOUNT
 
-    with reverts("Authorization is not yet valid"):
+    with reverts("AuthorizationNotYetValid"):
         tx = pytest.token_facet.transferWithAuthorization(
             pytest.account.address,
             pytest.other_account.address,
@@ -780,7 +898,7 @@ def test_009_token_facet_eip3009(global_var_and_domain_separator):
             {"from": pytest.other_account},
         )
 
-    with reverts("Authorization is expired"):
+    with reverts("AuthorizationExpired"):
         tx = pytest.token_facet.transferWithAuthorization(
             pytest.account.address,
             pytest.other_account.address,
@@ -794,7 +912,7 @@ def test_009_token_facet_eip3009(global_var_and_domain_separator):
             {"from": pytest.other_account},
         )
 
-    with reverts("Invalid signature"):
+    with reverts("InvalidSigner"):
         tx = pytest.token_facet.transferWithAuthorization(
             pytest.account.address,
             pytest.other_account.address,
@@ -875,7 +993,7 @@ def test_009_token_facet_eip3009(global_var_and_domain_separator):
     expected_balance_from = pre_transfer_balance_from - pytest.TEST_AMOUNT
     expected_balance_to = pre_transfer_balance_to + pytest.TEST_AMOUNT
 
-    with reverts("Authorization is not yet valid"):
+    with reverts("AuthorizationNotYetValid"):
         tx = pytest.token_facet.receiveWithAuthorization(
             pytest.account.address,
             pytest.other_account.address,
@@ -889,7 +1007,7 @@ def test_009_token_facet_eip3009(global_var_and_domain_separator):
             {"from": pytest.other_account},
         )
 
-    with reverts("Authorization is expired"):
+    with reverts("AuthorizationExpired"):
         tx = pytest.token_facet.receiveWithAuthorization(
             pytest.account.address,
             pytest.other_account.address,
@@ -903,7 +1021,7 @@ def test_009_token_facet_eip3009(global_var_and_domain_separator):
             {"from": pytest.other_account},
         )
 
-    with reverts("Caller must be the payee"):
+    with reverts("CallerNotPayee"):
         tx = pytest.token_facet.receiveWithAuthorization(
             pytest.account.address,
             pytest.other_account.address,
@@ -978,7 +1096,7 @@ def test_009_token_facet_eip3009(global_var_and_domain_separator):
         digest, pytest.ACCOUNT_PRIVATE_KEY
     )
 
-    with reverts("Invalid signature"):
+    with reverts("InvalidSigner"):
         tx = pytest.token_facet.receiveWithAuthorization(
             pytest.account.address,
             pytest.other_account.address,
@@ -1041,7 +1159,7 @@ def test_010_token_facet_pausable(global_var):
         updatePauser(address _newPauser) external;
 
     """
-    with reverts("Caller is not the pauser"):
+    with reverts("CallerNotPauser"):
         tx = pytest.token_facet.pause(
             {"from": pytest.account},
         )
@@ -1062,13 +1180,13 @@ def test_010_token_facet_pausable(global_var):
     time.sleep(5)
 
     """
-    All subsequent functions with whenNotPaused modifier must be reverted with `Paused` reason.
+    All subsequent functions with whenNotPaused modifier must be reverted with `TokenPaused` reason.
     (transferFrom, transfer, configureMinter, mint, burn, approve, permit,
     increaseAllowance, decreaseAllowance, transferWithAuthorization,
     receiveWithAuthorization, cancelAuthorization)
     """
 
-    with reverts("Paused"):
+    with reverts("TokenPaused"):
         pytest.token_facet.transferFrom(
             pytest.ZERO_ADDRESS,
             pytest.ZERO_ADDRESS,
@@ -1181,7 +1299,7 @@ def test_011_token_facet_blacklistable(global_var):
     is_blacklisted = pytest.token_facet.isBlacklisted(pytest.other_account.address)
     assert is_blacklisted == False
 
-    with reverts("Caller is not the blacklister"):
+    with reverts("CallerNotBlacklister"):
         pytest.token_facet.blacklist(
             pytest.other_account.address, {"from": pytest.account}
         )
@@ -1199,13 +1317,13 @@ def test_011_token_facet_blacklistable(global_var):
     time.sleep(5)
 
     """
-    All subsequent functions with notBlacklisted modifier must revert with `Account is blacklisted` reason.
+    All subsequent functions with notBlacklisted modifier must revert with `AccountBlacklisted` reason.
     (transferFrom, transfer, configureMinter, mint, burn, approve, permit,
     increaseAllowance, decreaseAllowance, transferWithAuthorization,
     receiveWithAuthorization)
     """
 
-    with reverts("Account is blacklisted"):
+    with reverts("AccountBlacklisted"):
         pytest.token_facet.transferFrom(
             pytest.other_account.address,
             pytest.ZERO_ADDRESS,
@@ -1344,7 +1462,7 @@ def test_012_token_facet_rescuable(global_var):
         function rescueERC20(IERC20 _tokenContract, address _to, uint256 _amount) external;
         updateRescuer(address _newRescuer) external;
     """
-    with reverts("Caller is not the rescuer"):
+    with reverts("CallerNotRescuer"):
         pytest.token_facet.rescueERC20(
             interface.IERC20(pytest.token_facet.address),
             pytest.account.address,
@@ -1387,3 +1505,2085 @@ def test_012_token_facet_rescuable(global_var):
 
     assert post_rescue_balance_from == expected_balance_from
     assert post_rescue_balance_to == expected_balance_to
+
+
+def test_013_hot_diamond(global_var):
+    """
+    Functions:
+        HotDiamond fallback dispatch of hot selectors
+        facetAddress(bytes4 _functionSelector) external view override returns (address facetAddress_);
+        diamondCut(FacetCut[] calldata _diamondCut, address _init, bytes calldata _calldata) external override;
+    """
+
+    token_facet = TokenFacet[-1]
+    diamond_loupe_facet = DiamondLoupeFacet[-1]
+    ownership_facet = OwnershipFacet[-1]
+
+    hot_diamond = HotDiamond.deploy(
+        pytest.account,
+        DiamondCutFacet[-1].address,
+        token_facet.address,
+        hot_selectors(),
+        {"from": pytest.account},
+    )
+
+    cut = [
+        [diamond_loupe_facet.address, 0, list(diamond_loupe_facet.selectors.keys())],
+        [ownership_facet.address, 0, list(ownership_facet.selectors.keys())],
+        [
+            token_facet.address,
+            0,
+            [
+                selector
+                for selector in token_facet.selectors.keys()
+                if selector not in hot_selectors()
+            ],
+        ],
+    ]
+    tx = interface.IDiamondCut(hot_diamond.address).diamondCut(
+        cut,
+        DiamondInit[-1].address,
+        DiamondInit[-1].init.encode_input(),
+        {"from": pytest.account},
+    )
+    tx.wait(1)
+
+    hot_loupe_facet = Contract.from_abi(
+        "DiamondLoupeFacet", hot_diamond.address, abi=DiamondLoupeFacet.abi
+    )
+    hot_token_facet = Contract.from_abi(
+        "TokenFacet", hot_diamond.address, abi=TokenFacet.abi
+    )
+
+    # Loupe should report the hot selectors as served by the token facet
+    for selector in hot_selectors():
+        assert hot_loupe_facet.facetAddress(selector) == token_facet.address
+    assert set(hot_selectors()).issubset(
+        set(str(x) for x in hot_loupe_facet.facetFunctionSelectors(token_facet))
+    )
+
+    tx = hot_token_facet.setup(
+        pytest.DEPLOYED_NAME,
+        pytest.DEPLOYED_VERSION,
+        pytest.DEPLOYED_SYMBOL,
+        pytest.DEPLOYED_DECIMALS,
+        {"from": pytest.account},
+    )
+    tx.wait(1)
+
+    for token in (hot_token_facet, pytest.token_facet):
+        if not token.isMinter(pytest.account.address):
+            tx = token.configureMinter(
+                pytest.account.address, pytest.TEST_SUPPLY, {"from": pytest.account}
+            )
+            tx.wait(1)
+        tx = token.mint(
+            pytest.account.address, pytest.TEST_AMOUNT, {"from": pytest.account}
+        )
+        tx.wait(1)
+        # warm up the recipient balance so both transfers pay the same SSTORE costs
+        tx = token.transfer(pytest.other_account.address, 1, {"from": pytest.account})
+        tx.wait(1)
+        time.sleep(5)
+
+    # Hot dispatch should skip the facet lookup in diamond storage
+    diamond_tx = pytest.token_facet.transfer(
+        pytest.other_account.address, 1, {"from": pytest.account}
+    )
+    hot_diamond_tx = hot_token_facet.transfer(
+        pytest.other_account.address, 1, {"from": pytest.account}
+    )
+    diamond_tx.wait(1)
+    hot_diamond_tx.wait(1)
+
+    assert hot_token_facet.balanceOf(pytest.other_account.address) == 2
+    assert hot_diamond_tx.gas_used < diamond_tx.gas_used
+
+    # Selectors that aren't hot should cost the same as on Diamond, plus the
+    # check of the hot selectors
+    for token in (hot_token_facet, pytest.token_facet):
+        tx = token.increaseAllowance(
+            pytest.other_account.address, 1, {"from": pytest.account}
+        )
+        tx.wait(1)
+    diamond_tx = pytest.token_facet.increaseAllowance(
+        pytest.other_account.address, 1, {"from": pytest.account}
+    )
+    non_hot_tx = hot_token_facet.increaseAllowance(
+        pytest.other_account.address, 1, {"from": pytest.account}
+    )
+    diamond_tx.wait(1)
+    non_hot_tx.wait(1)
+    time.sleep(5)
+
+    assert non_hot_tx.gas_used <= diamond_tx.gas_used + 100
+
+    # Hot selectors can't be replaced while the bytecode dispatch is on
+    new_token_facet = TokenFacet.deploy({"from": pytest.account})
+    hot_diamond_cut = interface.IDiamondCut(hot_diamond.address)
+    with reverts("CannotReplaceHotFunction"):
+        hot_diamond_cut.diamondCut(
+            [[new_token_facet.address, 1, hot_selectors()]],
+            pytest.ZERO_ADDRESS,
+            b"",
+            {"from": pytest.account},
+        )
+
+    # Once it is turned off the hot selectors can be replaced and the calls
+    # run the new facet
+    hot_dispatch_init = HotDispatchInit.deploy({"from": pytest.account})
+    tx = hot_diamond_cut.diamondCut(
+        [],
+        hot_dispatch_init.address,
+        hot_dispatch_init.disable.encode_input(),
+        {"from": pytest.account},
+    )
+    tx.wait(1)
+    tx = hot_diamond_cut.diamondCut(
+        [[new_token_facet.address, 1, hot_selectors()]],
+        pytest.ZERO_ADDRESS,
+        b"",
+        {"from": pytest.account},
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert StorageReader(web3, hot_diamond.address).token_state()["hotDispatchDisabled"]
+    for selector in hot_selectors():
+        assert hot_loupe_facet.facetAddress(selector) == new_token_facet.address
+    storage_tx = hot_token_facet.transfer(
+        pytest.other_account.address, 1, {"from": pytest.account}
+    )
+    storage_tx.wait(1)
+    time.sleep(5)
+    assert storage_tx.gas_used > hot_diamond_tx.gas_used
+    assert hot_token_facet.balanceOf(pytest.other_account.address) == 3
+
+    # It can only be turned on again once the hot facet serves the hot selectors
+    with reverts("HotSelectorNotOnHotFacet"):
+        hot_diamond_cut.diamondCut(
+            [],
+            hot_dispatch_init.address,
+            hot_dispatch_init.enable.encode_input(hot_selectors()),
+            {"from": pytest.account},
+        )
+    tx = hot_diamond_cut.diamondCut(
+        [[token_facet.address, 1, hot_selectors()]],
+        hot_dispatch_init.address,
+        hot_dispatch_init.enable.encode_input(hot_selectors()),
+        {"from": pytest.account},
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert not StorageReader(web3, hot_diamond.address).token_state()[
+        "hotDispatchDisabled"
+    ]
+    tx = hot_token_facet.transfer(
+        pytest.other_account.address, 1, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+    assert tx.gas_used < storage_tx.gas_used
+    assert hot_token_facet.balanceOf(pytest.other_account.address) == 4
+
+    tx = pytest.token_facet.removeMinter(
+        pytest.account.address, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+
+def test_014_diamond_loupe_facet_index(global_var):
+    """
+    Functions:
+        facets() external view override returns (Facet[] memory facets_);
+        facetsPaginated(uint256 _offset, uint256 _limit) external view returns (Facet[] memory facets_);
+        facetFunctionSelectorsPaginated(address _facet, uint256 _offset, uint256 _limit);
+        facetAddressesPaginated(uint256 _offset, uint256 _limit);
+    """
+
+    diamond_loupe_facet = Contract.from_abi(
+        "DiamondLoupeFacet", pytest.diamond.address, abi=DiamondLoupeFacet.abi
+    )
+    diamond_cut = interface.IDiamondCut(pytest.diamond.address)
+
+    facets = diamond_loupe_facet.facets()
+    facet_addresses = diamond_loupe_facet.facetAddresses()
+
+    assert [facet[0] for facet in facets] == list(facet_addresses)
+    for facet_address, selectors in facets:
+        assert list(selectors) == list(
+            diamond_loupe_facet.facetFunctionSelectors(facet_address)
+        )
+        for selector in selectors:
+            assert diamond_loupe_facet.facetAddress(selector) == facet_address
+
+    # Paginated variants return slices of the full results
+    assert list(diamond_loupe_facet.facetsPaginated(1, 2)) == list(facets[1:3])
+    assert list(diamond_loupe_facet.facetAddressesPaginated(2, 100)) == list(
+        facet_addresses[2:]
+    )
+    assert len(diamond_loupe_facet.facetAddressesPaginated(100, 1)) == 0
+
+    token_selectors = facets[3][1]
+    assert list(
+        diamond_loupe_facet.facetFunctionSelectorsPaginated(facet_addresses[3], 2, 5)
+    ) == list(token_selectors[2:7])
+
+    # The index follows replaced selectors
+    ownership_facet = OwnershipFacet.deploy({"from": pytest.account})
+    owner_selector = ownership_facet.signatures["owner"]
+
+    tx = diamond_cut.diamondCut(
+        [[ownership_facet.address, 1, [owner_selector]]],
+        pytest.ZERO_ADDRESS,
+        b"",
+        {"from": pytest.account},
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert ownership_facet.address in diamond_loupe_facet.facetAddresses()
+    assert list(diamond_loupe_facet.facetFunctionSelectors(ownership_facet)) == [
+        owner_selector
+    ]
+    assert owner_selector not in [
+        str(x) for x in diamond_loupe_facet.facetFunctionSelectors(facet_addresses[2])
+    ]
+
+    tx = diamond_cut.diamondCut(
+        [[facet_addresses[2], 1, [owner_selector]]],
+        pytest.ZERO_ADDRESS,
+        b"",
+        {"from": pytest.account},
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert ownership_facet.address not in diamond_loupe_facet.facetAddresses()
+    assert len(diamond_loupe_facet.facetFunctionSelectors(ownership_facet)) == 0
+    assert set(diamond_loupe_facet.facetFunctionSelectors(facet_addresses[2])) == set(
+        facets[2][1]
+    )
+
+
+def test_015_snapshot_facet(global_var):
+    """
+    Functions:
+        snapshot() external returns (uint256 snapshotId_);
+        currentSnapshotId() external view returns (uint256 snapshotId_);
+        balanceOfAt(address _account, uint256 _snapshotId);
+        totalSupplyAt(uint256 _snapshotId);
+    """
+
+    diamond_loupe_facet = Contract.from_abi(
+        "DiamondLoupeFacet", pytest.diamond.address, abi=DiamondLoupeFacet.abi
+    )
+    snapshot_facet = Contract.from_abi(
+        "SnapshotFacet", pytest.diamond.address, abi=SnapshotFacet.abi
+    )
+
+    if diamond_loupe_facet.facetAddress(SnapshotFacet.signatures["snapshot"]) == (
+        pytest.ZERO_ADDRESS
+    ):
+        add_facet(pytest.diamond.address, SnapshotFacet, pytest.account)
+
+    with reverts("NotContractOwner"):
+        snapshot_facet.snapshot({"from": pytest.other_account})
+
+    with reverts("SnapshotIdZero"):
+        snapshot_facet.balanceOfAt(pytest.account.address, 0)
+
+    tx = snapshot_facet.snapshot({"from": pytest.account})
+    tx.wait(1)
+    time.sleep(5)
+
+    snapshot_id = snapshot_facet.currentSnapshotId()
+    assert tx.events["Snapshot"]["id"] == snapshot_id
+
+    with reverts("NonexistentSnapshot"):
+        snapshot_facet.totalSupplyAt(snapshot_id + 1)
+
+    pre_transfer_balance_from = pytest.token_facet.balanceOf(pytest.account.address)
+    pre_transfer_balance_to = pytest.token_facet.balanceOf(pytest.other_account.address)
+    total_supply = pytest.token_facet.totalSupply()
+
+    # Values that have not changed since the snapshot are the current values
+    assert (
+        snapshot_facet.balanceOfAt(pytest.account.address, snapshot_id)
+        == pre_transfer_balance_from
+    )
+    assert snapshot_facet.totalSupplyAt(snapshot_id) == total_supply
+
+    for _ in range(2):
+        tx = pytest.token_facet.transfer(
+            pytest.other_account.address, 1, {"from": pytest.account}
+        )
+        tx.wait(1)
+        time.sleep(5)
+
+    tx = snapshot_facet.snapshot({"from": pytest.account})
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.transfer(
+        pytest.other_account.address, 1, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert (
+        snapshot_facet.balanceOfAt(pytest.account.address, snapshot_id)
+        == pre_transfer_balance_from
+    )
+    assert (
+        snapshot_facet.balanceOfAt(pytest.other_account.address, snapshot_id)
+        == pre_transfer_balance_to
+    )
+    assert (
+        snapshot_facet.balanceOfAt(pytest.account.address, snapshot_id + 1)
+        == pre_transfer_balance_from - 2
+    )
+    assert (
+        snapshot_facet.balanceOfAt(pytest.other_account.address, snapshot_id + 1)
+        == pre_transfer_balance_to + 2
+    )
+    assert pytest.token_facet.balanceOf(pytest.account.address) == (
+        pre_transfer_balance_from - 3
+    )
+    assert snapshot_facet.totalSupplyAt(snapshot_id) == total_supply
+
+
+def test_016_merkle_distribution_facet(global_var, tmp_path):
+    """
+    Functions:
+        createDistribution(bytes32 _merkleRoot, address _minter, uint256 _amount);
+        closeDistribution(uint256 _distributionId) external;
+        claim(uint256 _distributionId, uint256 _index, address _account,
+            uint256 _amount, bytes32[] calldata _merkleProof) external;
+        isClaimed(uint256 _distributionId, uint256 _index);
+        distributions(uint256 _distributionId);
+    """
+
+    diamond_loupe_facet = Contract.from_abi(
+        "DiamondLoupeFacet", pytest.diamond.address, abi=DiamondLoupeFacet.abi
+    )
+    merkle_distribution_facet = Contract.from_abi(
+        "MerkleDistributionFacet",
+        pytest.diamond.address,
+        abi=MerkleDistributionFacet.abi,
+    )
+
+    if diamond_loupe_facet.facetAddress(
+        MerkleDistributionFacet.signatures["claim"]
+    ) == (pytest.ZERO_ADDRESS):
+        add_facet(pytest.diamond.address, MerkleDistributionFacet, pytest.account)
+
+    claims = [
+        (0, pytest.account.address, 100),
+        (1, pytest.other_account.address, 200),
+        (2, pytest.other_account.address, 300),
+    ]
+    merkle_root, count, total = build_tree(claims, str(tmp_path), processes=1)
+    assert count == 3 and total == 600
+    with MerkleTree(str(tmp_path)) as tree:
+        proofs = [[to_32byte_hex(node) for node in tree.proof(i)] for i in range(3)]
+
+    with reverts("NotMinter"):
+        merkle_distribution_facet.createDistribution(
+            merkle_root, pytest.account.address, total, {"from": pytest.account}
+        )
+
+    tx = pytest.token_facet.configureMinter(
+        pytest.account.address, total, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    with reverts("NotContractOwner"):
+        merkle_distribution_facet.createDistribution(
+            merkle_root, pytest.account.address, total, {"from": pytest.other_account}
+        )
+
+    with reverts("MintAmountExceedsMinterAllowance"):
+        merkle_distribution_facet.createDistribution(
+            merkle_root, pytest.account.address, total + 1, {"from": pytest.account}
+        )
+
+    tx = merkle_distribution_facet.createDistribution(
+        merkle_root, pytest.account.address, total, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    distribution_id = tx.events["DistributionCreated"]["distributionId"]
+    assert merkle_distribution_facet.distributionCount() == distribution_id
+    assert pytest.token_facet.minterAllowance(pytest.account.address) == 0
+
+    with reverts("DistributionNotFound"):
+        merkle_distribution_facet.isClaimed(distribution_id + 1, 0)
+
+    # The proof of another leaf or another amount doesn't verify
+    with reverts("InvalidMerkleProof"):
+        merkle_distribution_facet.claim(
+            distribution_id,
+            1,
+            pytest.other_account.address,
+            200,
+            proofs[0],
+            {"from": pytest.other_account},
+        )
+    with reverts("InvalidMerkleProof"):
+        merkle_distribution_facet.claim(
+            distribution_id,
+            1,
+            pytest.other_account.address,
+            201,
+            proofs[1],
+            {"from": pytest.other_account},
+        )
+
+    pre_claim_balance = pytest.token_facet.balanceOf(pytest.other_account.address)
+    total_supply = pytest.token_facet.totalSupply()
+
+    # Anyone can submit a claim, the tokens go to the account of the leaf
+    tx = merkle_distribution_facet.claim(
+        distribution_id,
+        1,
+        pytest.other_account.address,
+        200,
+        proofs[1],
+        {"from": pytest.account},
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert tx.events["Mint"]["minter"] == pytest.account.address
+    assert tx.events["Claimed"]["account"] == pytest.other_account.address
+    assert merkle_distribution_facet.isClaimed(distribution_id, 1)
+    assert not merkle_distribution_facet.isClaimed(distribution_id, 2)
+    assert (
+        pytest.token_facet.balanceOf(pytest.other_account.address)
+        == pre_claim_balance + 200
+    )
+    assert pytest.token_facet.totalSupply() == total_supply + 200
+
+    with reverts("AlreadyClaimed"):
+        merkle_distribution_facet.claim(
+            distribution_id,
+            1,
+            pytest.other_account.address,
+            200,
+            proofs[1],
+            {"from": pytest.account},
+        )
+
+    tx = pytest.token_facet.blacklist(
+        pytest.other_account.address, {"from": pytest.other_account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    with reverts("AccountBlacklisted"):
+        merkle_distribution_facet.claim(
+            distribution_id,
+            2,
+            pytest.other_account.address,
+            300,
+            proofs[2],
+            {"from": pytest.account},
+        )
+
+    tx = pytest.token_facet.unBlacklist(
+        pytest.other_account.address, {"from": pytest.other_account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.pause({"from": pytest.other_account})
+    tx.wait(1)
+    time.sleep(5)
+
+    with reverts("TokenPaused"):
+        merkle_distribution_facet.claim(
+            distribution_id,
+            0,
+            pytest.account.address,
+            100,
+            proofs[0],
+            {"from": pytest.account},
+        )
+
+    tx = pytest.token_facet.unpause({"from": pytest.other_account})
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = merkle_distribution_facet.claim(
+        distribution_id,
+        0,
+        pytest.account.address,
+        100,
+        proofs[0],
+        {"from": pytest.account},
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    # Closing returns the unclaimed tokens to the minter allowance
+    tx = merkle_distribution_facet.closeDistribution(
+        distribution_id, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert tx.events["DistributionClosed"]["remaining"] == 300
+    assert merkle_distribution_facet.distributions(distribution_id)[2] == 0
+    assert pytest.token_facet.minterAllowance(pytest.account.address) == 300
+
+    with reverts("InvalidMerkleProof"):
+        merkle_distribution_facet.claim(
+            distribution_id,
+            2,
+            pytest.other_account.address,
+            300,
+            proofs[2],
+            {"from": pytest.account},
+        )
+
+    tx = pytest.token_facet.removeMinter(
+        pytest.account.address, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+
+def test_017_batch_view_facet(global_var):
+    """
+    Functions:
+        balancesOf(address[] calldata _accounts);
+        accountStates(address[] calldata _accounts);
+        allowances(address[] calldata _owners, address[] calldata _spenders);
+    """
+
+    diamond_loupe_facet = Contract.from_abi(
+        "DiamondLoupeFacet", pytest.diamond.address, abi=DiamondLoupeFacet.abi
+    )
+    batch_view_facet = Contract.from_abi(
+        "BatchViewFacet", pytest.diamond.address, abi=BatchViewFacet.abi
+    )
+
+    if diamond_loupe_facet.facetAddress(BatchViewFacet.signatures["balancesOf"]) == (
+        pytest.ZERO_ADDRESS
+    ):
+        add_facet(pytest.diamond.address, BatchViewFacet, pytest.account)
+
+    accounts = [
+        pytest.account.address,
+        pytest.other_account.address,
+        pytest.ZERO_ADDRESS,
+    ]
+
+    assert batch_view_facet.balancesOf([]) == []
+    assert batch_view_facet.balancesOf(accounts) == [
+        pytest.token_facet.balanceOf(account) for account in accounts
+    ]
+
+    for account, state in zip(accounts, batch_view_facet.accountStates(accounts)):
+        assert state == (
+            pytest.token_facet.balanceOf(account),
+            pytest.token_facet.isBlacklisted(account),
+            pytest.token_facet.isMinter(account),
+            pytest.token_facet.minterAllowance(account),
+            pytest.token_facet.nonces(account),
+        )
+
+    owners = [pytest.account.address, pytest.other_account.address]
+    spenders = [pytest.other_account.address, pytest.account.address]
+    assert batch_view_facet.allowances(owners, spenders) == [
+        pytest.token_facet.allowance(owner, spender)
+        for owner, spender in zip(owners, spenders)
+    ]
+
+    with reverts("ArrayLengthMismatch"):
+        batch_view_facet.allowances(owners, spenders[:1])
+
+
+def test_018_diamond_factory(global_var):
+    """
+    Functions:
+        deployDiamond(address _contractOwner, address _diamondCutFacet,
+            IDiamondCut.FacetCut[] calldata _diamondCut, address _init,
+            bytes calldata _calldata, TokenSetup calldata _tokenSetup);
+    """
+
+    diamond_factory = DiamondFactory.deploy({"from": pytest.account})
+    diamond_init = DiamondInit[-1]
+    diamond_loupe_facet = DiamondLoupeFacet[-1]
+    ownership_facet = OwnershipFacet[-1]
+    token_facet = TokenFacet[-1]
+
+    cut = [
+        [diamond_loupe_facet.address, 0, list(diamond_loupe_facet.selectors.keys())],
+        [ownership_facet.address, 0, list(ownership_facet.selectors.keys())],
+        [token_facet.address, 0, list(token_facet.selectors.keys())],
+    ]
+    token_setup = [
+        pytest.DEPLOYED_NAME,
+        pytest.DEPLOYED_VERSION,
+        pytest.DEPLOYED_SYMBOL,
+        pytest.DEPLOYED_DECIMALS,
+    ]
+
+    # The cut, the init and the token setup are in one transaction
+    tx = diamond_factory.deployDiamond(
+        pytest.other_account.address,
+        DiamondCutFacet[-1].address,
+        cut,
+        diamond_init.address,
+        diamond_init.init.encode_input(),
+        token_setup,
+        {"from": pytest.account},
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    diamond_address = tx.events["DiamondDeployed"]["diamond"]
+    assert tx.events["DiamondDeployed"]["owner"] == pytest.other_account.address
+
+    diamond_loupe_facet = Contract.from_abi(
+        "DiamondLoupeFacet", diamond_address, abi=DiamondLoupeFacet.abi
+    )
+    ownership_facet = Contract.from_abi(
+        "OwnershipFacet", diamond_address, abi=OwnershipFacet.abi
+    )
+    token_facet = Contract.from_abi("TokenFacet", diamond_address, abi=TokenFacet.abi)
+
+    assert ownership_facet.owner() == pytest.other_account.address
+    assert len(diamond_loupe_facet.facetAddresses()) == 4
+    # IERC20 interface id, set by DiamondInit
+    assert diamond_loupe_facet.supportsInterface("0x36372b07")
+    assert token_facet.name() == pytest.DEPLOYED_NAME
+    assert token_facet.symbol() == pytest.DEPLOYED_SYMBOL
+    assert token_facet.decimals() == pytest.DEPLOYED_DECIMALS
+
+    with reverts("AlreadyInitialized"):
+        token_facet.setup(
+            *token_setup,
+            {"from": pytest.other_account},
+        )
+
+    # The cut is reverted if the token can't be set up
+    with reverts():
+        diamond_factory.deployDiamond(
+            pytest.other_account.address,
+            DiamondCutFacet[-1].address,
+            cut[:2],
+            diamond_init.address,
+            diamond_init.init.encode_input(),
+            token_setup,
+            {"from": pytest.account},
+        )
+
+
+def test_019_preflight(global_var):
+    """
+    Functions:
+        paused() external view returns (bool paused_);
+    """
+
+    assert not pytest.token_facet.paused()
+
+    balance = pytest.token_facet.balanceOf(pytest.account.address)
+    allowance = pytest.token_facet.allowance(
+        pytest.account.address, pytest.other_account.address
+    )
+    transactions = [
+        PendingTransaction(
+            pytest.account, "transfer", (pytest.other_account.address, balance)
+        ),
+        PendingTransaction(
+            pytest.account, "transfer", (pytest.other_account.address, 1)
+        ),
+        PendingTransaction(
+            pytest.other_account,
+            "transferFrom",
+            (pytest.account.address, pytest.other_account.address, allowance + 1),
+        ),
+        PendingTransaction(
+            pytest.account,
+            "permit",
+            (
+                pytest.account.address,
+                pytest.other_account.address,
+                1,
+                0,
+                27,
+                to_32byte_hex(0),
+                to_32byte_hex(0),
+            ),
+        ),
+        PendingTransaction(pytest.account, "mint", (pytest.account.address, 1)),
+    ]
+
+    preflight = Preflight(pytest.token_facet, web3)
+    assert preflight.is_stale()
+    preflight.refresh()
+    errors = [
+        error if error is None else error.name
+        for error in preflight.check(transactions)
+    ]
+    # The first transfer spends the whole balance
+    assert errors == [
+        None,
+        "TransferAmountExceedsBalance",
+        "TransferAmountExceedsAllowance",
+        "PermitExpired",
+        "CallerNotMinter",
+    ]
+
+    # Each transaction is simulated on its own with eth_call when the state is stale
+    preflight = Preflight(pytest.token_facet, web3, max_age=-1)
+    preflight.refresh()
+    errors = [
+        error if error is None else error.name
+        for error in preflight.check(transactions[1:])
+    ]
+    assert errors == [
+        None,
+        "TransferAmountExceedsAllowance",
+        "PermitExpired",
+        "CallerNotMinter",
+    ]
+
+    tx = pytest.token_facet.pause({"from": pytest.other_account})
+    tx.wait(1)
+    time.sleep(5)
+
+    preflight.max_age = 2
+    preflight.refresh()
+    assert preflight.check(transactions[1:2])[0].name == "TokenPaused"
+
+    tx = pytest.token_facet.unpause({"from": pytest.other_account})
+    tx.wait(1)
+    time.sleep(5)
+
+
+def test_020_read_cache(global_var):
+    cache = TokenReadCache(pytest.token_facet, web3)
+
+    balance = pytest.token_facet.balanceOf(pytest.account.address)
+    other_balance = pytest.token_facet.balanceOf(pytest.other_account.address)
+    assert cache.balance_of(pytest.account.address) == balance
+    assert cache.balance_of(pytest.account.address) == balance
+    assert cache.balance_of(pytest.other_account.address) == other_balance
+    assert not cache.paused()
+    assert (cache.hits, cache.misses) == (1, 3)
+
+    tx = pytest.token_facet.transfer(
+        pytest.other_account.address, 1, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    # Reads are served at the synced block until the next sync
+    assert cache.balance_of(pytest.account.address) == balance
+    assert cache.sync() >= tx.block_number
+
+    # The transfer evicts both balances, the paused entry is kept
+    assert cache.balance_of(pytest.account.address) == balance - 1
+    assert cache.balance_of(pytest.other_account.address) == other_balance + 1
+    assert not cache.paused()
+    assert (cache.hits, cache.misses) == (3, 5)
+
+    cache.apply_log({"topics": [DIAMOND_CUT]})
+    assert len(cache.entries) == 0
+
+    cache = TokenReadCache(pytest.token_facet, web3, max_size=1)
+    cache.balance_of(pytest.account.address)
+    cache.balance_of(pytest.other_account.address)
+    assert list(cache.entries) == [("balanceOf", pytest.other_account.address)]
+
+    # An allowance evicted by the LRU leaves the spenders index too
+    cache.allowance(pytest.account.address, pytest.other_account.address)
+    assert pytest.other_account.address in cache.spenders[pytest.account.address]
+    cache.balance_of(pytest.account.address)
+    assert len(cache.spenders) == 0
+
+    # transferFrom spends the allowance without an Approval event
+    if not pytest.token_facet.isMinter(pytest.account.address):
+        tx = pytest.token_facet.configureMinter(
+            pytest.account.address, pytest.TEST_SUPPLY, {"from": pytest.account}
+        )
+        tx.wait(1)
+    tx = pytest.token_facet.mint(
+        pytest.account.address, pytest.TEST_AMOUNT, {"from": pytest.account}
+    )
+    tx.wait(1)
+    tx = pytest.token_facet.approve(
+        pytest.other_account.address, 2, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    cache = TokenReadCache(pytest.token_facet, web3)
+    assert cache.allowance(pytest.account.address, pytest.other_account.address) == 2
+
+    tx = pytest.token_facet.transferFrom(
+        pytest.account.address,
+        pytest.other_account.address,
+        1,
+        {"from": pytest.other_account},
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert cache.sync() >= tx.block_number
+    assert cache.allowance(pytest.account.address, pytest.other_account.address) == 1
+
+    tx = pytest.token_facet.approve(
+        pytest.other_account.address, 0, {"from": pytest.account}
+    )
+    tx.wait(1)
+    tx = pytest.token_facet.removeMinter(
+        pytest.account.address, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+
+def test_021_packed_calldata_facet(global_var_and_domain_separator):
+    """
+    Functions:
+        transferPacked() external returns (bool);
+        transferFromPacked() external returns (bool);
+        transferWithAuthorizationPacked() external;
+        receiveWithAuthorizationPacked() external;
+    """
+
+    diamond_loupe_facet = Contract.from_abi(
+        "DiamondLoupeFacet", pytest.diamond.address, abi=DiamondLoupeFacet.abi
+    )
+
+    if diamond_loupe_facet.facetAddress(
+        PackedCalldataFacet.signatures["transferPacked"]
+    ) == (pytest.ZERO_ADDRESS):
+        add_facet(pytest.diamond.address, PackedCalldataFacet, pytest.account)
+
+    tx = pytest.token_facet.configureMinter(
+        pytest.account.address, pytest.TEST_SUPPLY, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.mint(
+        pytest.account.address, pytest.TEST_SUPPLY, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    pre_transfer_balance_from = pytest.token_facet.balanceOf(pytest.account.address)
+    pre_transfer_balance_to = pytest.token_facet.balanceOf(pytest.other_account.address)
+
+    # 36 bytes instead of 68
+    data = encode_transfer(pytest.other_account.address, pytest.TEST_AMOUNT)
+    assert len(data) == 2 + 2 * 36
+
+    with reverts("InvalidPackedCalldataLength"):
+        pytest.account.transfer(pytest.diamond.address, data=data + "00")
+
+    tx = pytest.account.transfer(pytest.diamond.address, data=data)
+    tx.wait(1)
+    time.sleep(5)
+
+    assert tx.events["Transfer"]["value"] == pytest.TEST_AMOUNT
+    assert pytest.token_facet.balanceOf(pytest.account.address) == (
+        pre_transfer_balance_from - pytest.TEST_AMOUNT
+    )
+    assert pytest.token_facet.balanceOf(pytest.other_account.address) == (
+        pre_transfer_balance_to + pytest.TEST_AMOUNT
+    )
+
+    # Values are packed in 96 bits
+    with pytest.raises(ValueError):
+        encode_transfer(pytest.other_account.address, 2**96)
+
+    tx = pytest.token_facet.approve(
+        pytest.other_account.address, pytest.TEST_AMOUNT, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    data = encode_transfer_from(
+        pytest.account.address, pytest.other_account.address, pytest.TEST_AMOUNT + 1
+    )
+    with reverts("TransferAmountExceedsAllowance"):
+        pytest.other_account.transfer(pytest.diamond.address, data=data)
+
+    data = encode_transfer_from(
+        pytest.account.address, pytest.other_account.address, pytest.TEST_AMOUNT
+    )
+    tx = pytest.other_account.transfer(pytest.diamond.address, data=data)
+    tx.wait(1)
+    time.sleep(5)
+
+    assert (
+        pytest.token_facet.allowance(
+            pytest.account.address, pytest.other_account.address
+        )
+        == 0
+    )
+    assert pytest.token_facet.balanceOf(pytest.account.address) == (
+        pre_transfer_balance_from - 2 * pytest.TEST_AMOUNT
+    )
+
+    for typehash, encode in (
+        (
+            pytest.TRANSFER_WITH_AUTHORIZATION_TYPEHASH,
+            encode_transfer_with_authorization,
+        ),
+        (pytest.RECEIVE_WITH_AUTHORIZATION_TYPEHASH, encode_receive_with_authorization),
+    ):
+        nonce = to_32byte_hex(int(time.time() * 1000))
+        valid_after = int(time.time()) - 600
+        valid_before = int(time.time()) + 600
+
+        digest = w3.keccak(
+            hexstr=(
+                pytest.MAGIC_BYTES
+                + w3.toBytes(hexstr=pytest.DOMAIN_SEPARATOR)
+                + w3.keccak(
+                    hexstr=eth_abi.abi.encode_abi(
+                        [
+                            "bytes32",
+                            "address",
+                            "address",
+                            "uint256",
+                            "uint256",
+                            "uint256",
+                            "bytes32",
+                        ],
+                        [
+                            w3.toBytes(hexstr=typehash),
+                            pytest.account.address,
+                            pytest.other_account.address,
+                            pytest.TEST_AMOUNT,
+                            valid_after,
+                            valid_before,
+                            w3.toBytes(hexstr=nonce),
+                        ],
+                    ).hex()
+                )
+            ).hex()
+        ).hex()
+
+        signed_message_r, signed_message_s, signed_message_v = sign_digest(
+            digest, pytest.ACCOUNT_PRIVATE_KEY
+        )
+
+        data = encode(
+            pytest.account.address,
+            pytest.other_account.address,
+            pytest.TEST_AMOUNT,
+            valid_after,
+            valid_before,
+            nonce,
+            signed_message_v,
+            signed_message_r,
+            signed_message_s,
+        )
+        # 163 bytes instead of 292
+        assert len(data) == 2 + 2 * 163
+
+        tx = pytest.other_account.transfer(pytest.diamond.address, data=data)
+        tx.wait(1)
+        time.sleep(5)
+
+        assert tx.events["AuthorizationUsed"]["authorizer"] == pytest.account.address
+        assert pytest.token_facet.authorizationState(pytest.account.address, nonce)
+
+        with reverts("AuthorizationUsedOrCanceled"):
+            pytest.other_account.transfer(pytest.diamond.address, data=data)
+
+    assert pytest.token_facet.balanceOf(pytest.account.address) == (
+        pre_transfer_balance_from - 4 * pytest.TEST_AMOUNT
+    )
+
+    tx = pytest.token_facet.removeMinter(
+        pytest.account.address, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+
+def test_022_token_facet_transfer_and_call(global_var):
+    """
+    Functions:
+        transferAndCall(address _to, uint256 _value, bytes calldata _data);
+        transferFromAndCall(address _from, address _to, uint256 _value,
+            bytes calldata _data);
+        approveAndCall(address _spender, uint256 _value, bytes calldata _data);
+    """
+
+    receiver = ERC1363ReceiverMock.deploy({"from": pytest.account})
+
+    tx = pytest.token_facet.configureMinter(
+        pytest.account.address, pytest.TEST_SUPPLY, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.mint(
+        pytest.account.address, pytest.TEST_SUPPLY, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    with reverts("ReceiverNotContract"):
+        pytest.token_facet.transferAndCall(
+            pytest.other_account.address,
+            pytest.TEST_AMOUNT,
+            b"",
+            {"from": pytest.account},
+        )
+
+    # The payee is called after the transfer in the same transaction
+    tx = pytest.token_facet.transferAndCall(
+        receiver.address, pytest.TEST_AMOUNT, b"order", {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert tx.events["Transfer"]["to"] == receiver.address
+    assert tx.events["Received"]["operator"] == pytest.account.address
+    assert tx.events["Received"]["from"] == pytest.account.address
+    assert tx.events["Received"]["value"] == pytest.TEST_AMOUNT
+    assert tx.events["Received"]["data"] == "0x" + b"order".hex()
+    assert tx.events["Received"]["balance"] == pytest.TEST_AMOUNT
+    assert pytest.token_facet.balanceOf(receiver.address) == pytest.TEST_AMOUNT
+
+    tx = pytest.token_facet.approve(
+        pytest.other_account.address, pytest.TEST_AMOUNT, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.transferFromAndCall(
+        pytest.account.address,
+        receiver.address,
+        pytest.TEST_AMOUNT,
+        b"",
+        {"from": pytest.other_account},
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert tx.events["Received"]["operator"] == pytest.other_account.address
+    assert tx.events["Received"]["from"] == pytest.account.address
+    assert pytest.token_facet.balanceOf(receiver.address) == 2 * pytest.TEST_AMOUNT
+
+    tx = pytest.token_facet.approveAndCall(
+        receiver.address, pytest.TEST_AMOUNT, b"", {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert tx.events["Approved"]["owner"] == pytest.account.address
+    assert (
+        pytest.token_facet.allowance(pytest.account.address, receiver.address)
+        == pytest.TEST_AMOUNT
+    )
+
+    tx = receiver.setAccept(False, {"from": pytest.account})
+    tx.wait(1)
+    time.sleep(5)
+
+    with reverts("TransferRejected"):
+        pytest.token_facet.transferAndCall(
+            receiver.address, pytest.TEST_AMOUNT, b"", {"from": pytest.account}
+        )
+
+    with reverts("ApprovalRejected"):
+        pytest.token_facet.approveAndCall(
+            receiver.address, 0, b"", {"from": pytest.account}
+        )
+
+    tx = pytest.token_facet.pause({"from": pytest.other_account})
+    tx.wait(1)
+    time.sleep(5)
+
+    with reverts("TokenPaused"):
+        pytest.token_facet.transferAndCall(
+            receiver.address, pytest.TEST_AMOUNT, b"", {"from": pytest.account}
+        )
+
+    tx = pytest.token_facet.unpause({"from": pytest.other_account})
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.removeMinter(
+        pytest.account.address, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+
+def test_023_token_facet_permit_nonce_lanes(global_var_and_domain_separator):
+    """
+    Functions:
+        permitWithKey(
+            address _owner,
+            address _spender,
+            uint256 _value,
+            uint192 _key,
+            uint256 _deadline,
+            uint8 _v,
+            bytes32 _r,
+            bytes32 _s
+        ) external;
+        nonces(address _owner, uint192 _key) external view returns (uint256);
+    """
+
+    owner = pytest.account.address
+    spender = pytest.other_account.address
+    deadline = sys.maxsize
+
+    assert pytest.token_facet.nonces(owner, 0) == pytest.token_facet.nonces(owner)
+
+    # both permits are signed before either is submitted
+    permits = {}
+    for key, value in ((1, pytest.TEST_AMOUNT), (2, 2 * pytest.TEST_AMOUNT)):
+        nonce = pytest.token_facet.nonces(owner, key)
+        assert nonce == key << 64
+        permits[key] = (
+            value,
+            sign_digest(
+                permit_digest(owner, spender, value, nonce, deadline),
+                pytest.ACCOUNT_PRIVATE_KEY,
+            ),
+        )
+
+    for key in (2, 1):
+        value, (r, s, v) = permits[key]
+        tx = pytest.token_facet.permitWithKey(
+            owner, spender, value, key, deadline, v, r, s, {"from": spender}
+        )
+        tx.wait(1)
+        time.sleep(5)
+
+        assert pytest.token_facet.allowance(owner, spender) == value
+        assert pytest.token_facet.nonces(owner, key) == (key << 64) + 1
+
+    value, (r, s, v) = permits[1]
+    with reverts("InvalidSigner"):
+        pytest.token_facet.permitWithKey(
+            owner, spender, value, 1, deadline, v, r, s, {"from": spender}
+        )
+
+    # lane 0 is the nonce of permit
+    pre_permit_nonce = pytest.token_facet.nonces(owner)
+    r, s, v = sign_digest(
+        permit_digest(owner, spender, 0, pre_permit_nonce, deadline),
+        pytest.ACCOUNT_PRIVATE_KEY,
+    )
+    tx = pytest.token_facet.permitWithKey(
+        owner, spender, 0, 0, deadline, v, r, s, {"from": spender}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert pytest.token_facet.nonces(owner) == pre_permit_nonce + 1
+    assert pytest.token_facet.nonces(owner, 0) == pre_permit_nonce + 1
+    assert pytest.token_facet.allowance(owner, spender) == 0
+
+
+def test_024_metrics(global_var, tmp_path):
+    path = tmp_path / "metrics.jsonl"
+    metrics = Metrics(str(path))
+
+    tx = metrics.measure(
+        "approve",
+        pytest.token_facet.approve,
+        pytest.other_account.address,
+        pytest.TEST_AMOUNT,
+        {"from": pytest.account},
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    facet = metrics.measure(
+        "deploy SnapshotFacet", SnapshotFacet.deploy, {"from": pytest.account}
+    )
+
+    approve, deployment = read_records(path)
+    assert approve["name"] == "approve"
+    assert approve["txid"] == tx.txid
+    assert approve["block_number"] == tx.block_number
+    assert approve["gas_used"] == tx.gas_used
+    assert approve["gas_price"] == tx.gas_price
+    assert approve["status"] == 1
+    assert approve["confirmation_seconds"] > 0
+    assert approve["rpc_calls"] > 0
+    assert deployment["txid"] == facet.tx.txid
+
+    # Reverted transactions are recorded too
+    with reverts("NotContractOwner"):
+        metrics.measure(
+            "diamondCut",
+            interface.IDiamondCut(pytest.diamond.address).diamondCut,
+            [],
+            pytest.ZERO_ADDRESS,
+            b"",
+            {"from": pytest.other_account, "gas_limit": 200000},
+        )
+    failure = list(read_records(path))[-1]
+    assert failure["name"] == "diamondCut"
+    assert failure["status"] == 0
+
+    text = metrics.prometheus()
+    assert 'bf_token_transactions_total{name="approve",status="1"} 1' in text
+    assert 'bf_token_transactions_total{name="diamondCut",status="0"} 1' in text
+    assert (
+        f'bf_token_transaction_gas_used_total{{name="approve",status="1"}} '
+        f"{tx.gas_used}"
+    ) in text
+    assert 'bf_token_rpc_requests_total{method="eth_sendRawTransaction"}' in text
+
+
+def test_025_diamond_factory_create2(global_var):
+    """
+    Functions:
+        deployDiamondWithSalt(address _contractOwner, address _diamondCutFacet,
+            IDiamondCut.FacetCut[] calldata _diamondCut, address _init,
+            bytes calldata _calldata, TokenSetup calldata _tokenSetup,
+            bytes32 _salt);
+        computeDiamondAddress(address _diamondCutFacet, bytes32 _salt);
+    """
+
+    diamond_factory = DiamondFactory[-1]
+    diamond_cut_facet = DiamondCutFacet[-1]
+    diamond_init = DiamondInit[-1]
+    ownership_facet = OwnershipFacet[-1]
+    token_facet = TokenFacet[-1]
+
+    cut = [
+        [ownership_facet.address, 0, list(ownership_facet.selectors.keys())],
+        [token_facet.address, 0, list(token_facet.selectors.keys())],
+    ]
+    args = [
+        pytest.other_account.address,
+        diamond_cut_facet.address,
+        cut,
+        diamond_init.address,
+        diamond_init.init.encode_input(),
+        [
+            pytest.DEPLOYED_NAME,
+            pytest.DEPLOYED_VERSION,
+            pytest.DEPLOYED_SYMBOL,
+            pytest.DEPLOYED_DECIMALS,
+        ],
+    ]
+
+    salt, address, hashed = mine(
+        diamond_factory.address,
+        pytest.account.address,
+        init_code_hash(
+            Diamond.bytecode, diamond_factory.address, diamond_cut_facet.address
+        ),
+        zero_bytes=1,
+        processes=2,
+    )
+    assert leading_zero_bytes(address) >= 1
+    assert hashed > 0
+    assert diamond_factory.computeDiamondAddress(diamond_cut_facet, salt) == address
+
+    # The salt starts with the address of the sender
+    with reverts("InvalidSalt"):
+        diamond_factory.deployDiamondWithSalt(
+            *args, salt, {"from": pytest.other_account}
+        )
+
+    tx = diamond_factory.deployDiamondWithSalt(*args, salt, {"from": pytest.account})
+    tx.wait(1)
+    time.sleep(5)
+
+    assert tx.events["DiamondDeployed"]["diamond"] == address
+    token_facet = Contract.from_abi("TokenFacet", address, abi=TokenFacet.abi)
+    assert token_facet.name() == pytest.DEPLOYED_NAME
+
+    # The address is taken
+    with reverts():
+        diamond_factory.deployDiamondWithSalt(*args, salt, {"from": pytest.account})
+
+
+def test_026_workload_capture_replay(global_var, tmp_path):
+    tx = pytest.token_facet.configureMinter(
+        pytest.account.address, pytest.TEST_SUPPLY, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.mint(
+        pytest.account.address, pytest.TEST_AMOUNT, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    from_block = web3.eth.block_number + 1
+    pytest.token_facet.transfer(
+        pytest.other_account.address, 1, {"from": pytest.account}
+    ).wait(1)
+    pytest.token_facet.approve(
+        pytest.other_account.address, 1, {"from": pytest.account}
+    ).wait(1)
+    pytest.token_facet.transferFrom(
+        pytest.account.address,
+        pytest.other_account.address,
+        1,
+        {"from": pytest.other_account},
+    ).wait(1)
+    time.sleep(5)
+
+    path = tmp_path / "workload.jsonl"
+    token_facet = web3.eth.contract(address=pytest.diamond.address, abi=TokenFacet.abi)
+    assert capture(web3, token_facet, from_block, web3.eth.block_number, path) == 3
+
+    ops = read_workload(path)
+    assert [op["function"] for op in ops] == ["transfer", "approve", "transferFrom"]
+    assert ops[2]["sender"] == pytest.other_account.address
+    assert ops[2]["args"] == {
+        "from": pytest.account.address,
+        "to": pytest.other_account.address,
+        "value": 1,
+    }
+
+    replay = Replay(pytest.token_facet, pytest.account)
+    local = replay.accounts.rewrite(ops[2])
+    assert local["sender"] not in (pytest.account.address, pytest.other_account.address)
+    assert local["args"]["to"] == replay.accounts.rewrite(ops[0])["args"]["to"]
+
+    replay.prepare(ops, web3.toWei(0.1, "ether"))
+    report = replay.run(ops)
+    assert report["operations"] == 3
+    for function in ("transfer", "approve", "transferFrom"):
+        assert report["functions"][function]["count"] == 1
+        assert report["functions"][function]["reverted"] == 0
+        assert report["functions"][function]["gas_used"] > 0
+
+    tx = pytest.token_facet.removeMinter(
+        pytest.account.address, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+
+def test_027_access_list(global_var):
+    token_facet = web3.eth.contract(address=pytest.diamond.address, abi=TokenFacet.abi)
+    diamond_loupe_facet = Contract.from_abi(
+        "DiamondLoupeFacet", pytest.diamond.address, abi=DiamondLoupeFacet.abi
+    )
+    builder = AccessListBuilder(web3, token_facet)
+
+    # The slots are the ones the values are stored in
+    balance_slot = mapping_slot(word(pytest.account.address), BALANCES_SLOT)
+    assert int.from_bytes(
+        web3.eth.get_storage_at(pytest.diamond.address, balance_slot), "big"
+    ) == pytest.token_facet.balanceOf(pytest.account.address)
+    paused = web3.eth.get_storage_at(pytest.diamond.address, PAUSED_SLOT)
+    assert bool(bytes(paused)[-1]) == pytest.token_facet.paused()
+
+    tx = pytest.token_facet.approve(
+        pytest.other_account.address, 3, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+    allowed_slot = storage_keys(
+        "approve", pytest.account.address, {"spender": pytest.other_account.address}
+    )[-1]
+    assert (
+        int.from_bytes(
+            web3.eth.get_storage_at(pytest.diamond.address, allowed_slot), "big"
+        )
+        == 3
+    )
+
+    data = pytest.token_facet.transfer.encode_input(pytest.other_account.address, 1)
+    transfer = {"from": pytest.account.address, "data": data}
+    facet = diamond_loupe_facet.facetAddress(data[:10])
+    assert builder.facet_address(bytes.fromhex(data[2:10])) == facet
+
+    predicted = builder.predict(transfer)
+    assert predicted[0]["address"] == pytest.diamond.address
+    assert "0x" + word(balance_slot).hex() in predicted[0]["storageKeys"]
+    assert predicted[1] == {"address": facet, "storageKeys": []}
+
+    # The diamond is the destination, listing its few slots costs more
+    assert builder.build(transfer)["accessList"] == [
+        {"address": facet, "storageKeys": []}
+    ]
+
+    try:
+        result = builder.check(dict(transfer, to=pytest.diamond.address))
+    except ValueError:
+        pytest.skip("eth_createAccessList isn't supported by the node")
+    assert result["missing"] == {}
+
+
+def test_028_blacklist_sync(global_var, tmp_path):
+    addresses = [Account.create().address for _ in range(4)]
+    sync = BlacklistSync(web3, pytest.diamond.address, pytest.OTHER_ACCOUNT_PRIVATE_KEY)
+
+    path = tmp_path / "feed.csv"
+    path.write_text("address\n" + "\n".join(a.lower() for a in addresses[:3]))
+    feed = read_feed(path)
+    assert feed == set(addresses[:3])
+
+    added, _ = sync.run(feed)
+    assert added == 3
+    for address in addresses[:3]:
+        assert pytest.token_facet.isBlacklisted(address)
+
+    # A run without changes sends nothing
+    nonce = web3.eth.get_transaction_count(pytest.other_account.address)
+    assert sync.plan(feed) == ([], [])
+    assert sync.run(feed) == (0, 0)
+    assert web3.eth.get_transaction_count(pytest.other_account.address) == nonce
+
+    feed = set(addresses[1:])
+    add, remove = sync.plan(feed)
+    assert add == [addresses[3]]
+    assert addresses[0] in remove
+    sync.run(feed)
+    assert not pytest.token_facet.isBlacklisted(addresses[0])
+    assert pytest.token_facet.isBlacklisted(addresses[3])
+
+    # Only a blacklister can sync
+    with pytest.raises(ValueError):
+        BlacklistSync(web3, pytest.diamond.address, pytest.ACCOUNT_PRIVATE_KEY).run(
+            {Account.create().address}
+        )
+
+    # A saved state is resumed from, with the logs after it
+    state_path = str(tmp_path / "state.json")
+    sync = BlacklistSync(
+        web3,
+        pytest.diamond.address,
+        pytest.OTHER_ACCOUNT_PRIVATE_KEY,
+        state_path=state_path,
+    )
+    assert sync.plan(feed) == ([], [])
+    with open(state_path) as f:
+        assert json.load(f)["block"] > 0
+
+    resumed = BlacklistSync(
+        web3,
+        pytest.diamond.address,
+        pytest.OTHER_ACCOUNT_PRIVATE_KEY,
+        state_path=state_path,
+    )
+    resumed.run(set())
+    # the blocks after the saved state and the unconfirmed ones
+    assert resumed.log_requests <= 2
+    for address in addresses:
+        assert not pytest.token_facet.isBlacklisted(address)
+    assert BlacklistSync(
+        web3,
+        pytest.diamond.address,
+        pytest.OTHER_ACCOUNT_PRIVATE_KEY,
+        state_path=state_path,
+    ).plan(set()) == ([], [])
+
+
+def test_029_storage_reader(global_var):
+    accounts = [
+        pytest.account.address,
+        pytest.other_account.address,
+        pytest.ZERO_ADDRESS,
+    ]
+    reader = StorageReader(web3, pytest.diamond.address)
+
+    assert reader.self_check(pytest.token_facet, accounts) == []
+    # one batch per mapping and two for the token state
+    assert reader.requests <= 8
+
+    state = reader.token_state()
+    assert state["name"] == pytest.DEPLOYED_NAME
+    assert state["symbol"] == pytest.DEPLOYED_SYMBOL
+    assert state["decimals"] == pytest.DEPLOYED_DECIMALS
+    assert state["owner"] == pytest.account.address
+    assert state["initialized"]
+
+    diamond_loupe_facet = Contract.from_abi(
+        "DiamondLoupeFacet", pytest.diamond.address, abi=DiamondLoupeFacet.abi
+    )
+    selector = pytest.token_facet.transfer.signature
+    assert reader.facet(bytes.fromhex(selector[2:])) == (
+        diamond_loupe_facet.facetAddress(selector)
+    )
+
+    # The reads are at the block of the reader
+    balance = reader.balances([pytest.account.address])[pytest.account.address]
+    tx = pytest.token_facet.transfer(
+        pytest.other_account.address, 1, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+    assert reader.balances([pytest.account.address]) == {
+        pytest.account.address: balance
+    }
+    latest = StorageReader(web3, pytest.diamond.address)
+    assert latest.balances([pytest.account.address]) == {
+        pytest.account.address: balance - 1
+    }
+
+    try:
+        proofs = StorageReader(
+            web3, pytest.diamond.address, method="eth_getProof"
+        ).self_check(pytest.token_facet, accounts)
+    except ValueError:
+        pytest.skip("eth_getProof isn't supported by the node")
+    assert proofs == []
+
+
+def test_030_netting_settlement_facet(global_var_and_domain_separator, tmp_path):
+    """
+    Functions:
+        settle(Intent[] calldata _intents, bool _compact) external;
+    """
+
+    diamond_loupe_facet = Contract.from_abi(
+        "DiamondLoupeFacet", pytest.diamond.address, abi=DiamondLoupeFacet.abi
+    )
+
+    if diamond_loupe_facet.facetAddress(
+        NettingSettlementFacet.signatures["settle"]
+    ) == (pytest.ZERO_ADDRESS):
+        add_facet(pytest.diamond.address, NettingSettlementFacet, pytest.account)
+
+    netting_settlement_facet = Contract.from_abi(
+        "NettingSettlementFacet", pytest.diamond.address, abi=NettingSettlementFacet.abi
+    )
+
+    tx = pytest.token_facet.configureMinter(
+        pytest.account.address, pytest.TEST_SUPPLY, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.mint(
+        pytest.account.address, pytest.TEST_SUPPLY, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    def intent(authorizer, key, to, value):
+        nonce = to_32byte_hex(int(time.time() * 1000000))
+        valid_after = int(time.time()) - 600
+        valid_before = int(time.time()) + 600
+        r, s, v = sign_digest(
+            transfer_authorization_digest(
+                authorizer, to, value, valid_after, valid_before, nonce
+            ),
+            key,
+        )
+        return (authorizer, to, value, valid_after, valid_before, nonce, v, r, s)
+
+    pre_balance = pytest.token_facet.balanceOf(pytest.account.address)
+    pre_balance_other = pytest.token_facet.balanceOf(pytest.other_account.address)
+
+    intents = [
+        intent(
+            pytest.account.address,
+            pytest.ACCOUNT_PRIVATE_KEY,
+            pytest.other_account.address,
+            3 * pytest.TEST_AMOUNT,
+        ),
+        intent(
+            pytest.other_account.address,
+            pytest.OTHER_ACCOUNT_PRIVATE_KEY,
+            pytest.account.address,
+            pytest.TEST_AMOUNT,
+        ),
+        intent(
+            pytest.account.address,
+            pytest.ACCOUNT_PRIVATE_KEY,
+            pytest.other_account.address,
+            pytest.TEST_AMOUNT,
+        ),
+    ]
+
+    tx = netting_settlement_facet.settle(intents, False, {"from": pytest.other_account})
+    tx.wait(1)
+    time.sleep(5)
+
+    assert len(tx.events["Transfer"]) == 3
+    assert len(tx.events["AuthorizationUsed"]) == 3
+    assert tx.events["Transfer"][1]["from"] == pytest.other_account.address
+    assert pytest.token_facet.balanceOf(pytest.account.address) == (
+        pre_balance - 3 * pytest.TEST_AMOUNT
+    )
+    assert pytest.token_facet.balanceOf(pytest.other_account.address) == (
+        pre_balance_other + 3 * pytest.TEST_AMOUNT
+    )
+    assert pytest.token_facet.authorizationState(pytest.account.address, intents[0][5])
+
+    # An intent is settled once
+    with reverts("AuthorizationUsedOrCanceled"):
+        netting_settlement_facet.settle(
+            intents[2:], False, {"from": pytest.other_account}
+        )
+
+    # Signed by another account than the payer
+    forged = intent(
+        pytest.account.address,
+        pytest.OTHER_ACCOUNT_PRIVATE_KEY,
+        pytest.other_account.address,
+        pytest.TEST_AMOUNT,
+    )
+    with reverts("InvalidSigner"):
+        netting_settlement_facet.settle([forged], False, {"from": pytest.other_account})
+
+    # Only the net change has to be covered: other_account pays more than its
+    # balance, funded by the payment it receives in the same batch
+    pre_balance = pytest.token_facet.balanceOf(pytest.account.address)
+    pre_balance_other = pytest.token_facet.balanceOf(pytest.other_account.address)
+    intents = [
+        intent(
+            pytest.other_account.address,
+            pytest.OTHER_ACCOUNT_PRIVATE_KEY,
+            pytest.account.address,
+            pre_balance_other + pytest.TEST_AMOUNT,
+        ),
+        intent(
+            pytest.account.address,
+            pytest.ACCOUNT_PRIVATE_KEY,
+            pytest.other_account.address,
+            2 * pytest.TEST_AMOUNT,
+        ),
+    ]
+
+    cache = TokenReadCache(pytest.token_facet, web3)
+    assert cache.balance_of(pytest.account.address) == pre_balance
+
+    tx = netting_settlement_facet.settle(intents, True, {"from": pytest.account})
+    tx.wait(1)
+    time.sleep(5)
+
+    assert "Transfer" not in tx.events
+    # log consumers follow the Settlement event
+    cache.sync()
+    assert cache.balance_of(pytest.account.address) == (
+        pytest.token_facet.balanceOf(pytest.account.address)
+    )
+    path = tmp_path / "workload.jsonl"
+    token_facet = web3.eth.contract(address=pytest.diamond.address, abi=TokenFacet.abi)
+    assert capture(web3, token_facet, tx.block_number, tx.block_number, path) == 2
+    assert [
+        (op["function"], op["args"]["from"], op["args"]["value"])
+        for op in read_workload(path)
+    ] == [
+        (
+            "transferWithAuthorization",
+            pytest.other_account.address,
+            pre_balance_other + pytest.TEST_AMOUNT,
+        ),
+        ("transferWithAuthorization", pytest.account.address, 2 * pytest.TEST_AMOUNT),
+    ]
+    assert tx.events["Settlement"]["submitter"] == pytest.account.address
+    assert tx.events["Settlement"]["intents"] == 2
+    assert tx.events["Settlement"]["accounts"] == [
+        pytest.other_account.address,
+        pytest.account.address,
+    ]
+    assert tx.events["Settlement"]["credits"] == [
+        2 * pytest.TEST_AMOUNT,
+        pre_balance_other + pytest.TEST_AMOUNT,
+    ]
+    assert pytest.token_facet.balanceOf(pytest.other_account.address) == (
+        pytest.TEST_AMOUNT
+    )
+    assert pytest.token_facet.balanceOf(pytest.account.address) == (
+        pre_balance + pre_balance_other - pytest.TEST_AMOUNT
+    )
+
+    # The net change of other_account isn't covered
+    intents = [
+        intent(
+            pytest.other_account.address,
+            pytest.OTHER_ACCOUNT_PRIVATE_KEY,
+            pytest.account.address,
+            3 * pytest.TEST_AMOUNT,
+        ),
+        intent(
+            pytest.account.address,
+            pytest.ACCOUNT_PRIVATE_KEY,
+            pytest.other_account.address,
+            pytest.TEST_AMOUNT,
+        ),
+    ]
+    with reverts("TransferAmountExceedsBalance"):
+        netting_settlement_facet.settle(intents, True, {"from": pytest.account})
+
+    tx = pytest.token_facet.pause({"from": pytest.other_account})
+    tx.wait(1)
+    time.sleep(5)
+
+    with reverts("TokenPaused"):
+        netting_settlement_facet.settle(intents[1:], True, {"from": pytest.account})
+
+    tx = pytest.token_facet.unpause({"from": pytest.other_account})
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.blacklist(
+        pytest.other_account.address, {"from": pytest.other_account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    with reverts("AccountBlacklisted"):
+        netting_settlement_facet.settle(intents[1:], True, {"from": pytest.account})
+
+    tx = pytest.token_facet.unBlacklist(
+        pytest.other_account.address, {"from": pytest.other_account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.removeMinter(
+        pytest.account.address, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+
+def test_031_token_facet_infinite_allowance(global_var_and_domain_separator):
+    """
+    An allowance of type(uint256).max isn't decreased by transferFrom.
+    """
+
+    owner = pytest.account.address
+    spender = pytest.other_account.address
+    max_allowance = 2**256 - 1
+
+    tx = pytest.token_facet.configureMinter(
+        owner, pytest.TEST_SUPPLY, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.mint(owner, pytest.TEST_SUPPLY, {"from": pytest.account})
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.approve(spender, max_allowance, {"from": pytest.account})
+    tx.wait(1)
+    time.sleep(5)
+
+    pre_transfer_balance = pytest.token_facet.balanceOf(owner)
+    tx = pytest.token_facet.transferFrom(
+        owner, spender, pytest.TEST_AMOUNT, {"from": pytest.other_account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert pytest.token_facet.allowance(owner, spender) == max_allowance
+    assert pytest.token_facet.balanceOf(owner) == (
+        pre_transfer_balance - pytest.TEST_AMOUNT
+    )
+    # A permit of the maximum is infinite as well
+    tx = pytest.token_facet.approve(spender, 0, {"from": pytest.account})
+    tx.wait(1)
+    time.sleep(5)
+
+    deadline = sys.maxsize
+    r, s, v = sign_digest(
+        permit_digest(
+            owner, spender, max_allowance, pytest.token_facet.nonces(owner), deadline
+        ),
+        pytest.ACCOUNT_PRIVATE_KEY,
+    )
+    tx = pytest.token_facet.permit(
+        owner, spender, max_allowance, deadline, v, r, s, {"from": spender}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.transferFrom(
+        owner, spender, pytest.TEST_AMOUNT, {"from": pytest.other_account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert pytest.token_facet.allowance(owner, spender) == max_allowance
+    infinite_gas_used = tx.gas_used
+
+    # A finite allowance is still decreased
+    tx = pytest.token_facet.approve(
+        spender, 2 * pytest.TEST_AMOUNT, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.transferFrom(
+        owner, spender, pytest.TEST_AMOUNT, {"from": pytest.other_account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    assert pytest.token_facet.allowance(owner, spender) == pytest.TEST_AMOUNT
+    finite_gas_used = tx.gas_used
+    assert infinite_gas_used < finite_gas_used
+
+    with reverts("TransferAmountExceedsAllowance"):
+        pytest.token_facet.transferFrom(
+            owner, spender, 2 * pytest.TEST_AMOUNT, {"from": pytest.other_account}
+        )
+
+    tx = pytest.token_facet.approve(spender, 0, {"from": pytest.account})
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.removeMinter(owner, {"from": pytest.account})
+    tx.wait(1)
+    time.sleep(5)
+
+
+def test_032_balance_export(global_var, tmp_path):
+    tx = pytest.token_facet.configureMinter(
+        pytest.account.address, pytest.TEST_SUPPLY, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.mint(
+        pytest.account.address, pytest.TEST_SUPPLY, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+    first_block = tx.block_number
+
+    tx = pytest.token_facet.transfer(
+        pytest.other_account.address, pytest.TEST_AMOUNT, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.burn(pytest.TEST_AMOUNT, {"from": pytest.account})
+    tx.wait(1)
+    time.sleep(5)
+    last_block = tx.block_number
+
+    export = BalanceExport(web3, pytest.diamond.address)
+    assert export.run([last_block, first_block], tmp_path, pytest.token_facet) == []
+
+    for block in (first_block, last_block):
+        balances = read_balances(tmp_path, block)
+        for account in (pytest.account.address, pytest.other_account.address):
+            assert balances.get(account, 0) == pytest.token_facet.balanceOf(
+                account, block_identifier=block
+            )
+        assert pytest.ZERO_ADDRESS not in balances
+        assert sum(balances.values()) == pytest.token_facet.totalSupply(
+            block_identifier=block
+        )
+
+    # Values in the top limb carry into the spare lane
+    export = BalanceExport(web3, pytest.diamond.address)
+    holder = bytes.fromhex(pytest.account.address[2:])
+    value = (2**255).to_bytes(32, "big")
+    export.apply([b"\0" * 20] * 2, [holder] * 2, [value] * 2)
+    assert export.total() == 2**256
+
+    tx = pytest.token_facet.removeMinter(
+        pytest.account.address, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+
+def test_033_diamond_scaling_benchmark(global_var):
+    benchmark = ScalingBenchmark(pytest.account)
+    # the token diamond is still the last one
+    assert Diamond[-1] == pytest.diamond
+
+    results = benchmark.run((5, FACET_SELECTORS + 10))
+
+    assert [result["selectors"] for result in results] == [5, FACET_SELECTORS + 10]
+    assert [result["facets"] for result in results] == [1, 2]
+    # the dispatch is a lookup of the selector whatever the size
+    assert abs(results[1]["dispatch_last"] - results[0]["dispatch_last"]) < 100
+    for result in results:
+        assert result["cut"]["add"] > 0
+        # cut and loupe facets and the synthetic facets, the replacement
+        # facet of the measured cuts is removed with its selectors
+        assert result["facetAddresses()"]["bytes"] == 32 * (4 + result["facets"])
+        assert result["facetsPaginated(0,10)"]["bytes"] <= result["facets()"]["bytes"]
+    assert results[1]["facets()"]["gas"] > results[0]["facets()"]["gas"]
+    assert results[1]["facetFunctionSelectors()"]["bytes"] == 32 * (2 + 10)
+
+
+def test_034_lean_client(global_var):
+    client = LeanClient(web3, pytest.diamond.address, pytest.ACCOUNT_PRIVATE_KEY)
+    assert client.address == pytest.account.address
+
+    nonce = to_32byte_hex(1)
+    signature = (27, nonce, nonce)
+    calls = {
+        "transfer": (pytest.other_account.address, pytest.TEST_AMOUNT),
+        "transferFrom": (
+            pytest.account.address,
+            pytest.other_account.address,
+            pytest.TEST_AMOUNT,
+        ),
+        "approve": (pytest.other_account.address, pytest.TEST_AMOUNT),
+        "permit": (
+            pytest.account.address,
+            pytest.other_account.address,
+            pytest.TEST_AMOUNT,
+            sys.maxsize,
+        )
+        + signature,
+        "transferWithAuthorization": (
+            pytest.account.address,
+            pytest.other_account.address,
+            pytest.TEST_AMOUNT,
+            0,
+            sys.maxsize,
+            nonce,
+        )
+        + signature,
+        "receiveWithAuthorization": (
+            pytest.account.address,
+            pytest.other_account.address,
+            pytest.TEST_AMOUNT,
+            0,
+            sys.maxsize,
+            nonce,
+        )
+        + signature,
+        "cancelAuthorization": (pytest.account.address, nonce) + signature,
+    }
+    for function, args in calls.items():
+        assert "0x" + ENCODERS[function](*args).hex() == (
+            getattr(pytest.token_facet, function).encode_input(*args)
+        )
+
+    # the same transaction as eth_account
+    raw = client.sign("transfer", *calls["transfer"])
+    expected = Account.sign_transaction(
+        {
+            "to": pytest.diamond.address,
+            "data": pytest.token_facet.transfer.encode_input(*calls["transfer"]),
+            "value": 0,
+            "nonce": client.nonce - 1,
+            "gas": GAS_LIMITS["transfer"],
+            "gasPrice": client.gas_price,
+            "chainId": client.chain_id,
+        },
+        pytest.ACCOUNT_PRIVATE_KEY,
+    )
+    assert raw == bytes(expected.rawTransaction)
+
+    tx = pytest.token_facet.configureMinter(
+        pytest.account.address, pytest.TEST_SUPPLY, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    tx = pytest.token_facet.mint(
+        pytest.account.address, pytest.TEST_SUPPLY, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+    pre_transfer_balance = pytest.token_facet.balanceOf(pytest.other_account.address)
+    client.sync_nonce()
+    hashes = client.submit([("transfer", (pytest.other_account.address, 1))] * 3)
+    assert len(hashes) == 3
+    for tx_hash in hashes:
+        assert web3.eth.wait_for_transaction_receipt(tx_hash)["status"] == 1
+    time.sleep(5)
+
+    assert pytest.token_facet.balanceOf(pytest.other_account.address) == (
+        pre_transfer_balance + 3
+    )
+
+    tx = pytest.token_facet.removeMinter(
+        pytest.account.address, {"from": pytest.account}
+    )
+    tx.wait(1)
+    time.sleep(5)
+
+
+def test_035_chunked_cut(global_var):
+    """
+    Functions:
+        diamondCut(FacetCut[] calldata _diamondCut, address _init, bytes calldata _calldata) external override;
+    """
+
+    diamond_loupe_facet = Contract.from_abi(
+        "DiamondLoupeFacet", pytest.diamond.address, abi=DiamondLoupeFacet.abi
+    )
+    diamond_cut = interface.IDiamondCut(pytest.diamond.address)
+
+    facet = SelectorFacetMock.deploy({"from": pytest.account})
+    selectors = [bytes(w3.keccak(text=f"chunked{i}()"))[:4] for i in range(20)]
+    cut = [(facet.address, 0, selectors)]
+
+    cut_init = ChunkedCutInit.deploy({"from": pytest.account})
+    planner = ChunkedCutPlanner(
+        diamond_cut, diamond_loupe_facet, pytest.account, cut_init
+    )
+    # the whole cut fits the gas budget
+    assert planner.max_selectors(cut)[ADD] >= len(selectors)
+    chunks = planner.plan(cut, max_selectors=8)
+    assert [sum(len(s) for _, _, s in chunk) for chunk in chunks] == [8, 8, 4]
+    # every action fills the same share of a chunk
+    assert [
+        [(action, len(s)) for _, action, s in chunk]
+        for chunk in chunk_cut(
+            [
+                (facet.address, ADD, selectors[:6]),
+                (facet.address, REPLACE, selectors[6:14]),
+            ],
+            {ADD: 8, REPLACE: 4},
+        )
+    ] == [[(ADD, 6), (REPLACE, 1)], [(REPLACE, 4)], [(REPLACE, 3)]]
+
+    # a run that stopped after the first chunk leaves the token paused
+    tx = diamond_cut.diamondCut(
+        chunks[0],
+        *planner.chunk_init(0, len(chunks), pytest.ZERO_ADDRESS, b"", True),
+        {"from": pytest.account},
+    )
+    tx.wait(1)
+    time.sleep(5)
+    assert pytest.token_facet.paused()
+    with reverts("TokenPaused"):
+        pytest.token_facet.transfer(
+            pytest.other_account.address, 1, {"from": pytest.account}
+        )
+    assert planner.applied(chunks[0])
+    assert not planner.applied(chunks[1])
+
+    # it resumes after the applied chunks, the last one unpauses the token
+    receipts = planner.apply(chunks)
+    time.sleep(5)
+
+    assert len(receipts) == 2
+    assert "Pause" not in receipts[0].events
+    assert len(receipts[-1].events["Unpause"]) == 1
+    assert not pytest.token_facet.paused()
+    for selector in selectors:
+        assert diamond_loupe_facet.facetAddress(selector) == facet.address
+    assert planner.apply(chunks) == []
+
+    receipts = planner.run([(pytest.ZERO_ADDRESS, REMOVE, selectors)], max_selectors=16)
+    time.sleep(5)
+    assert len(receipts) == 2
+    assert len(receipts[0].events["Pause"]) == 1
+    assert len(receipts[1].events["Unpause"]) == 1
+    assert not pytest.token_facet.paused()
+    for selector in selectors:
+        assert diamond_loupe_facet.facetAddress(selector) == pytest.ZERO_ADDRESS